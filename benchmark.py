@@ -0,0 +1,280 @@
+"""
+measures the throughput of parsing and serializing VCards on a synthetic corpus
+
+the corpus is generated from templates modeled on the files in test-data (Outlook v2.1,
+v3.0, Nextcloud v4.0, optionally with embedded photos and quoted-printable notes), every
+benchmark runs in a fresh process, so the peak RSS belongs to this benchmark alone
+
+SYNTAX: python benchmark.py [-n cards] [--mix outlook21=4,v30=3,nextcloud40=3]
+                            [--photos 0.02] [--qp-notes 0.2] [-r repeat] [-o results.json]
+"""
+
+import base64
+import json
+import logging
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+import vcard
+
+# the kinds of VCards in the corpus, see "_generateCard"
+_tupleKinds = ("outlook21", "v30", "nextcloud40")
+_listFirstNames = ["Forrest", "Jenny", "Benjamin", "Dan", "Firstname", "Jürgen", "Zoë", "Ōtani", "Renée", "Ali"]
+_listLastNames = ["Gump", "Curran", "Buford", "Taylor", "Lastname", "Müller", "Łukasz", "O'Brien", "Nguyen", "Smith"]
+_listCities = ["Baytown", "Greenbow", "München", "Zürich", "Kraków", "Springfield"]
+_listCompanies = ["Bubba Gump Shrimp Co.", "Foobar Company", "fooBar Company", "Acme Ltd."]
+
+
+def _generateCard(objRandom, sKind, i, bPhoto, bQPNote):
+    """
+    returns one VCard (with "\\r\\n" line breaks), modeled on the samples in test-data
+    """
+    sFirst = objRandom.choice(_listFirstNames)
+    sLast = objRandom.choice(_listLastNames)
+    sCity = objRandom.choice(_listCities)
+    sOrg = objRandom.choice(_listCompanies)
+    sUID = "%08x-%04x-4%03x-a%03x-%012x" % (i, i % 65536, i % 4096, (i * 7) % 4096, i * 31)
+    sPhone = "+1 (%03d) %03d-%04d" % (objRandom.randint(100, 999), objRandom.randint(100, 999), i % 10000)
+    listLines = ["BEGIN:VCARD"]
+    if (sKind == "outlook21"):
+        listLines += [
+            "VERSION:2.1",
+            "N;LANGUAGE=de:%s;%s;Middle;Dr." % (sLast, sFirst),
+            "FN:Dr. %s Middle %s" % (sFirst, sLast),
+            "ORG:%s" % sOrg,
+            "TITLE:Lead Expert",
+            "TEL;WORK;VOICE:%s" % sPhone,
+            "TEL;CELL;VOICE:+1 (635) %03d" % (i % 1000),
+            "ADR;WORK;PREF:;;%d Street;%s;Province;%05d;United States of America" % (i % 500, sCity, i % 100000),
+            "LABEL;WORK;PREF;ENCODING=QUOTED-PRINTABLE:%d Street=0D=0A=" % (i % 500),
+            "%s, Province  %05d=0D=0A=" % (sCity, i % 100000),
+            "United States of America",
+            "X-MS-OL-DEFAULT-POSTAL-ADDRESS:2",
+            "URL;WORK:https://www.foobar-company.com",
+            "EMAIL;PREF;INTERNET:%s.%s.%d@foobar.com" % (sFirst.lower(), sLast.lower(), i),
+        ]
+    elif (sKind == "v30"):
+        listLines += [
+            "VERSION:3.0",
+            "N:%s;%s;;Mr.;" % (sLast, sFirst),
+            "FN:%s %s" % (sFirst, sLast),
+            "ORG:%s" % sOrg,
+            "TITLE:Shrimp Man",
+            "PHOTO;VALUE=URI;TYPE=GIF:http://www.example.com/dir_photos/%d.gif" % i,
+            "TEL;TYPE=WORK,VOICE:%s" % sPhone,
+            "TEL;TYPE=HOME,VOICE:(404) 555-%04d" % (i % 10000),
+            "ADR;TYPE=WORK,PREF:;;100 Waters Edge;%s;LA;30314;United States of America" % sCity,
+            "LABEL;TYPE=WORK,PREF:100 Waters Edge\\n%s\\, LA 30314\\nUnited States of America" % sCity,
+            "EMAIL:%s%d@example.com" % (sFirst.lower(), i),
+            "REV:2008-04-24T19:52:43Z",
+        ]
+    else:
+        listLines += [
+            "VERSION:4.0",
+            "FN:%s Middle %s" % (sFirst, sLast),
+            "UID:%s" % sUID,
+            "TEL;TYPE=home,voice;VALUE=uri:tel:%s" % sPhone.replace(" ", "-"),
+            "ADR;TYPE=work:;;Street;%s;province;123456;MyCountry" % sCity,
+            "EMAIL;TYPE=home:%s.%s@foobar.com" % (sFirst.lower(), sLast.lower()),
+            "REV:20170824T134615Z",
+            "ORG:%s" % sOrg,
+            "TITLE:Senior Expert",
+            "URL:https://www.foobar.com",
+            "NOTE:first line\\nsecond line\\nthird",
+        ]
+    if bQPNote:
+        # a soft line break every few words, like Outlook writes it
+        listWords = [objRandom.choice(_listFirstNames + _listCities) for _ in range(objRandom.randint(5, 40))]
+        sNote = " ".join(listWords).encode("utf8")
+        sNote = "".join(("=%02X" % iByte) if (iByte > 126 or iByte == 61) else chr(iByte) for iByte in sNote)
+        listLines.append("NOTE;ENCODING=QUOTED-PRINTABLE;CHARSET=UTF-8:" + "=\r\n".join(re.findall(".{1,70}", sNote)))
+    if bPhoto:
+        # a few KB of base64, folded like v2.1/v3.0 writers do
+        sData = base64.b64encode(bytes(objRandom.getrandbits(8) for _ in range(objRandom.randint(2048, 8192)))).decode("ascii")
+        listLines.append("PHOTO;ENCODING=b;TYPE=JPEG:" + "\r\n ".join(re.findall(".{1,74}", sData)))
+    listLines.append("END:VCARD")
+    return("\r\n".join(listLines) + "\r\n")
+
+
+def generateCorpus(iCards, dictMix=None, fPhotos=0.0, fQPNotes=0.0, iSeed=0):
+    """
+    returns a list of VCard strings, dictMix are the weights of the kinds of VCards
+    (e.g. {"outlook21": 4, "v30": 3, "nextcloud40": 3}), fPhotos and fQPNotes are the
+    fractions of VCards with an embedded photo or a quoted-printable note
+    the same arguments always result in the same corpus
+    """
+    dictMix = dictMix or dict((sKind, 1) for sKind in _tupleKinds)
+    for sKind in dictMix:
+        if sKind not in _tupleKinds:
+            raise(ValueError("unknown kind of VCard '%s', use one of %s" % (sKind, ", ".join(_tupleKinds))))
+    objRandom = random.Random(iSeed)
+    listKinds = list(dictMix.keys())
+    listWeights = [dictMix[sKind] for sKind in listKinds]
+    listCards = []
+    for i in range(iCards):
+        sKind = objRandom.choices(listKinds, listWeights)[0]
+        listCards.append(_generateCard(objRandom, sKind, i, objRandom.random() < fPhotos,
+                                       objRandom.random() < fQPNotes))
+    return(listCards)
+
+
+def _getPeakRSS():
+    """
+    returns the peak resident set size of this process in KB, None if not available (e.g. Windows)
+    on Linux VmHWM is used, ru_maxrss of a spawned process starts with the RSS of its parent
+    """
+    try:
+        with open("/proc/self/status", "r") as fhStatus:
+            for sLine in fhStatus:
+                if sLine.startswith("VmHWM:"):
+                    return(int(sLine.split()[1]))
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return(None)
+    iMaxRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if (sys.platform == "darwin"):
+        iMaxRSS //= 1024  # bytes on macOS
+    return(iMaxRSS)
+
+
+def _runBenchmark(tupleTask):
+    """
+    runs one benchmark in a fresh process, returns its result as dict
+    """
+    (sName, sCorpusFile, iRepeat) = tupleTask
+    vcard.logger.setLevel(logging.ERROR)
+    # before the corpus is loaded, so the peak RSS includes the corpus and the VCards parsed up front
+    iBaselineRSS = _getPeakRSS()
+    with open(sCorpusFile, "r", encoding="utf8", newline="") as fhFile:
+        listCards = fhFile.read().split("\0")
+    # parsed once up front for the benchmarks, which do not parse
+    listVCards = None
+    if sName in ("prettyPrint", "VCardWriter"):
+        listVCards = [vcard.VCard.fromString(sCard) for sCard in listCards]
+    sDataFile = sCorpusFile + ".vcf"
+    listSeconds = []
+    for _ in range(iRepeat):
+        fStart = time.perf_counter()
+        if (sName == "fromString"):
+            for sCard in listCards:
+                vcard.VCard.fromString(sCard)
+        elif (sName == "fromFile"):
+            vcard.VCard.fromFile(sDataFile)
+        elif (sName == "prettyPrint"):
+            for objVCard in listVCards:
+                objVCard.prettyPrint()
+        elif (sName == "VCardWriter"):
+            with open(os.devnull, "wb") as fhOut, vcard.VCardWriter(fhOut) as objWriter:
+                objWriter.writeAll(listVCards)
+        listSeconds.append(time.perf_counter() - fStart)
+    fSeconds = min(listSeconds)
+    return(OrderedDict([
+        ("name", sName),
+        ("cards", len(listCards)),
+        ("seconds", round(fSeconds, 6)),
+        ("cardsPerSecond", round(len(listCards) / fSeconds, 1) if fSeconds > 0 else None),
+        ("baselineRssKB", iBaselineRSS),
+        ("peakRssKB", _getPeakRSS()),
+    ]))
+
+
+def _getRevision():
+    try:
+        return(subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode("ascii").strip())
+    except (OSError, subprocess.CalledProcessError):
+        return(None)
+
+
+def main(listArguments=None):
+    import argparse
+    import multiprocessing
+    objArgumentParser = argparse.ArgumentParser(
+        description="SYNTAX: benchmark.py [-n cards] [-o results.json]")
+    objArgumentParser.add_argument("-n", "--cards", action="store", type=int, dest="iCards", default=10000,
+                                   required=False, help="number of VCards in the corpus (default 10000)")
+    objArgumentParser.add_argument("--mix", action="store", type=str, dest="sMix", default="outlook21=4,v30=3,nextcloud40=3",
+                                   required=False, help="weights of the kinds of VCards (default outlook21=4,v30=3,nextcloud40=3)")
+    objArgumentParser.add_argument("--photos", action="store", type=float, dest="fPhotos", default=0.02,
+                                   required=False, help="fraction of VCards with an embedded photo (default 0.02)")
+    objArgumentParser.add_argument("--qp-notes", action="store", type=float, dest="fQPNotes", default=0.2,
+                                   required=False, help="fraction of VCards with a quoted-printable note (default 0.2)")
+    objArgumentParser.add_argument("--seed", action="store", type=int, dest="iSeed", default=0, required=False)
+    objArgumentParser.add_argument("-r", "--repeat", action="store", type=int, dest="iRepeat", default=3,
+                                   required=False, help="runs per benchmark, the fastest one counts (default 3)")
+    objArgumentParser.add_argument("-b", "--benchmarks", action="store", type=str, dest="sBenchmarks",
+                                   default="fromString,fromFile,prettyPrint,VCardWriter", required=False)
+    objArgumentParser.add_argument("-o", action="store", type=str, dest="sOutputFile", default="", required=False,
+                                   help="write the results as JSON to this file (default stdout)")
+    objArgumentParser.add_argument("--write-corpus", action="store", type=str, dest="sCorpusFile", default="",
+                                   required=False, help="only write the generated corpus to this .vcf file")
+    argsParsed = objArgumentParser.parse_args(listArguments)
+    #
+    dictMix = OrderedDict()
+    for sWeight in argsParsed.sMix.split(","):
+        (sKind, sValue) = sWeight.split("=")
+        dictMix[sKind.strip()] = float(sValue)
+    listCards = generateCorpus(argsParsed.iCards, dictMix, argsParsed.fPhotos, argsParsed.fQPNotes, argsParsed.iSeed)
+    if argsParsed.sCorpusFile:
+        with open(argsParsed.sCorpusFile, "w", encoding="utf8", newline="") as fhOut:
+            fhOut.write("".join(listCards))
+        return(0)
+    #
+    # the corpus is passed to the benchmark processes as file, once as single VCards, once as .vcf
+    sTempFolder = tempfile.mkdtemp(prefix="vcard-benchmark-")
+    sCorpusFile = os.path.join(sTempFolder, "corpus")
+    try:
+        with open(sCorpusFile, "w", encoding="utf8", newline="") as fhOut:
+            fhOut.write("\0".join(listCards))
+        with open(sCorpusFile + ".vcf", "w", encoding="utf8", newline="") as fhOut:
+            fhOut.write("".join(listCards))
+        iCorpusBytes = os.path.getsize(sCorpusFile + ".vcf")
+        objContext = multiprocessing.get_context("spawn")
+        listResults = []
+        for sName in argsParsed.sBenchmarks.split(","):
+            with objContext.Pool(1) as objPool:
+                listResults.append(objPool.apply(_runBenchmark, ((sName.strip(), sCorpusFile, argsParsed.iRepeat),)))
+            print("%-12s %10.1f cards/s  peak RSS %s KB" % (
+                sName, listResults[-1]["cardsPerSecond"] or 0, listResults[-1]["peakRssKB"]), file=sys.stderr)
+    finally:
+        for sFileName in os.listdir(sTempFolder):
+            os.remove(os.path.join(sTempFolder, sFileName))
+        os.rmdir(sTempFolder)
+    #
+    dictReport = OrderedDict([
+        ("revision", _getRevision()),
+        ("python", platform.python_version()),
+        ("platform", platform.platform()),
+        ("timestamp", time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())),
+        ("corpus", OrderedDict([
+            ("cards", argsParsed.iCards),
+            ("bytes", iCorpusBytes),
+            ("mix", dictMix),
+            ("photos", argsParsed.fPhotos),
+            ("qpNotes", argsParsed.fQPNotes),
+            ("seed", argsParsed.iSeed),
+        ])),
+        ("repeat", argsParsed.iRepeat),
+        ("results", listResults),
+    ])
+    sReport = json.dumps(dictReport, indent=2)
+    if argsParsed.sOutputFile:
+        with open(argsParsed.sOutputFile, "w") as fhOut:
+            fhOut.write(sReport + "\n")
+    else:
+        print(sReport)
+    return(0)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1354 @@
+"""
+tests of vcard.py, run them with "python -m pytest" or "python -m unittest" in this folder
+"""
+import asyncio
+import base64
+import codecs
+import concurrent.futures
+import contextlib
+import csv
+import datetime
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import vcard
+from vcard import (VCard, VCardCollection, VCardColumns, VCardDeduplicator, VCardDiff, VCardIndex, VCardMergePolicy,
+                   VCardParseCache, VCardRejects, VCardShardWriter, VCardTelephone, VCardWriter)
+
+logging.getLogger("vcard").setLevel(logging.CRITICAL)
+
+sTestDataFolder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test-data")
+
+
+def _card(*listLines, sVersion="2.1", sLineBreak="\r\n"):
+    # a VCard string with the given property lines
+    return(sLineBreak.join(["BEGIN:VCARD", "VERSION:%s" % sVersion] + list(listLines) + ["END:VCARD", ""]))
+
+
+class TokenizerTest(unittest.TestCase):
+
+    def testUnfoldsLines(self):
+        listTokens = list(VCard.tokenize(_card("FN:Forrest", "  Gump", "NOTE:a", "\tb")))
+        self.assertIn(("FN", "", "Forrest Gump"), listTokens)
+        self.assertIn(("NOTE", "", "ab"), listTokens)
+
+    def testLineBreaks(self):
+        self.assertEqual(list(VCard.tokenize(_card("FN:x", sLineBreak="\n"))),
+                         list(VCard.tokenize(_card("FN:x", sLineBreak="\r\n"))))
+
+    def testSkipsEmptyLines(self):
+        self.assertEqual(list(VCard.tokenize("BEGIN:VCARD\r\n\r\nFN:x\r\n\r\nEND:VCARD")),
+                         [("BEGIN", "", "VCARD"), ("FN", "", "x"), ("END", "", "VCARD")])
+
+    def testJoinsQuotedPrintableSoftBreaks(self):
+        listTokens = list(VCard.tokenize(_card("NOTE;ENCODING=QUOTED-PRINTABLE:first=", "second", "FN:x")))
+        self.assertIn(("NOTE", "", "firstsecond"), listTokens)
+        self.assertIn(("FN", "", "x"), listTokens)
+        # a soft line break only joins the lines of a quoted-printable value
+        listTokens = list(VCard.tokenize(_card("NOTE:first=", "FN:x")))
+        self.assertIn(("NOTE", "", "first="), listTokens)
+        self.assertIn(("FN", "", "x"), listTokens)
+
+    def testRemovesGroup(self):
+        self.assertIn(("EMAIL", "", "a@b.c"), list(VCard.tokenize(_card("item1.EMAIL:a@b.c"))))
+
+    def testQuotedParameterValue(self):
+        self.assertEqual(VCard._splitLine('X-TEST;X-PARAM="a:b;c":value'), ("X-TEST", 'X-PARAM="a:b;c"', "value"))
+
+
+class ParameterTest(unittest.TestCase):
+
+    def testBareTypes(self):
+        self.assertEqual(VCard._splitLine("TEL;WORK;VOICE:(111) 555-1212"), ("TEL", "TYPE=work,voice", "(111) 555-1212"))
+
+    def testBarePref(self):
+        self.assertEqual(VCard._splitLine("EMAIL;PREF;INTERNET:a@b.c")[1], "TYPE=internet,pref")
+        self.assertEqual(VCard._splitLine("EMAIL;PREF:a@b.c")[1], "PREF")
+
+    def testBareEncoding(self):
+        self.assertEqual(VCard._splitLine("X-TEST;8BIT:x")[1], "ENCODING=8BIT")
+
+    def testParameterNamesUppercase(self):
+        self.assertEqual(VCard._splitLine("TEL;type=work:1")[1], "TYPE=work")
+
+    def testPhotoMediaType(self):
+        self.assertEqual(VCard._splitLine("PHOTO;GIF:http://x/a.gif")[1], "MEDIATYPE=image/gif")
+        self.assertEqual(VCard._splitLine("PHOTO;VALUE=URI;TYPE=GIF:http://x/a.gif")[1], "MEDIATYPE=image/gif")
+        self.assertEqual(VCard._splitLine("PHOTO;ENCODING=b;TYPE=image/jpeg:AAAA")[1], "ENCODING=b;MEDIATYPE=image/jpeg")
+        objVCard = VCard.fromString(_card("PHOTO;ENCODING=b;TYPE=image/jpeg:AAAA", sVersion="3.0"))
+        self.assertEqual(objVCard.photo.getFileExtension(), "jpeg")
+
+
+class RegisterPropertyTest(unittest.TestCase):
+
+    def setUp(self):
+        # registered properties are global, they are removed again after every test
+        for dictHandlers in (VCard._dictPropertyHandlers, VCard._dictLineIterators):
+            objPatch = mock.patch.dict(dictHandlers)
+            objPatch.start()
+            self.addCleanup(objPatch.stop)
+
+    def testUnknownPropertyIsDropped(self):
+        VCard.summary.reset()
+        objVCard = VCard.fromString(_card("FN:Forrest Gump", "BDAY:19440606"))
+        self.assertIsNone(objVCard.getProperty("BDAY"))
+        self.assertNotIn("BDAY", objVCard.prettyPrint())
+        self.assertEqual(VCard.summary.iPropertiesDropped, 1)
+
+    def testPlainText(self):
+        VCard.registerProperty("bday")
+        for bLazy in (False, True):
+            objVCard = VCard.fromString(_card("FN:Forrest Gump", "BDAY:19440606"), bLazy=bLazy)
+            self.assertEqual(objVCard.getProperty("BDAY"), "19440606")
+            sOutput = objVCard.prettyPrint()
+            self.assertIn("BDAY:19440606\n", sOutput)
+            self.assertEqual(VCard.fromString(sOutput).prettyPrint(), sOutput)
+        self.assertNotIn("BDAY", VCard.fromString(_card("FN:Forrest Gump")).prettyPrint())
+
+    def testMultipleValues(self):
+        VCard.registerProperty("CATEGORIES", bMultipleValues=True)
+        objVCard = VCard.fromString(_card("CATEGORIES:friends", "CATEGORIES:shrimp"))
+        self.assertEqual(objVCard.getProperty("CATEGORIES"), ["friends", "shrimp"])
+        self.assertIn("CATEGORIES:friends\nCATEGORIES:shrimp\n", objVCard.prettyPrint())
+
+    def testParserAndSerializer(self):
+        def parseGEO(objVCard, sParameters, sValue):
+            # v3.0 "GEO:37.386013;-122.082932" and v4.0 "GEO:geo:37.386013,-122.082932"
+            sValue = sValue[4:] if sValue.startswith("geo:") else sValue
+            objVCard._getExtraProperties()["GEO"] = tuple(float(sPart) for sPart in sValue.replace(";", ",").split(","))
+
+        def serializeGEO(objVCard):
+            tupleGEO = objVCard.getProperty("GEO")
+            return("" if tupleGEO is None else "GEO:geo:%s,%s" % tupleGEO)
+        VCard.registerProperty("GEO", parseGEO, serializeGEO)
+        objVCard = VCard.fromString(_card("GEO:37.386013;-122.082932", sVersion="3.0"))
+        self.assertEqual(objVCard.getProperty("GEO"), (37.386013, -122.082932))
+        sOutput = objVCard.prettyPrint()
+        self.assertIn("GEO:geo:37.386013,-122.082932\n", sOutput)
+        self.assertEqual(VCard.fromString(sOutput).getProperty("GEO"), (37.386013, -122.082932))
+        # registered again, the new handlers are used
+        VCard.registerProperty("GEO")
+        self.assertEqual(VCard.fromString(sOutput).getProperty("GEO"), "geo:37.386013,-122.082932")
+
+
+class DecodingTest(unittest.TestCase):
+
+    def testQuotedPrintableWithCharset(self):
+        objVCard = VCard.fromString(_card("N;ENCODING=QUOTED-PRINTABLE;CHARSET=Windows-1252:M=FCller;J=FCrgen",
+                                          "ORG;CHARSET=ISO-8859-2;ENCODING=QUOTED-PRINTABLE:=A3=F3d=BC"))
+        self.assertEqual(objVCard.getProperty("N").surname, "Müller")
+        self.assertEqual(objVCard.getProperty("N").givenName, "Jürgen")
+        self.assertEqual(objVCard.getProperty("ORG"), "Łódź")
+
+    def testQuotedPrintableSoftBreakAndLineBreak(self):
+        objVCard = VCard.fromString(_card("ADR;WORK;ENCODING=QUOTED-PRINTABLE;CHARSET=UTF-8:;;Stra=C3=9Fe 1=0D=0A=",
+                                          "Hof;M=C3=BCnchen;;80331;Deutschland"))
+        sOutput = objVCard.prettyPrint()
+        # the line break is escaped and ENCODING and CHARSET are gone
+        self.assertIn("ADR;TYPE=work:;;Straße 1\\nHof;München;;80331;Deutschland", sOutput)
+
+    def testQuotedPrintableWithoutCharset(self):
+        # UTF-8 is tried first, then Windows-1252
+        self.assertEqual(VCard._splitLine("NOTE;QUOTED-PRINTABLE:5 =80"), ("NOTE", "", "5 €"))
+        self.assertEqual(VCard._splitLine("NOTE;QUOTED-PRINTABLE:=C3=BC"), ("NOTE", "", "ü"))
+
+    def testBase64Text(self):
+        self.assertEqual(VCard._splitLine("TITLE;ENCODING=b;CHARSET=utf-8:R2VzY2jDpGZ0c2bDvGhyZXI="),
+                         ("TITLE", "", "Geschäftsführer"))
+
+    def testBinaryPropertiesKeepEncoding(self):
+        self.assertEqual(VCard._splitLine("PHOTO;ENCODING=BASE64;TYPE=JPEG:AAAA"),
+                         ("PHOTO", "ENCODING=BASE64;MEDIATYPE=image/jpeg", "AAAA"))
+
+    def testLazySameAsEager(self):
+        sCard = _card("NOTE;ENCODING=QUOTED-PRINTABLE;CHARSET=Windows-1252:Gr=FC=DFe=0D=0Azweite Zeile")
+        self.assertEqual(VCard.fromString(sCard, bLazy=True).prettyPrint(), VCard.fromString(sCard).prettyPrint())
+        self.assertIn("NOTE:Grüße\\nzweite Zeile", VCard.fromString(sCard).prettyPrint())
+
+
+class LazyTest(unittest.TestCase):
+
+    sCard = _card("N:Gump;Forrest;;Mr.;", "FN:Forrest Gump", "ORG:Bubba Gump Shrimp Co.",
+                  "TEL;WORK;VOICE:(111) 555-1212", "EMAIL;PREF;INTERNET:forrestgump@example.com",
+                  "X-CUSTOM:value")
+
+    def testNotDecodedBeforeAccess(self):
+        objVCard = VCard.fromString(self.sCard, bLazy=True)
+        self.assertEqual(sorted(objVCard._pending), ["EMAIL", "FN", "N", "ORG", "TEL"])
+        self.assertEqual(objVCard.surname, "Gump")
+        self.assertNotIn("N", objVCard._pending)
+        self.assertIn("ORG", objVCard._pending)
+        self.assertEqual(objVCard.getProperty("ORG"), VCard.fromString(self.sCard).getProperty("ORG"))
+        self.assertNotIn("ORG", objVCard._pending)
+
+    def testSameAsEager(self):
+        sEager = VCard.fromString(self.sCard).prettyPrint()
+        self.assertEqual(VCard.fromString(self.sCard, bLazy=True).prettyPrint(), sEager)
+        objVCard = VCard.fromString(self.sCard, bLazy=True)
+        objVCard.surname
+        objVCard.organisation
+        self.assertEqual(objVCard.prettyPrint(), sEager)
+        objVCard._decodeAll()
+        self.assertIsNone(objVCard._pending)
+        self.assertEqual(objVCard.prettyPrint(), sEager)
+
+    def testSetOverwritesPending(self):
+        objVCard = VCard.fromString(self.sCard, bLazy=True)
+        objVCard._setFromLine("FN", "FN:Bubba")
+        self.assertEqual(objVCard.formattedNameString, "Bubba")
+        self.assertIn("FN:Bubba\n", objVCard.prettyPrint())
+
+    def testWithoutPropertiesNothingPending(self):
+        self.assertIsNone(VCard.fromString(_card("X-CUSTOM:value"), bLazy=True)._pending)
+
+
+class EncodingTest(unittest.TestCase):
+
+    listCards = [_card("FN:Jürgen Müller", "NOTE:5 €"), _card("FN:Zoë")]
+    sData = "".join(listCards)
+
+    def setUp(self):
+        self._objTmpFolder = tempfile.TemporaryDirectory()
+        self.sFilePath = os.path.join(self._objTmpFolder.name, "contacts.vcf")
+
+    def tearDown(self):
+        self._objTmpFolder.cleanup()
+
+    def _writeFile(self, bData):
+        with open(self.sFilePath, "wb") as fhFile:
+            fhFile.write(bData)
+
+    def _expected(self):
+        return([VCard.fromString(sCard).prettyPrint() for sCard in self.listCards])
+
+    def testUnicodeWithBOM(self):
+        for (sEncoding, bBOM) in (("utf-16-le", codecs.BOM_UTF16_LE), ("utf-16-be", codecs.BOM_UTF16_BE),
+                                  ("utf-32-le", codecs.BOM_UTF32_LE), ("utf-8", codecs.BOM_UTF8)):
+            self._writeFile(bBOM + self.sData.encode(sEncoding))
+            self.assertEqual([objVCard.prettyPrint() for objVCard in VCard.fromFile(self.sFilePath)], self._expected(),
+                             sEncoding)
+            # the BOM and the characters are split by the chunk borders
+            for iChunkSize in (1, 3, 5):
+                self.assertEqual([objVCard.prettyPrint() for objVCard in VCard.iterFile(self.sFilePath, iChunkSize)],
+                                 self._expected(), sEncoding)
+
+    def testUTF16WithoutBOM(self):
+        for sEncoding in ("utf-16-le", "utf-16-be"):
+            self._writeFile(self.sData.encode(sEncoding))
+            self.assertEqual([objVCard.prettyPrint() for objVCard in VCard.iterFile(self.sFilePath, 7)], self._expected())
+
+    def testCharsetPerLine(self):
+        bData = b"\r\n".join([b"BEGIN:VCARD", b"VERSION:2.1", "FN:Jürgen".encode("utf-8"),
+                              b"N;CHARSET=ISO-8859-2:\xa3\xf3d\xbc;", b"ORG;CHARSET=Windows-1252:Caf\xe9 \x80",
+                              b"NOTE;CHARSET=unknown:Gr\xfc\xdfe", b"TITLE:Stra\xdfe", b"END:VCARD", b""])
+        self._writeFile(bData)
+        (objVCard,) = VCard.fromFile(self.sFilePath)
+        self.assertEqual(objVCard.getProperty("FN"), "Jürgen")
+        self.assertEqual(objVCard.getProperty("N").surname, "Łódź")
+        self.assertEqual(objVCard.getProperty("ORG"), "Café €")
+        # an unknown CHARSET and no CHARSET fall back to Windows-1252
+        self.assertEqual(objVCard.getProperty("NOTE"), "Grüße")
+        self.assertEqual(objVCard.getProperty("TITLE"), "Straße")
+
+    def testLatin1Fallback(self):
+        # 0x81 is not defined in Windows-1252, so it is decoded as LATIN1
+        self.assertEqual(VCard._decodeBytes(b"NOTE:a\x81\x80"), "NOTE:a\x81€")
+        self.assertEqual(VCard._getCharsetDecoder("latin1")(b"\xe9\x80"), "é€")
+        self.assertEqual(VCard._getCharsetDecoder(None)(b"\xe9"), "é")
+        self.assertEqual(VCard._getCharsetDecoder("utf-8")("é".encode("utf-8")), "é")
+        self.assertEqual(VCard._getCharsetDecoder("ISO-8859-2")(b"\xa3"), "Ł")
+
+
+class IterFileTest(unittest.TestCase):
+
+    def testEveryChunkBorder(self):
+        listCards = [_card("FN:Forrest Gump"), _card("FN:Jürgen Müller", "NOTE:first line"),
+                     _card("FN:Zoë")]
+        bData = ("garbage\r\n" + "\r\n".join(listCards)).encode("utf-8")
+        listExpected = list(VCard._iterCardBytes(io.BytesIO(bData), len(bData)))
+        self.assertEqual(len(listExpected), 3)
+        self.assertEqual(listExpected[0][0], len(b"garbage\r\n"))
+        # the chunk borders split "BEGIN:VCARD" and "END:VCARD" at every position
+        for iChunkSize in range(1, 40):
+            self.assertEqual(list(VCard._iterCardBytes(io.BytesIO(bData), iChunkSize)), listExpected)
+
+    def testSameAsFromFile(self):
+        for sFileName in sorted(os.listdir(sTestDataFolder)):
+            sFilePath = os.path.join(sTestDataFolder, sFileName)
+            listExpected = [objVCard.prettyPrint() for objVCard in VCard.fromFile(sFilePath)]
+            with open(sFilePath, "rb") as fhFile:
+                bData = fhFile.read()
+            # the same as parsing every "BEGIN:VCARD ... END:VCARD" block on its own
+            listBlocks = ["BEGIN:VCARD" + sBlock for sBlock in bData.decode("utf-8").split("BEGIN:VCARD")[1:]]
+            self.assertEqual([VCard.fromString(sBlock).prettyPrint() for sBlock in listBlocks], listExpected)
+            for iChunkSize in (1, 9, 64):
+                self.assertEqual([objVCard.prettyPrint() for objVCard in VCard.iterFile(sFilePath, iChunkSize)],
+                                 listExpected)
+
+    def testIncompleteVCardAtTheEnd(self):
+        bData = (_card("FN:Forrest Gump") + "BEGIN:VCARD\r\nFN:x\r\n").encode("utf-8")
+        self.assertEqual(len(list(VCard._iterCardBytes(io.BytesIO(bData), 5))), 1)
+        listCards = list(VCard._iterCardBytes(io.BytesIO(bData), 5, bIncomplete=True))
+        self.assertEqual(listCards[1], (len(_card("FN:Forrest Gump")), b"BEGIN:VCARD\r\nFN:x\r\n"))
+
+
+class RejectsTest(unittest.TestCase):
+
+    listCards = [_card("FN:Forrest Gump"), _card("FN:Bad", "EMAIL;TYPE=:bad@example.com"), _card("FN:Jürgen Müller")]
+
+    def setUp(self):
+        VCard.summary.reset()
+        self._objTmpFolder = tempfile.TemporaryDirectory()
+        self.addCleanup(self._objTmpFolder.cleanup)
+        self.sFilePath = os.path.join(self._objTmpFolder.name, "in.vcf")
+        with open(self.sFilePath, "w", encoding="utf-8", newline="") as fhFile:
+            # the last VCard has no "END:VCARD"
+            fhFile.write("".join(self.listCards) + "BEGIN:VCARD\r\nFN:Incomplete\r\n")
+
+    def testWithoutRejects(self):
+        with self.assertRaises(vcard.VCardParseError):
+            list(VCard.iterFile(self.sFilePath))
+
+    def testRejectedAndGoOn(self):
+        iBad = len(self.listCards[0].encode("utf-8"))
+        iIncomplete = len("".join(self.listCards).encode("utf-8"))
+        for iChunkSize in (7, 1048576):
+            sQuarantinePath = os.path.join(self._objTmpFolder.name, "rejected-%d.vcf" % iChunkSize)
+            with self.assertLogs("vcard", "WARNING"):
+                with VCardRejects(sQuarantinePath, bKeepCards=True) as objRejects:
+                    listVCards = list(VCard.iterFile(self.sFilePath, iChunkSize, objRejects=objRejects))
+            self.assertEqual([objVCard.getProperty("FN") for objVCard in listVCards],
+                             ["Forrest Gump", "Jürgen Müller"])
+            self.assertEqual(len(objRejects), 2)
+            (objBad, objIncomplete) = objRejects.listErrors
+            # the length ends at "END:VCARD", without the line break
+            self.assertEqual((objBad.filePath, objBad.offset, objBad.length),
+                             (self.sFilePath, iBad, len(self.listCards[1]) - 2))
+            self.assertEqual(objBad.error, "VCardParseError")
+            self.assertEqual(objBad.line, "EMAIL;TYPE=:bad@example.com")
+            self.assertEqual(objIncomplete.offset, iIncomplete)
+            self.assertIn("END:VCARD", objIncomplete.message)
+            self.assertEqual(objRejects.listCards[1], b"BEGIN:VCARD\r\nFN:Incomplete\r\n")
+            with open(sQuarantinePath, "rb") as fhFile:
+                self.assertEqual(fhFile.read(), b"\r\n".join(objRejects.listCards) + b"\r\n")
+        self.assertEqual(VCard.summary.dictWarnings["rejected"], 4)
+
+    def testReport(self):
+        sReportPath = os.path.join(self._objTmpFolder.name, "rejected.jsonl")
+        with self.assertLogs("vcard", "WARNING"):
+            objRejects = VCardRejects()
+            VCard.fromFile(self.sFilePath, objRejects=objRejects)
+        self.assertIsNone(objRejects.listCards)
+        objRejects.writeReport(sReportPath)
+        with open(sReportPath, "r", encoding="utf-8") as fhFile:
+            listReport = [json.loads(sLine) for sLine in fhFile]
+        self.assertEqual([dictError["offset"] for dictError in listReport],
+                         [objError.offset for objError in objRejects.listErrors])
+        self.assertEqual(list(listReport[0]), list(vcard.VCardError._fields))
+
+
+class IndexTest(unittest.TestCase):
+
+    listCards = [_card("UID:1", "FN:Forrest Gump"), _card("FN;CHARSET=UTF-8:Jürgen Müller"),
+                 _card("UID:3", "FN:Forrest Gump", "NOTE:the other one")]
+
+    def setUp(self):
+        self._objTmpFolder = tempfile.TemporaryDirectory()
+        self.sFilePath = os.path.join(self._objTmpFolder.name, "contacts.vcf")
+        with open(self.sFilePath, "w", encoding="utf-8", newline="") as fhFile:
+            fhFile.write("".join(self.listCards))
+
+    def tearDown(self):
+        self._objTmpFolder.cleanup()
+
+    def testLookups(self):
+        with VCardIndex(self.sFilePath) as objIndex:
+            self.assertEqual(len(objIndex), 3)
+            self.assertEqual(objIndex.getByUID("3").getProperty("NOTE"), "the other one")
+            self.assertIsNone(objIndex.getByUID("2"))
+            iOffset = len(self.listCards[0].encode("utf-8"))
+            # up to "END:VCARD", without the line break
+            self.assertEqual(objIndex.entries[1], (iOffset, len(self.listCards[1].encode("utf-8")) - 2, None,
+                                                   "Jürgen Müller"))
+            self.assertEqual(objIndex.getByOffset(iOffset).getProperty("FN"), "Jürgen Müller")
+            self.assertIsNone(objIndex.getByOffset(iOffset + 1))
+            self.assertEqual(objIndex.getByNumber(2).getProperty("UID"), "3")
+            self.assertEqual([objVCard.getProperty("UID") for objVCard in objIndex.findByFN("Forrest Gump")], ["1", "3"])
+            self.assertEqual(objIndex.findByFN("Bubba"), [])
+
+    def testIndexFileIsReused(self):
+        VCardIndex(self.sFilePath).close()
+        self.assertTrue(os.path.exists(self.sFilePath + ".idx"))
+        with mock.patch.object(VCardIndex, "_buildIndex", side_effect=AssertionError("index was built again")):
+            with VCardIndex(self.sFilePath) as objIndex:
+                self.assertEqual(objIndex.getByUID("1").getProperty("FN"), "Forrest Gump")
+
+    def testIndexFileIsRebuiltAfterChanges(self):
+        VCardIndex(self.sFilePath).close()
+        with open(self.sFilePath, "a", encoding="utf-8", newline="") as fhFile:
+            fhFile.write(_card("UID:4", "FN:Bubba Blue"))
+        with VCardIndex(self.sFilePath) as objIndex:
+            self.assertEqual(objIndex.getByUID("4").getProperty("FN"), "Bubba Blue")
+        # the same size, but another mtime
+        objStat = os.stat(self.sFilePath)
+        os.utime(self.sFilePath, ns=(objStat.st_atime_ns, objStat.st_mtime_ns + 1000000000))
+        with mock.patch.object(VCardIndex, "_buildIndex", autospec=True,
+                               side_effect=VCardIndex._buildIndex) as objBuildIndex:
+            VCardIndex(self.sFilePath).close()
+        self.assertEqual(objBuildIndex.call_count, 1)
+
+    def testWithoutIndexFile(self):
+        with VCardIndex(self.sFilePath, bSaveIndex=False) as objIndex:
+            self.assertEqual(len(objIndex), 3)
+        self.assertFalse(os.path.exists(self.sFilePath + ".idx"))
+
+
+class StreamTest(unittest.TestCase):
+
+    listCards = [_card("FN:Jürgen Müller", "NOTE:first line"), _card("FN:Zoë", "TEL;CELL:0170 1234567")]
+    sData = "".join(listCards)
+
+    def _readStream(self, listChunks, **kwargs):
+        # the chunks are fed one after the other, as if they arrived from a socket
+        async def refRead():
+            objReader = asyncio.StreamReader()
+
+            async def refFeed():
+                for bChunk in listChunks:
+                    objReader.feed_data(bChunk)
+                    await asyncio.sleep(0)
+                objReader.feed_eof()
+            objFeeder = asyncio.ensure_future(refFeed())
+            listVCards = [objVCard async for objVCard in VCard.aiterStream(objReader, **kwargs)]
+            await objFeeder
+            return(listVCards)
+        return([objVCard.prettyPrint() for objVCard in asyncio.run(refRead())])
+
+    def _expected(self):
+        return([VCard.fromString(sCard).prettyPrint() for sCard in self.listCards])
+
+    def testSplitChunks(self):
+        bData = self.sData.encode("utf-8")
+        # within "BEGIN:VCARD", within the "ü" (two bytes in UTF-8) and between "\r" and "\n"
+        iBegin = bData.index(b"BEGIN:VCARD", 1) + 3
+        iUmlaut = bData.index("ü".encode("utf-8")) + 1
+        iLineBreak = bData.index(b"\r\n") + 1
+        listBorders = [0] + sorted((iBegin, iUmlaut, iLineBreak)) + [len(bData)]
+        listChunks = [bData[listBorders[i]:listBorders[i + 1]] for i in range(len(listBorders) - 1)]
+        self.assertEqual(self._readStream(listChunks), self._expected())
+
+    def testSingleBytes(self):
+        self.assertEqual(self._readStream([self.sData.encode("utf-8")], iChunkSize=1), self._expected())
+
+    def testUTF16(self):
+        # with a BOM, which is split by the chunk border
+        for sEncoding in ("utf-16-le", "utf-16-be", "utf-32"):
+            bData = self.sData.encode(sEncoding)
+            if (sEncoding == "utf-16-le"):
+                bData = codecs.BOM_UTF16_LE + bData
+            elif (sEncoding == "utf-16-be"):
+                bData = codecs.BOM_UTF16_BE + bData
+            self.assertEqual(self._readStream([bData], iChunkSize=3), self._expected())
+
+    def testThreadExecutor(self):
+        with concurrent.futures.ThreadPoolExecutor(2) as objExecutor:
+            self.assertEqual(self._readStream([self.sData.encode("utf-8")], iChunkSize=50, objExecutor=objExecutor),
+                             self._expected())
+
+    def testProcessExecutor(self):
+        with concurrent.futures.ProcessPoolExecutor(1) as objExecutor:
+            self.assertEqual(self._readStream([self.sData.encode("utf-8")], objExecutor=objExecutor),
+                             self._expected())
+
+
+class WriterTest(unittest.TestCase):
+
+    def _write(self, listVCards, **kwargs):
+        fhOut = io.BytesIO()
+        with VCardWriter(fhOut, **kwargs) as objWriter:
+            objWriter.writeAll(listVCards)
+        return(fhOut.getvalue())
+
+    def testFoldsAt75Octets(self):
+        objVCard = VCard.fromString(_card("NOTE:" + "äbc" * 100, "FN:" + "x" * 200))
+        bOutput = self._write([objVCard])
+        self.assertTrue(bOutput.endswith(b"END:VCARD\r\n"))
+        listLines = bOutput.split(b"\r\n")
+        self.assertNotIn(b"\n", b"".join(listLines))
+        for bLine in listLines:
+            self.assertLessEqual(len(bLine), 75)
+            # a line is never folded within a character
+            bLine.decode("utf-8")
+        self.assertTrue(any(bLine.startswith(b" ") for bLine in listLines))
+
+    def testFoldedOutputParsesAgain(self):
+        objVCard = VCard.fromString(_card("NOTE:" + "äbc" * 100, "FN:" + "x" * 200, "TEL;CELL:123"))
+        objParsed = VCard.fromString(self._write([objVCard]).decode("utf-8"))
+        self.assertEqual(objParsed.prettyPrint(), objVCard.prettyPrint())
+
+    def testWriteToSameAsPrettyPrint(self):
+        objVCard = VCard.fromFile(os.path.join(sTestDataFolder, "vcard_21_wiki-example.vcf"))[0]
+        fhOut = io.BytesIO()
+        iBytes = objVCard.writeTo(fhOut)
+        self.assertEqual(iBytes, len(fhOut.getvalue()))
+        # unfolded, the output is that of prettyPrint
+        bUnfolded = fhOut.getvalue().replace(b"\r\n ", b"")
+        self.assertEqual(bUnfolded, objVCard.prettyPrint().replace("\n", "\r\n").encode("utf-8"))
+
+    def testWithoutFolding(self):
+        objVCard = VCard.fromString(_card("FN:" + "x" * 200))
+        bOutput = self._write([objVCard], iFoldAt=0, sLineBreak="\n")
+        self.assertIn(b"\nFN:" + b"x" * 200 + b"\n", bOutput)
+
+    def testCounts(self):
+        listVCards = [VCard.fromString(_card("FN:%d" % i)) for i in range(3)]
+        fhOut = io.BytesIO()
+        with VCardWriter(fhOut, iBufferSize=10) as objWriter:
+            self.assertEqual(objWriter.writeAll(listVCards), 3)
+        self.assertEqual(objWriter.iCardsWritten, 3)
+        self.assertEqual(objWriter.iBytesWritten, len(fhOut.getvalue()))
+        self.assertEqual(fhOut.getvalue().count(b"BEGIN:VCARD\r\n"), 3)
+
+
+class IncrementalTest(unittest.TestCase):
+
+    sForrest = _card("FN:Forrest Gump", "TEL;CELL:0170 1234567")
+    sBubba = _card("FN:Bubba Blue", "NOTE:shrimp")
+
+    def setUp(self):
+        self._objTmpFolder = tempfile.TemporaryDirectory()
+        self.sInputFolder = os.path.join(self._objTmpFolder.name, "in")
+        self.sExportFolder = os.path.join(self._objTmpFolder.name, "out")
+        os.mkdir(self.sInputFolder)
+        os.mkdir(self.sExportFolder)
+        self.sInputFile = os.path.join(self.sInputFolder, "contacts.vcf")
+        self.sExportFile = os.path.join(self.sExportFolder, "contacts.v4.vcf")
+
+    def tearDown(self):
+        self._objTmpFolder.cleanup()
+        # main sets the level of the logger
+        logging.getLogger("vcard").setLevel(logging.CRITICAL)
+
+    def _writeInput(self, sData):
+        with open(self.sInputFile, "w", encoding="utf-8", newline="") as fhFile:
+            fhFile.write(sData)
+
+    def _readExport(self):
+        with open(self.sExportFile, "rb") as fhFile:
+            return(fhFile.read())
+
+    def _writeExport(self, bData):
+        with open(self.sExportFile, "wb") as fhFile:
+            fhFile.write(bData)
+
+    def _main(self, *listOptions):
+        return(vcard.main(["-i", self.sInputFolder, "-o", self.sExportFolder, "-export", "-q", "--incremental"] +
+                          list(listOptions)))
+
+    def testSkipsUnchangedFiles(self):
+        self._writeInput(self.sForrest)
+        self.assertEqual(self._main(), 0)
+        self.assertIn(b"FN:Forrest Gump\r\n", self._readExport())
+        # an unchanged file is not converted again, so the export keeps the marker
+        self._writeExport(b"marker")
+        self.assertEqual(self._main(), 0)
+        self.assertEqual(self._readExport(), b"marker")
+        self._writeInput(self.sForrest + self.sBubba)
+        self.assertEqual(self._main(), 0)
+        self.assertIn(b"FN:Bubba Blue\r\n", self._readExport())
+
+    def testMissingExportIsWrittenAgain(self):
+        self._writeInput(self.sForrest)
+        self.assertEqual(self._main(), 0)
+        os.remove(self.sExportFile)
+        self.assertEqual(self._main(), 0)
+        self.assertIn(b"FN:Forrest Gump\r\n", self._readExport())
+
+    def testCardHashesCopyUnchangedCards(self):
+        self._writeInput(self.sForrest + self.sBubba)
+        self.assertEqual(self._main("--card-hashes"), 0)
+        # a marker of the same length, the unchanged VCard is copied from the old export with it
+        self._writeExport(self._readExport().replace(b"Forrest", b"F0rrest"))
+        self._writeInput(self.sForrest + self.sBubba.replace("shrimp", "shrimp boat"))
+        self.assertEqual(self._main("--card-hashes"), 0)
+        bExport = self._readExport()
+        self.assertIn(b"FN:F0rrest Gump\r\n", bExport)
+        self.assertIn(b"NOTE:shrimp boat\r\n", bExport)
+
+    def testFilesWithRejectsAreConvertedAgain(self):
+        self._writeInput(self.sForrest + "BEGIN:VCARD\r\nVERSION:3.0\r\nFN:Incomplete\r\n")
+        self.assertEqual(self._main("--lenient"), 0)
+        self.assertTrue(os.path.exists(os.path.join(self.sExportFolder, "contacts.rejected.vcf")))
+        self._writeExport(b"marker")
+        self.assertEqual(self._main("--lenient"), 0)
+        self.assertIn(b"FN:Forrest Gump\r\n", self._readExport())
+
+
+class TelephoneTest(unittest.TestCase):
+
+    def setUp(self):
+        objPatch = mock.patch.object(VCardTelephone, "_sDefaultCountryCode", None)
+        objPatch.start()
+        self.addCleanup(objPatch.stop)
+
+    def testNormalize(self):
+        self.assertEqual(VCardTelephone.normalize("tel:+1-418-656-9254;ext=102"),
+                         ("+14186569254", "14186569254", "102"))
+        self.assertEqual(VCardTelephone.normalize("+49 (0)30 1234567"), ("+49301234567", "49301234567", None))
+        self.assertEqual(VCardTelephone.normalize("0049 30 1234567 ext. 12"), ("+49301234567", "49301234567", "12"))
+        # national numbers need a country
+        self.assertEqual(VCardTelephone.normalize("030 1234567"), (None, "0301234567", None))
+        self.assertEqual(VCardTelephone.normalize("030 1234567", "49"), ("+49301234567", "49301234567", None))
+        self.assertEqual(VCardTelephone.normalize("(111) 555-1212 x102", "1"), ("+11115551212", "11115551212", "102"))
+        self.assertEqual(VCardTelephone.normalize("06 12345678", "39"), ("+390612345678", "390612345678", None))
+
+    def testInvalid(self):
+        self.assertEqual(VCardTelephone.normalize(""), (None, None, None))
+        self.assertEqual(VCardTelephone.normalize("n/a"), (None, None, None))
+        self.assertEqual(VCardTelephone.normalize("1-800-FLOWERS", "1"), (None, "1800", None))
+        self.assertEqual(VCardTelephone.normalize("112", "49"), (None, "112", None))
+        self.assertEqual(VCardTelephone.normalize("+49 30 1234567890123456"), (None, "49301234567890123456", None))
+        with self.assertRaises(ValueError):
+            VCardTelephone.setDefaultCountry("Germany")
+
+    def testDefaultCountry(self):
+        objTel = VCardTelephone("030/1234567")
+        self.assertIsNone(objTel.e164)
+        VCardTelephone.setDefaultCountry("DE")
+        self.assertEqual(objTel.e164, "+49301234567")
+        # the cached result of another country must not be returned
+        VCardTelephone.setDefaultCountry("+43")
+        self.assertEqual(objTel.e164, "+43301234567")
+        self.assertEqual(objTel.digits, "43301234567")
+        VCardTelephone.setDefaultCountry(None)
+        self.assertIsNone(objTel.e164)
+        self.assertEqual(objTel.digits, "0301234567")
+
+    def testNormalizeAll(self):
+        listVCards = [VCard.fromString(_card("FN:A", "TEL:030 1234567", "TEL:+1 418 656 9254")),
+                      VCard.fromString(_card("FN:B", "TEL:030 1234567"))]
+        VCardTelephone.setDefaultCountry("DE")
+        dictNumbers = VCardTelephone.normalizeAll(listVCards)
+        self.assertEqual(dictNumbers, {"030 1234567": ("+49301234567", "49301234567", None),
+                                       "+1 418 656 9254": ("+14186569254", "14186569254", None)})
+        dictNumbers = VCardTelephone.normalizeAll(listVCards, "FR")
+        self.assertEqual(dictNumbers["030 1234567"], ("+33301234567", "33301234567", None))
+        # the default country is not changed by normalizeAll
+        self.assertEqual(VCardTelephone._sDefaultCountryCode, "49")
+
+
+class CollectionTest(unittest.TestCase):
+
+    listCards = [_card("UID:Gump-1", "N:Gump;Forrest;;Mr.;", "FN:Forrest Gump", "ORG:Bubba Gump  Shrimp Co.",
+                       "TEL;WORK;VOICE:+49 30 1234567", "EMAIL;INTERNET:ForrestGump@example.com"),
+                 _card("N:Müller;Jürgen", "FN:Jürgen Müller", "TEL:030/1234567", "ORG:Acme Ltd."),
+                 _card("UID:3", "FN:Jenny Mueller", "EMAIL;INTERNET:mailto:forrestgump@EXAMPLE.com")]
+
+    def setUp(self):
+        self.listVCards = [VCard.fromString(sCard) for sCard in self.listCards]
+        self.objCollection = VCardCollection(self.listVCards)
+
+    def _assertIndexed(self):
+        # the indexes and the trie have to be the same as those of a collection built from scratch
+        objCollection = VCardCollection(self.objCollection)
+        for sIndex in VCardCollection._tupleIndexes:
+            self.assertEqual(self.objCollection.getKeys(sIndex), objCollection.getKeys(sIndex))
+        self.assertEqual(self._getWords(self.objCollection._dictTrie), self._getWords(objCollection._dictTrie))
+
+    def _getWords(self, dictNode, sWord=""):
+        dictWords = {}
+        for (sChar, objChild) in dictNode.items():
+            if sChar is None:
+                dictWords[sWord] = len(objChild)
+            else:
+                self.assertTrue(objChild, "empty node at %r" % (sWord + sChar))
+                dictWords.update(self._getWords(objChild, sWord + sChar))
+        return(dictWords)
+
+    def testFind(self):
+        (objGump, objMueller, objJenny) = self.listVCards
+        self.assertEqual(len(self.objCollection), 3)
+        self.assertIs(self.objCollection.findByUID(" gump-1 "), objGump)
+        self.assertIsNone(self.objCollection.findByUID("2"))
+        self.assertEqual(self.objCollection.findByEmail("FORRESTGUMP@example.com"), [objGump, objJenny])
+        self.assertEqual(self.objCollection.findByTel("tel:+49-30-1234567"), [objGump, objMueller])
+        self.assertEqual(self.objCollection.findByOrg("bubba gump shrimp co."), [objGump])
+        self.assertEqual(self.objCollection.findByOrg("Bubba"), [])
+        self.assertEqual(self.objCollection.getKeys("ORG"), {"bubba gump shrimp co.": 1, "acme ltd.": 1})
+
+    def testPrefix(self):
+        (objGump, objMueller, objJenny) = self.listVCards
+        self.assertEqual(self.objCollection.findByPrefix("Mü"), [objMueller, objJenny])
+        self.assertEqual(self.objCollection.findByPrefix("MULLER"), [objMueller])
+        self.assertEqual(self.objCollection.findByPrefix("mue"), [objJenny])
+        self.assertEqual(self.objCollection.findByPrefix("m", iLimit=1), [objMueller])
+        self.assertEqual(self.objCollection.findByPrefix("gump"), [objGump])
+        self.assertEqual(self.objCollection.findByPrefix("x"), [])
+        self.assertEqual(self.objCollection.findByPrefix(" "), [])
+
+    def testAddRemove(self):
+        (objGump, objMueller, objJenny) = self.listVCards
+        # a VCard added twice keeps its number
+        self.assertEqual(self.objCollection.add(objMueller), 1)
+        self.objCollection.remove(objMueller)
+        self.assertNotIn(objMueller, self.objCollection)
+        self.assertEqual(self.objCollection.findByTel("030 1234567"), [objGump])
+        self.assertEqual(self.objCollection.findByPrefix("mu"), [objJenny])
+        self.assertEqual(self.objCollection.getKeys("ORG"), {"bubba gump shrimp co.": 1})
+        self._assertIndexed()
+        with self.assertRaises(KeyError):
+            self.objCollection.remove(objMueller)
+        self.assertEqual(self.objCollection.add(objMueller), 3)
+        self.assertEqual(self.objCollection.findByPrefix("mu"), [objJenny, objMueller])
+        self._assertIndexed()
+        for objVCard in list(self.objCollection):
+            self.objCollection.remove(objVCard)
+        self.assertEqual(len(self.objCollection), 0)
+        self.assertEqual(self.objCollection._dictTrie, {})
+        for sIndex in VCardCollection._tupleIndexes:
+            self.assertEqual(self.objCollection.getKeys(sIndex), {})
+
+    def testUpdate(self):
+        (objGump, objMueller, objJenny) = self.listVCards
+        objJenny.setFN("FN:Jenny Curran")
+        objJenny.setORG("ORG:Acme  LTD.")
+        self.assertEqual(self.objCollection.update(objJenny), 2)
+        self.assertEqual(self.objCollection.findByPrefix("mue"), [])
+        self.assertEqual(self.objCollection.findByPrefix("cur"), [objJenny])
+        self.assertEqual(self.objCollection.findByOrg("acme ltd."), [objMueller, objJenny])
+        self._assertIndexed()
+
+
+class DiffTest(unittest.TestCase):
+
+    def setUp(self):
+        self._objTmpFolder = tempfile.TemporaryDirectory()
+        self.sOldFile = os.path.join(self._objTmpFolder.name, "old.vcf")
+        self.sNewFile = os.path.join(self._objTmpFolder.name, "new.vcf")
+        sForrest = _card("UID:1", "FN:Forrest Gump", "REV:20240101T000000Z", sVersion="3.0")
+        sBubba = _card("UID:2", "FN:Bubba Blue", "NOTE:shrimp", sVersion="3.0")
+        sJenny = _card("FN:Jenny Curran", "EMAIL:jenny@example.com", sVersion="3.0")
+        with open(self.sOldFile, "w", encoding="utf-8", newline="") as fhFile:
+            fhFile.write(sForrest + sBubba + sJenny)
+        with open(self.sNewFile, "w", encoding="utf-8", newline="") as fhFile:
+            fhFile.write(sForrest.replace("2024", "2025") + sBubba.replace("shrimp", "shrimp boat") +
+                         _card("FN:Dan Taylor", "TEL:+1 555 1234", sVersion="3.0"))
+
+    def tearDown(self):
+        self._objTmpFolder.cleanup()
+        logging.getLogger("vcard").setLevel(logging.CRITICAL)
+
+    def testChanges(self):
+        with VCardDiff(self.sOldFile, self.sNewFile) as objDiff:
+            listChanges = list(objDiff.iterChanges())
+            self.assertEqual(objDiff.dictCounts["unchanged"], 1)
+        self.assertEqual([(objChange.change, objChange.key) for objChange in listChanges],
+                         [("modified", "UID:2"), ("added", listChanges[1].key), ("removed", listChanges[2].key)])
+        self.assertEqual(listChanges[0].properties, ("NOTE",))
+        self.assertTrue(listChanges[1].key.startswith("FP:"))
+        self.assertIsNone(listChanges[1].oldOffset)
+        self.assertIn("EMAIL", listChanges[2].properties)
+        self.assertIsNone(listChanges[2].newOffset)
+
+    def testRevIsOnlyComparedIfNotIgnored(self):
+        with VCardDiff(self.sOldFile, self.sNewFile, tupleIgnore=()) as objDiff:
+            listChanges = list(objDiff.iterChanges())
+        self.assertEqual((listChanges[0].change, listChanges[0].key, listChanges[0].properties),
+                         ("modified", "UID:1", ("REV",)))
+
+    def testSameKeyForSameContact(self):
+        objOld = VCard.fromString(_card("FN:Jenny Curran", "EMAIL:Jenny@Example.com"))
+        objNew = VCard.fromString(_card("FN:Jenny Curran", "EMAIL:jenny@example.com", "NOTE:new"))
+        self.assertEqual(VCardDiff.getKey(objOld), VCardDiff.getKey(objNew))
+        self.assertNotEqual(VCardDiff.getKey(objOld), VCardDiff.getKey(VCard.fromString(_card("FN:Forrest Gump"))))
+
+    def testCommandLine(self):
+        sOutputFile = os.path.join(self._objTmpFolder.name, "changes.jsonl")
+        self.assertEqual(vcard.main(["diff", self.sOldFile, self.sNewFile, "-o", sOutputFile, "-q"]), 0)
+        with open(sOutputFile, "r", encoding="utf-8") as fhFile:
+            listChanges = [json.loads(sLine) for sLine in fhFile]
+        self.assertEqual([dictChange["change"] for dictChange in listChanges], ["modified", "added", "removed"])
+        self.assertEqual(listChanges[0]["properties"], ["NOTE"])
+
+
+class DeduplicatorTest(unittest.TestCase):
+
+    def _groups(self, listCards, **kwargs):
+        objDeduplicator = VCardDeduplicator(**kwargs)
+        objDeduplicator.addAll(VCard.fromString(sCard) for sCard in listCards)
+        return([[objVCard.getProperty("FN") for objVCard in listGroup] for listGroup in objDeduplicator.iterGroups()])
+
+    def testSameEmailOrUID(self):
+        self.assertEqual(self._groups([_card("FN:Jane Doe", "EMAIL:jane@example.com"),
+                                       _card("FN:J. Doe", "EMAIL:Jane@Example.com"),
+                                       _card("FN:Other", "UID:1"), _card("FN:Other 2", "UID:1")]),
+                         [["Jane Doe", "J. Doe"], ["Other", "Other 2"]])
+
+    def testSharedTelNeedsSameName(self):
+        # a switchboard number is shared by a lot of contacts, so it is no duplicate on its own
+        self.assertEqual(self._groups([_card("FN:Jane Doe", "TEL:+49 30 1234567"),
+                                       _card("FN:Other", "TEL:+49 30 1234567"),
+                                       _card("FN:Doe Jane", "TEL:030 1234567")]),
+                         [["Jane Doe", "Doe Jane"], ["Other"]])
+
+    def testTransitiveGroups(self):
+        self.assertEqual(self._groups([_card("FN:A", "EMAIL:a@example.com"),
+                                       _card("FN:B", "EMAIL:b@example.com"),
+                                       _card("FN:C", "EMAIL:a@example.com", "EMAIL:b@example.com")]),
+                         [["A", "B", "C"]])
+
+    def testNameKey(self):
+        listCards = [_card("FN:Dr. Jürgen Müller"), _card("N:Muller;Jurgen;;;")]
+        self.assertEqual(self._groups(listCards), [["Dr. Jürgen Müller"], [None]])
+        self.assertEqual(len(self._groups(listCards, tupleKeys=("NAME",))), 1)
+
+    def testMergeNewest(self):
+        objDeduplicator = VCardDeduplicator(objPolicy=VCardMergePolicy("newest"))
+        objDeduplicator.addAll([VCard.fromString(_card("FN:New", "EMAIL:a@example.com", "REV:20240101T000000Z")),
+                                VCard.fromString(_card("FN:Old", "EMAIL:a@example.com", "EMAIL:b@example.com",
+                                                       "REV:20200101T000000Z"))])
+        (objVCard,) = list(objDeduplicator.iterMerged())
+        self.assertEqual(objVCard.getProperty("FN"), "New")
+        self.assertEqual(sorted(objMail.address for objMail in objVCard.getProperty("EMAIL")),
+                         ["a@example.com", "b@example.com"])
+
+    def testMergeNewestMixedRev(self):
+        # in UTC: 10:00, 11:00, 2008, 11:30 and no REV, compared by their digits the first one would be the newest
+        listRevs = ["20240101T120000+0200", "20240101T110000Z", "2008-04-24T19:52:43Z", "2024-01-01T06:30:00-05:00",
+                    None]
+        listVCards = [VCard.fromString(_card("FN:Card %d" % i, "EMAIL:a@example.com",
+                                             *(["REV:%s" % sRev] if sRev else [])))
+                      for (i, sRev) in enumerate(listRevs)]
+        listKeys = [VCardMergePolicy._getRevKey(objVCard) for objVCard in listVCards]
+        self.assertEqual(listKeys[0], listKeys[1] - datetime.timedelta(hours=1))
+        self.assertEqual(listKeys[2], datetime.datetime(2008, 4, 24, 19, 52, 43, tzinfo=datetime.timezone.utc))
+        self.assertEqual(sorted(range(5), key=listKeys.__getitem__), [4, 2, 0, 1, 3])
+        # REV without time zone is UTC
+        objVCard = VCard.fromString(_card("FN:x", "REV:20240101T110000"))
+        self.assertEqual(VCardMergePolicy._getRevKey(objVCard), listKeys[1])
+        for listOrder in (listVCards, listVCards[::-1]):
+            objDeduplicator = VCardDeduplicator(objPolicy=VCardMergePolicy("newest"))
+            objDeduplicator.addAll(listOrder)
+            (objVCard,) = list(objDeduplicator.iterMerged())
+            self.assertEqual(objVCard.getProperty("FN"), "Card 3")
+
+
+class CacheTest(unittest.TestCase):
+
+    bCard = _card("FN:Forrest Gump", "TEL;CELL:0170 1234567").encode("utf-8")
+
+    def setUp(self):
+        self._objTmpFolder = tempfile.TemporaryDirectory()
+        self.sCachePath = os.path.join(self._objTmpFolder.name, "cache.sqlite")
+
+    def tearDown(self):
+        self._objTmpFolder.cleanup()
+
+    def testHitAndMiss(self):
+        listCalls = []
+
+        def refConvert():
+            listCalls.append(1)
+            return(b"converted")
+        with VCardParseCache(self.sCachePath) as objCache:
+            self.assertEqual(objCache.getOutput(self.bCard, "keep", refConvert), b"converted")
+            self.assertEqual(objCache.getOutput(self.bCard, "keep", refConvert), b"converted")
+            # other options are another entry
+            objCache.getOutput(self.bCard, "drop", refConvert)
+            self.assertEqual((objCache.iHits, objCache.iMisses, len(listCalls)), (1, 2, 2))
+        with VCardParseCache(self.sCachePath) as objCache:
+            objCache.getOutput(self.bCard, "keep", refConvert)
+            self.assertEqual((objCache.iHits, objCache.iMisses, len(listCalls)), (1, 0, 2))
+
+    def testParsedVCards(self):
+        with VCardParseCache(self.sCachePath) as objCache:
+            sOutput = objCache.getVCard(self.bCard).prettyPrint()
+            self.assertEqual(objCache.getVCard(self.bCard).prettyPrint(), sOutput)
+            objVCard = objCache.getVCard(self.bCard, bLazy=True)
+            self.assertEqual((objCache.iHits, objCache.iMisses), (1, 2))
+            objVCard = objCache.getVCard(self.bCard, bLazy=True)
+            # still lazy, when it is taken from the cache
+            self.assertIn("TEL", objVCard._pending)
+            self.assertEqual(objVCard.prettyPrint(), sOutput)
+
+    def testOtherSignatureClearsCache(self):
+        with VCardParseCache(self.sCachePath) as objCache:
+            objCache.getOutput(self.bCard, "", lambda: b"converted")
+        with mock.patch.object(VCardParseCache, "_iCacheFormat", 0):
+            with VCardParseCache(self.sCachePath) as objCache:
+                objCache.getOutput(self.bCard, "", lambda: b"converted")
+                self.assertEqual((objCache.iHits, objCache.iMisses), (0, 1))
+
+    def testSameKeyIsCountedOnce(self):
+        with VCardParseCache(self.sCachePath) as objCache:
+            bKey = VCardParseCache._getKey(self.bCard)
+            objCache._put(bKey, b"x" * 100)
+            objCache._put(bKey, b"x" * 100)
+            self.assertEqual(objCache.getStatistics()["bytes"], len(bKey) + 100)
+
+    def testEvictsLeastRecentlyUsed(self):
+        listCards = [_card("FN:%d" % i).encode("utf-8") for i in range(10)]
+        with VCardParseCache(self.sCachePath, iMaxBytes=1000, iCommitEvery=1) as objCache:
+            for bCard in listCards:
+                objCache.getOutput(bCard, "", lambda: b"x" * 100)
+                # the first VCard is used again and again, so it stays
+                objCache.getOutput(listCards[0], "", lambda: b"x" * 100)
+            self.assertGreater(objCache.iEvictions, 0)
+            self.assertLessEqual(objCache.getStatistics()["bytes"], 1000)
+            iMisses = objCache.iMisses
+            objCache.getOutput(listCards[0], "", lambda: b"x" * 100)
+            self.assertEqual(objCache.iMisses, iMisses)
+            objCache.getOutput(listCards[1], "", lambda: b"x" * 100)
+            self.assertEqual(objCache.iMisses, iMisses + 1)
+
+    def testCommandLine(self):
+        sInputFolder = os.path.join(self._objTmpFolder.name, "in")
+        os.mkdir(sInputFolder)
+        for i in range(3):
+            with open(os.path.join(sInputFolder, "%d.vcf" % i), "w", encoding="utf-8", newline="") as fhFile:
+                fhFile.write(_card("FN:Contact %d" % i))
+        try:
+            # the second run takes all VCards from the cache
+            for iHits in (0, 3):
+                with self.assertLogs("vcard", "INFO") as objLogs:
+                    self.assertEqual(vcard.main(["-i", sInputFolder, "--cache", self.sCachePath]), 0)
+                self.assertIn("INFO:vcard:cache: %d hit(s), %d miss(es), 0 eviction(s)" % (iHits, 3 - iHits), objLogs.output)
+        finally:
+            logging.getLogger("vcard").setLevel(logging.CRITICAL)
+
+
+class ColumnsTest(unittest.TestCase):
+
+    listCards = [_card("UID:1", "N:Gump;Forrest;;Mr.;", "FN:Forrest Gump", "ORG:Bubba Gump Shrimp Co.",
+                       "TEL;WORK;VOICE:(111) 555-1212", "TEL;CELL:0170 1234567",
+                       "EMAIL;PREF;INTERNET:forrestgump@example.com",
+                       "ADR;WORK;PREF:;;100 Waters Edge;Baytown;LA;30314;United States of America"),
+                 _card("FN:Jenny Curran", "NOTE:no columns", "ADR;ENCODING=QUOTED-PRINTABLE:;;Line 1=0D=0ALine 2;Greenbow, Alabama;;;")]
+
+    def _columns(self):
+        objColumns = VCardColumns()
+        objColumns.addAll(VCard.fromString(sCard) for sCard in self.listCards)
+        return(objColumns)
+
+    def testColumns(self):
+        objColumns = self._columns()
+        self.assertEqual(len(objColumns), 2)
+        dictContacts = objColumns.getColumns("contacts")
+        self.assertEqual(dictContacts["card"], [0, 1])
+        self.assertEqual(dictContacts["UID"], ["1", None])
+        self.assertEqual(dictContacts["surname"], ["Gump", None])
+        self.assertEqual(dictContacts["ORG"], ["Bubba Gump Shrimp Co.", None])
+        dictPhones = objColumns.getColumns("phones")
+        self.assertEqual(dictPhones["card"], [0, 0])
+        self.assertEqual(dictPhones["type"], ["work,voice", "cell"])
+        self.assertEqual(objColumns.getColumns("emails")["pref"], [True])
+        dictAddresses = objColumns.getColumns("addresses")
+        self.assertEqual(dictAddresses["card"], [0, 1])
+        self.assertEqual(dictAddresses["pref"], [True, False])
+        # the numbers of the VCards go on after "clear"
+        objColumns.clear()
+        objColumns.add(VCard.fromString(self.listCards[1]))
+        self.assertEqual(objColumns.getColumns("contacts")["card"], [2])
+        self.assertEqual(objColumns.getColumns("phones")["card"], [])
+
+    def testExportCSV(self):
+        with tempfile.TemporaryDirectory() as sFolder:
+            sPrefix = os.path.join(sFolder, "export-")
+            listVCards = [VCard.fromString(sCard) for sCard in self.listCards * 3]
+            # the parser keeps line breaks escaped, a value with a real one is set directly
+            listVCards[5]._org = "Greenbow\r\nAlabama"
+            iCards = VCardColumns.exportCSV(iter(listVCards), sPrefix, iBatchSize=2)
+            self.assertEqual(iCards, 6)
+            dictTables = {}
+            for sTable in ("contacts", "emails", "phones", "addresses"):
+                with open("%s%s.csv" % (sPrefix, sTable), "r", encoding="utf-8", newline="") as fhFile:
+                    dictTables[sTable] = list(csv.reader(fhFile))
+        self.assertEqual(dictTables["contacts"][0], ["card", "UID", "FN", "surname", "givenName", "ORG", "TITLE"])
+        self.assertEqual([listRow[0] for listRow in dictTables["contacts"][1:]], ["0", "1", "2", "3", "4", "5"])
+        self.assertEqual(len(dictTables["phones"]), 7)
+        # a comma and a line break in a value are quoted, so they come back as they were
+        listRow = dictTables["addresses"][2]
+        self.assertEqual(listRow[0], "1")
+        self.assertIn("Greenbow, Alabama", listRow)
+        self.assertIn("Line 1\\nLine 2", listRow)
+        self.assertEqual(dictTables["contacts"][6][5], "Greenbow\r\nAlabama")
+
+    def testWithoutNumPy(self):
+        with mock.patch.dict(sys.modules, {"numpy": None}):
+            with self.assertRaises(ImportError):
+                self._columns().toNumPy("contacts")
+
+    def testNumPy(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("NumPy is not installed")
+        dictArrays = self._columns().toNumPy("phones")
+        self.assertEqual(dictArrays["card"].dtype, numpy.int64)
+        self.assertEqual(list(dictArrays["number"]), ["(111) 555-1212", "0170 1234567"])
+
+
+class ShardTest(unittest.TestCase):
+
+    def setUp(self):
+        self._objTmpFolder = tempfile.TemporaryDirectory()
+        self.sFolder = self._objTmpFolder.name
+        self.listVCards = [VCard.fromString(_card("UID:%d" % i, "FN:Contact %d" % i)) for i in range(5)]
+
+    def tearDown(self):
+        self._objTmpFolder.cleanup()
+
+    def testMaxCards(self):
+        with VCardShardWriter(self.sFolder, iMaxCards=2) as objShards:
+            self.assertEqual(objShards.writeAll(self.listVCards), 5)
+        self.assertEqual(sorted(os.listdir(self.sFolder)),
+                         ["contacts-00001.v4.vcf", "contacts-00002.v4.vcf", "contacts-00003.v4.vcf"])
+        self.assertEqual([len(VCard.fromFile(sFilePath)) for sFilePath in objShards.listShards], [2, 2, 1])
+
+    def testStaleShardsAreRemoved(self):
+        with VCardShardWriter(self.sFolder, iMaxCards=1) as objShards:
+            objShards.writeAll(self.listVCards)
+        with open(os.path.join(self.sFolder, "other.vcf"), "w") as fhFile:
+            fhFile.write(_card("FN:Other"))
+        with VCardShardWriter(self.sFolder, iMaxCards=3) as objShards:
+            objShards.writeAll(self.listVCards)
+        self.assertEqual(sorted(os.listdir(self.sFolder)), ["contacts-00001.v4.vcf", "contacts-00002.v4.vcf", "other.vcf"])
+
+    def testInterruptedRunKeepsEarlierShards(self):
+        with VCardShardWriter(self.sFolder, iMaxCards=1) as objShards:
+            objShards.writeAll(self.listVCards)
+        with self.assertRaises(KeyboardInterrupt):
+            with VCardShardWriter(self.sFolder, iMaxCards=2) as objShards:
+                objShards.writeAll(self.listVCards)
+                raise(KeyboardInterrupt())
+        self.assertEqual(sorted(os.listdir(self.sFolder)), ["contacts-%05d.v4.vcf" % i for i in range(1, 6)])
+        self.assertEqual(len(VCard.fromFile(os.path.join(self.sFolder, "contacts-00001.v4.vcf"))), 1)
+
+    def testCreatesFolder(self):
+        sFolder = os.path.join(self.sFolder, "new", "shards")
+        with VCardShardWriter(sFolder, iMaxCards=10) as objShards:
+            objShards.writeAll(self.listVCards)
+        self.assertEqual(os.listdir(sFolder), ["contacts-00001.v4.vcf"])
+
+    def testCommandLineSkipsFailingFile(self):
+        sInputFolder = os.path.join(self.sFolder, "in")
+        os.mkdir(sInputFolder)
+        with open(os.path.join(sInputFolder, "a.vcf"), "w", encoding="utf-8", newline="") as fhFile:
+            fhFile.write(_card("FN:Good 1") + _card("FN:Good 2"))
+        with open(os.path.join(sInputFolder, "b.vcf"), "w", encoding="utf-8", newline="") as fhFile:
+            fhFile.write(_card("FN:Bad 1") + _card("FN:Bad 2", "EMAIL;TYPE=:bad@example.com"))
+        try:
+            self.assertEqual(vcard.main(["-i", sInputFolder, "-o", self.sFolder, "-export", "-q",
+                                         "--shard-cards", "10"]), 1)
+        finally:
+            logging.getLogger("vcard").setLevel(logging.CRITICAL)
+        self.assertEqual(sorted(os.listdir(self.sFolder)), ["contacts-00001.v4.vcf", "in"])
+        listVCards = VCard.fromFile(os.path.join(self.sFolder, "contacts-00001.v4.vcf"))
+        self.assertEqual([objVCard.getProperty("FN") for objVCard in listVCards], ["Good 1", "Good 2"])
+
+    def testPerUID(self):
+        with VCardShardWriter(self.sFolder, bPerUID=True) as objShards:
+            objShards.writeAll(self.listVCards[:2] + [VCard.fromString(_card("UID:1", "FN:Same UID"))])
+        self.assertEqual(sorted(os.listdir(self.sFolder)), ["0.v4.vcf", "1-2.v4.vcf", "1.v4.vcf"])
+
+    def testWriteBytes(self):
+        fhOut = io.BytesIO()
+        with VCardWriter(fhOut) as objWriter:
+            objWriter.writeAll(self.listVCards)
+        with VCardShardWriter(self.sFolder, iMaxCards=4) as objShards:
+            objShards.writeBytes(fhOut.getvalue())
+            with self.assertRaises(ValueError):
+                objShards.writeBytes(fhOut.getvalue() + b"BEGIN:VCARD\r\nVERSION:4.0\r\n")
+        self.assertEqual(objShards.iCardsWritten, 5)
+        with open(objShards.listShards[0], "rb") as fhShard:
+            self.assertEqual(fhShard.read().count(b"BEGIN:VCARD\r\n"), 4)
+
+
+class SummaryTest(unittest.TestCase):
+
+    listCards = [_card("FN:Contact %d" % i, "LABEL:Somewhere", "LABEL:Elsewhere", "FOO:bar") for i in range(20)]
+
+    def setUp(self):
+        VCard.summary.reset()
+        self._objTmpFolder = tempfile.TemporaryDirectory()
+        self.sInputFolder = os.path.join(self._objTmpFolder.name, "in")
+        self.sExportFolder = os.path.join(self._objTmpFolder.name, "out")
+        os.mkdir(self.sInputFolder)
+        os.mkdir(self.sExportFolder)
+        with open(os.path.join(self.sInputFolder, "big.vcf"), "w", encoding="utf-8", newline="") as fhFile:
+            fhFile.write("".join(self.listCards))
+        # the file is split into ranges, which are parsed by the workers with -j
+        for (sName, iSize) in (("_iMaxRangeSize", 200), ("_iMinRangeSize", 100)):
+            objPatch = mock.patch.object(vcard, sName, iSize)
+            objPatch.start()
+            self.addCleanup(objPatch.stop)
+
+    def tearDown(self):
+        self._objTmpFolder.cleanup()
+        logging.getLogger("vcard").setLevel(logging.CRITICAL)
+
+    def _main(self, *listArguments):
+        return(vcard.main(["-i", self.sInputFolder, "-o", self.sExportFolder, "-export"] + list(listArguments)))
+
+    def testCounts(self):
+        with self.assertLogs("vcard", "WARNING") as objLogs:
+            VCard.fromString(self.listCards[0])
+        # the second LABEL is dropped without another warning
+        self.assertEqual(len(objLogs.records), 2)
+        self.assertIn("'LABEL'", objLogs.records[0].getMessage())
+        self.assertIn("'FOO'", objLogs.records[1].getMessage())
+        self.assertEqual(VCard.summary.asDict(), {"cardsParsed": 1, "propertiesDropped": 3,
+                                                  "warnings": {"label": 1, "unknown-property": 1}})
+
+    def testMergedFromWorkers(self):
+        sExpected = "summary: 20 VCard(s) parsed, 60 propertie(s) dropped, warnings: label: 20, unknown-property: 20"
+        for sJobs in ("1", "2"):
+            with self.assertLogs("vcard", "INFO") as objLogs:
+                self.assertEqual(self._main("-j", sJobs), 0)
+            listSummaries = [objRecord.getMessage() for objRecord in objLogs.records
+                             if objRecord.getMessage().startswith("summary:")]
+            self.assertEqual(listSummaries, [sExpected], "-j %s" % sJobs)
+
+    def testLogLevel(self):
+        with self.assertLogs("vcard", "DEBUG") as objLogs:
+            self.assertEqual(self._main("--log-level", "WARNING"), 0)
+        self.assertEqual(set(objRecord.levelname for objRecord in objLogs.records), {"WARNING"})
+        self.assertEqual(len(objLogs.records), 40)
+        # -q only logs errors, a file, which fails, is logged anyway
+        with open(os.path.join(self.sInputFolder, "bad.vcf"), "w", encoding="utf-8", newline="") as fhFile:
+            fhFile.write(_card("FN:Bad", "EMAIL;TYPE=:bad@example.com"))
+        with self.assertLogs("vcard", "DEBUG") as objLogs:
+            self.assertEqual(self._main("-q"), 1)
+        self.assertTrue(objLogs.records)
+        self.assertEqual(set(objRecord.levelname for objRecord in objLogs.records), {"ERROR"})
+
+
+class StatisticsTest(unittest.TestCase):
+
+    def tearDown(self):
+        VCard.statistics.disable()
+        logging.getLogger("vcard").setLevel(logging.CRITICAL)
+
+    def testEnableAndDisable(self):
+        refFromString = VCard.__dict__["fromString"]
+        VCard.statistics.enable()
+        VCard.statistics.reset()
+        VCard.fromString(_card("FN:Forrest Gump", "TEL:1")).prettyPrint()
+        dictStatistics = VCard.statistics.asDict()
+        self.assertEqual(dictStatistics["stages"]["parse"]["calls"], 1)
+        self.assertEqual(dictStatistics["properties"]["TEL"]["parsed"], 1)
+        VCard.statistics.disable()
+        self.assertIs(VCard.__dict__["fromString"], refFromString)
+
+    def testCommandLineDisablesStatistics(self):
+        with tempfile.TemporaryDirectory() as sFolder:
+            with open(os.path.join(sFolder, "contacts.vcf"), "w", encoding="utf-8") as fhFile:
+                fhFile.write(_card("FN:Forrest Gump", "TEL:1"))
+            sStatisticsFile = os.path.join(sFolder, "stats.json")
+            self.assertEqual(vcard.main(["-i", sFolder, "-q", "-j", "1", "--stats", sStatisticsFile]), 0)
+            with open(sStatisticsFile, "r", encoding="utf-8") as fhFile:
+                dictStatistics = json.load(fhFile)
+        self.assertEqual(dictStatistics["stages"]["parse"]["calls"], 1)
+        self.assertFalse(VCard.statistics.enabled)
+
+    def testStatisticsToStdout(self):
+        with tempfile.TemporaryDirectory() as sFolder:
+            with open(os.path.join(sFolder, "contacts.vcf"), "w", encoding="utf-8") as fhFile:
+                fhFile.write(_card("FN:Forrest Gump", "TEL:1", "LABEL:dropped"))
+            fhStdout = io.StringIO()
+            # without handlers, so "main" configures the logging
+            listHandlers = logging.root.handlers[:]
+            logging.root.handlers = []
+            try:
+                with contextlib.redirect_stdout(fhStdout):
+                    self.assertEqual(vcard.main(["-i", sFolder, "--log-level", "INFO", "--stats", "-"]), 0)
+            finally:
+                logging.root.handlers = listHandlers
+        # the log does not get into the JSON
+        dictStatistics = json.loads(fhStdout.getvalue())
+        self.assertEqual(dictStatistics["stages"]["parse"]["calls"], 1)
+
+
+class RangeTest(unittest.TestCase):
+
+    listCards = [_card("FN:Contact %d" % i, "NOTE:Jürgen Müller") for i in range(20)]
+
+    def setUp(self):
+        self._objTmpFolder = tempfile.TemporaryDirectory()
+        self.sInputFolder = os.path.join(self._objTmpFolder.name, "in")
+        self.sExportFolder = os.path.join(self._objTmpFolder.name, "out")
+        os.mkdir(self.sInputFolder)
+        os.mkdir(self.sExportFolder)
+        self._writeInput("big.vcf", "".join(self.listCards))
+        # files bigger than 200 bytes are split
+        for (sName, iSize) in (("_iMaxRangeSize", 200), ("_iMinRangeSize", 100)):
+            objPatch = mock.patch.object(vcard, sName, iSize)
+            objPatch.start()
+            self.addCleanup(objPatch.stop)
+
+    def tearDown(self):
+        self._objTmpFolder.cleanup()
+        logging.getLogger("vcard").setLevel(logging.CRITICAL)
+
+    def _writeInput(self, sFileName, sData):
+        with open(os.path.join(self.sInputFolder, sFileName), "w", encoding="utf-8", newline="") as fhFile:
+            fhFile.write(sData)
+
+    def _readExport(self, sFileName):
+        with open(os.path.join(self.sExportFolder, sFileName), "rb") as fhFile:
+            return(fhFile.read())
+
+    def testRangesStartAtBeginVCard(self):
+        sFilePath = os.path.join(self.sInputFolder, "big.vcf")
+        listRanges = vcard._getFileRanges(sFilePath, 200)
+        self.assertGreater(len(listRanges), 5)
+        with open(sFilePath, "rb") as fhFile:
+            bData = fhFile.read()
+        self.assertEqual(listRanges[0][0], 0)
+        self.assertIsNone(listRanges[-1][1])
+        for i in range(1, len(listRanges)):
+            self.assertEqual(listRanges[i][0], listRanges[i - 1][1])
+            self.assertTrue(bData.startswith(b"BEGIN:VCARD", listRanges[i][0]))
+
+    def testSameOutputAsWithoutRanges(self):
+        bExpected = b"".join(VCard.fromString(sCard).prettyPrint().replace("\n", "\r\n").encode("utf-8")
+                             for sCard in self.listCards)
+        with mock.patch.object(vcard, "_convertFileRange", wraps=vcard._convertFileRange) as objConvert:
+            self.assertEqual(vcard.main(["-i", self.sInputFolder, "-o", self.sExportFolder, "-export", "-q"]), 0)
+        self.assertGreater(objConvert.call_count, 5)
+        self.assertEqual(self._readExport("big.v4.vcf"), bExpected)
+        os.remove(os.path.join(self.sExportFolder, "big.v4.vcf"))
+        # the ranges are parsed by the workers, but written in order
+        self.assertEqual(vcard.main(["-i", self.sInputFolder, "-o", self.sExportFolder, "-export", "-q", "-j", "2"]), 0)
+        self.assertEqual(self._readExport("big.v4.vcf"), bExpected)
+
+    def testFailingFile(self):
+        # the last range of the file fails, the other files are written anyway
+        self._writeInput("bad.vcf", "".join(self.listCards) + _card("FN:Bad", "EMAIL;TYPE=:bad@example.com"))
+        self.assertEqual(vcard.main(["-i", self.sInputFolder, "-o", self.sExportFolder, "-export", "-q"]), 1)
+        self.assertEqual(sorted(os.listdir(self.sExportFolder)), ["big.v4.vcf"])
+        self.assertEqual(self._readExport("big.v4.vcf").count(b"BEGIN:VCARD"), 20)
+
+    def testFailingFileIsNotInShards(self):
+        self._writeInput("bad.vcf", "".join(self.listCards) + _card("FN:Bad", "EMAIL;TYPE=:bad@example.com"))
+        self.assertEqual(vcard.main(["-i", self.sInputFolder, "-o", self.sExportFolder, "-export", "-q",
+                                     "--shard-cards", "1000"]), 1)
+        self.assertEqual(sorted(os.listdir(self.sExportFolder)), ["contacts-00001.v4.vcf"])
+        self.assertEqual(self._readExport("contacts-00001.v4.vcf").count(b"BEGIN:VCARD"), 20)
+
+
+class PhotoTest(unittest.TestCase):
+
+    bImage = b"\xff\xd8\xff\xe0\x00\x10JFIF\x00" * 10
+    sBase64 = base64.b64encode(bImage).decode("ascii")
+
+    def testIndentedBase64OfV21(self):
+        listLines = ["FN:Forrest Gump", "PHOTO;ENCODING=BASE64;TYPE=JPEG:"]
+        listLines += ["    " + self.sBase64[i:i + 40] for i in range(0, len(self.sBase64), 40)]
+        objVCard = VCard.fromString(_card(*listLines + [""]))
+        self.assertEqual(objVCard.photo.data, self.sBase64)
+        self.assertEqual(objVCard.photo.getBytes(), self.bImage)
+        self.assertIn("PHOTO:data:image/jpeg;base64,%s\n" % self.sBase64, objVCard.prettyPrint())
+
+    def testBase64OfV30BecomesDataUri(self):
+        objVCard = VCard.fromString(_card("PHOTO;ENCODING=b;TYPE=image/png:" + self.sBase64, sVersion="3.0"))
+        self.assertTrue(objVCard.photo.isInline())
+        self.assertEqual(objVCard.photo.getFileExtension(), "png")
+        sOutput = objVCard.prettyPrint()
+        self.assertIn("PHOTO:data:image/png;base64,%s\n" % self.sBase64, sOutput)
+        # the data uri of v4.0 is read again as it is
+        objParsed = VCard.fromString(sOutput)
+        self.assertEqual(objParsed.photo.getBytes(), self.bImage)
+        self.assertEqual(objParsed.photo.getMediaType(), "image/png")
+        self.assertEqual(objParsed.prettyPrint(), sOutput)
+
+    def testLink(self):
+        objVCard = VCard.fromString(_card("PHOTO;VALUE=URL;TYPE=GIF:http://www.example.com/photo.gif"))
+        self.assertFalse(objVCard.photo.isInline())
+        self.assertIsNone(objVCard.photo.getBytes())
+        self.assertIn("PHOTO;MEDIATYPE=image/gif:http://www.example.com/photo.gif\n", objVCard.prettyPrint())
+
+    def _convert(self, sPhotos):
+        # returns the export and the other files of the export folder
+        with tempfile.TemporaryDirectory() as sFolder:
+            sInputFolder = os.path.join(sFolder, "in")
+            sExportFolder = os.path.join(sFolder, "out")
+            os.mkdir(sInputFolder)
+            os.mkdir(sExportFolder)
+            with open(os.path.join(sInputFolder, "contacts.vcf"), "w", encoding="utf-8", newline="") as fhFile:
+                fhFile.write(_card("UID:forrest", "FN:Forrest Gump", "PHOTO;ENCODING=BASE64;TYPE=JPEG:" + self.sBase64, ""))
+                fhFile.write(_card("FN:Jenny Curran", "PHOTO;ENCODING=b;TYPE=image/png:" + self.sBase64, "", sVersion="3.0"))
+            try:
+                self.assertEqual(vcard.main(["-i", sInputFolder, "-o", sExportFolder, "-export", "-q",
+                                             "--photos", sPhotos]), 0)
+            finally:
+                logging.getLogger("vcard").setLevel(logging.CRITICAL)
+            with open(os.path.join(sExportFolder, "contacts.v4.vcf"), "rb") as fhFile:
+                bExport = fhFile.read()
+            dictFiles = {}
+            for sFileName in os.listdir(sExportFolder):
+                if (sFileName != "contacts.v4.vcf"):
+                    with open(os.path.join(sExportFolder, sFileName), "rb") as fhFile:
+                        dictFiles[sFileName] = fhFile.read()
+        return(bExport, dictFiles)
+
+    def testCommandLineKeep(self):
+        (bExport, dictFiles) = self._convert("keep")
+        self.assertEqual(bExport.count(b"PHOTO:data:"), 2)
+        self.assertEqual(dictFiles, {})
+
+    def testCommandLineDrop(self):
+        (bExport, dictFiles) = self._convert("drop")
+        self.assertNotIn(b"PHOTO", bExport)
+        self.assertEqual(bExport.count(b"BEGIN:VCARD"), 2)
+        self.assertEqual(dictFiles, {})
+
+    def testCommandLineExtract(self):
+        (bExport, dictFiles) = self._convert("extract")
+        self.assertNotIn(b"PHOTO", bExport)
+        # named by the UID or, without UID, by the file and the offset of the VCard
+        iOffset = len(_card("UID:forrest", "FN:Forrest Gump", "PHOTO;ENCODING=BASE64;TYPE=JPEG:" + self.sBase64, ""))
+        self.assertEqual(dictFiles, {"forrest.jpeg": self.bImage, "contacts_%d.png" % iOffset: self.bImage})
+
+
+class OutputTest(unittest.TestCase):
+    """
+    the differences to the output of older versions, which are intended
+    """
+
+    def testBareTypeBecomesType(self):
+        self.assertIn("TEL;TYPE=cell:0170 1234567", VCard.fromString(_card("TEL;CELL:0170 1234567")).prettyPrint())
+
+    def testCustomPropertyUppercase(self):
+        sOutput = VCard.fromString(_card("x-custom;type=home:value")).prettyPrint()
+        self.assertIn("X-CUSTOM;TYPE=home:value", sOutput)
+
+    def testNoneIsNotPrinted(self):
+        sOutput = VCard.fromString(_card("FN:Forrest Gump")).prettyPrint()
+        self.assertNotIn("None", sOutput)
+        self.assertNotIn("ORG", sOutput)
+        self.assertNotIn("TITLE", sOutput)
+        sOutput = VCard.fromString(_card("FN:Forrest Gump", "ORG:Bubba Gump", "TITLE:Captain")).prettyPrint()
+        self.assertIn("ORG:Bubba Gump\n", sOutput)
+        self.assertIn("TITLE:Captain\n", sOutput)
+
+    def testWikiExample(self):
+        listVCards = VCard.fromFile(os.path.join(sTestDataFolder, "vcard_21_wiki-example.vcf"))
+        self.assertEqual(len(listVCards), 1)
+        sOutput = listVCards[0].prettyPrint()
+        self.assertTrue(sOutput.startswith("BEGIN:VCARD\nVERSION:4.0\n"))
+        self.assertIn("TEL;TYPE=work,voice:(111) 555-1212", sOutput)
+        self.assertIn("ADR;TYPE=work,pref:;;100 Waters Edge;Baytown;LA;30314;United States of America", sOutput)
+        self.assertIn("PHOTO;MEDIATYPE=image/gif:http://www.example.com/dir_photos/my_photo.gif", sOutput)
+        # LABEL is not a property of v4.0
+        self.assertNotIn("LABEL", sOutput)
+
+
+if __name__ == "__main__":
+    unittest.main()
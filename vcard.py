@@ -5,13 +5,656 @@ last modified: 2017-08-24
 """
 
 import os
-from collections import OrderedDict
+from collections import Counter, OrderedDict, namedtuple
+import binascii
+import bisect
+import codecs
+import copy
+import csv
+import datetime
+import functools
+import hashlib
+import io
+import json
+import logging
+import mmap
+import pickle
 import re
+import sqlite3
+import sys
+import tempfile
+import time
+import unicodedata
+import urllib.parse
+
+logger = logging.getLogger("vcard")
+
+
+# parsed parameters of a property line, see "VCard.parseParameters"
+VCardParameters = namedtuple("VCardParameters", ["TYPE", "PREF", "CHARSET", "ENCODING", "VALUE", "MEDIATYPE", "other"])
+
+
+# a difference found by VCardDiff, change is "added", "removed" or "modified", properties are the
+# names of the changed properties (of all properties, if the VCard was added or removed)
+VCardChange = namedtuple("VCardChange", ("change", "key", "oldOffset", "newOffset", "properties"))
+
+# a VCard, which was rejected in lenient mode, see "VCardRejects"
+VCardError = namedtuple("VCardError", ["filePath", "offset", "length", "error", "message", "line"])
+
+
+class VCardParseError(ValueError):
+    """
+    raised if a VCard could not be parsed, sLine is the line which caused it (if known)
+    """
+
+    def __init__(self, sMessage, sLine=None):
+        ValueError.__init__(self, sMessage)
+        self.sLine = sLine
+
+
+class _TranscodingReader:
+    """
+    file like object, which returns the content of a file in another encoding as UTF-8 bytes
+    """
+
+    def __init__(self, fhFile, sEncoding):
+        self._fhFile = fhFile
+        self._objDecoder = codecs.getincrementaldecoder(sEncoding)()
+
+    def read(self, iSize=-1):
+        bData = self._fhFile.read(iSize)
+        bFinal = (iSize is None) or (iSize < 0) or (len(bData) == 0)
+        sData = self._objDecoder.decode(bData, final=bFinal)
+        while (sData == "") and not bFinal:
+            # a single multi byte character could be split by the chunk border
+            bData = self._fhFile.read(iSize)
+            bFinal = (len(bData) == 0)
+            sData = self._objDecoder.decode(bData, final=bFinal)
+        return(sData.encode("utf-8"))
+
+    def close(self):
+        self._fhFile.close()
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, excType, excValue, excTraceback):
+        self.close()
+
+
+class _CardSplitter:
+    """
+    finds the "BEGIN:VCARD ... END:VCARD" blocks in data, which arrives chunk by chunk (from
+    a file or a stream), only the incomplete VCard at the end of a chunk is kept
+    """
+    __slots__ = ("_bBuffer", "_iBufferOffset", "_iEndSearchFrom")
+    _bBegin = b"BEGIN:VCARD"
+    _bEnd = b"END:VCARD"
+
+    def __init__(self):
+        self._bBuffer = b""
+        self._iBufferOffset = 0  # byte offset of _bBuffer[0] within the file
+        self._iEndSearchFrom = 0  # no need to search for "END:VCARD" twice in the same bytes
+
+    def split(self, bChunk):
+        """
+        adds the next chunk, returns a list of tuples (iOffset, bCard) of the VCards
+        completed by it, iOffset is the byte offset of the VCard within all data
+        """
+        bBegin = self._bBegin
+        bEnd = self._bEnd
+        bBuffer = self._bBuffer + bChunk
+        iEndSearchFrom = self._iEndSearchFrom
+        listCards = []
+        iPos = 0  # everything in front of this position was already processed
+        while True:
+            iBegin = bBuffer.find(bBegin, iPos)
+            if (iBegin >= 0):
+                iEnd = bBuffer.find(bEnd, max(iBegin + len(bBegin), iEndSearchFrom))
+                if (iEnd >= 0):
+                    iPos = iEnd + len(bEnd)
+                    iEndSearchFrom = 0
+                    listCards.append((self._iBufferOffset + iBegin, bBuffer[iBegin:iPos]))
+                    continue
+                # VCard is not complete yet, keep it for the next chunk
+                iKeep = iBegin
+                iEndSearchFrom = max(0, len(bBuffer) - iKeep - len(bEnd) + 1)
+            else:
+                # keep the tail, it could be the start of a "BEGIN:VCARD" split by the chunk border
+                iKeep = max(iPos, len(bBuffer) - len(bBegin) + 1)
+                iEndSearchFrom = 0
+            break
+        self._bBuffer = bBuffer[iKeep:]
+        self._iBufferOffset += iKeep
+        self._iEndSearchFrom = iEndSearchFrom
+        return(listCards)
+
+    def hasIncomplete(self):
+        """
+        True if the data ends with a VCard without "END:VCARD"
+        """
+        return(self._bBuffer.startswith(self._bBegin))
+
+
+class VCardSummary:
+    """
+    counts what happened while parsing, e.g. for a summary at the end of a run
+    """
+    __slots__ = ("iCardsParsed", "iPropertiesDropped", "dictWarnings")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.iCardsParsed = 0
+        self.iPropertiesDropped = 0
+        self.dictWarnings = Counter()  # category -> number of warnings
+
+    def warning(self, sCategory, sMessage, *args):
+        """
+        counts a warning of the given category and logs it, the message is only
+        formatted if the warning level is enabled for the logger
+        """
+        self.dictWarnings[sCategory] += 1
+        logger.warning(sMessage, *args)
+
+    def asDict(self):
+        return({"cardsParsed": self.iCardsParsed, "propertiesDropped": self.iPropertiesDropped,
+                "warnings": dict(self.dictWarnings)})
+
+    def merge(self, dictSummary):
+        """
+        adds the counts of another summary (see "asDict"), e.g. from a worker process
+        """
+        self.iCardsParsed += dictSummary["cardsParsed"]
+        self.iPropertiesDropped += dictSummary["propertiesDropped"]
+        self.dictWarnings.update(dictSummary["warnings"])
+
+    def __str__(self):
+        sWarnings = ", ".join("%s: %d" % (sCategory, self.dictWarnings[sCategory])
+                              for sCategory in sorted(self.dictWarnings))
+        return("%d VCard(s) parsed, %d propertie(s) dropped, warnings: %s" % (
+            self.iCardsParsed, self.iPropertiesDropped, sWarnings or "none"))
+
+
+class VCardStatistics:
+    """
+    optional instrumentation of the parser: calls and time of the stages (split, decode, parse,
+    tokenize, prettyPrint, write) and per property the number and time of parsed and serialized
+    lines, the times of the stages include the stages called by them (e.g. parse includes tokenize)
+    "enable" replaces the functions of the stages and the handlers of the properties by timed
+    versions and "disable" restores them, so a disabled VCardStatistics costs nothing
+    (properties registered while enabled are not timed)
+    """
+    # stage -> (owner, attribute, is a generator)
+    _dictStages = OrderedDict([
+        ("split", ("VCard", "_iterCardBytes", True)),
+        ("decode", ("VCard", "_decodeBytes", False)),
+        ("parse", ("VCard", "fromString", False)),
+        ("tokenize", ("VCard", "tokenize", True)),
+        ("prettyPrint", ("VCard", "prettyPrint", False)),
+        ("write", ("VCardWriter", "write", False)),
+    ])
+
+    def __init__(self):
+        self._dictOriginals = None  # set while enabled
+        self.dictStages = OrderedDict()  # stage -> [calls, seconds]
+        self.dictProperties = OrderedDict()  # property -> [parsed, seconds, serialized, seconds]
+
+    def reset(self):
+        # in place, the timed functions keep references to the lists
+        for listCounts in list(self.dictStages.values()) + list(self.dictProperties.values()):
+            listCounts[:] = [0 if isinstance(x, int) else 0.0 for x in listCounts]
+
+    @property
+    def enabled(self):
+        return(self._dictOriginals is not None)
+
+    def _getStage(self, sStage):
+        listStage = self.dictStages.get(sStage)
+        if listStage is None:
+            listStage = self.dictStages[sStage] = [0, 0.0]
+        return(listStage)
+
+    def _getProperty(self, sPropertyName):
+        listProperty = self.dictProperties.get(sPropertyName)
+        if listProperty is None:
+            listProperty = self.dictProperties[sPropertyName] = [0, 0.0, 0, 0.0]
+        return(listProperty)
+
+    def _timeFunction(self, sStage, refFunction):
+        listStage = self._getStage(sStage)
+        perf_counter = time.perf_counter
+
+        def refTimed(*args, **kwargs):
+            fStart = perf_counter()
+            try:
+                return(refFunction(*args, **kwargs))
+            finally:
+                listStage[0] += 1
+                listStage[1] += perf_counter() - fStart
+        return(refTimed)
+
+    def _timeGenerator(self, sStage, refFunction):
+        # only the time to get the next item is counted, not the time the caller spends with it
+        listStage = self._getStage(sStage)
+        perf_counter = time.perf_counter
+
+        def refTimed(*args, **kwargs):
+            listStage[0] += 1
+            iterItems = refFunction(*args, **kwargs)
+            while True:
+                fStart = perf_counter()
+                try:
+                    objItem = next(iterItems)
+                except StopIteration:
+                    listStage[1] += perf_counter() - fStart
+                    return
+                listStage[1] += perf_counter() - fStart
+                yield(objItem)
+        return(refTimed)
+
+    def _timeProperty(self, sPropertyName, refFunction, iIndex, bList=False):
+        listProperty = self._getProperty(sPropertyName)
+        perf_counter = time.perf_counter
+
+        def refTimed(*args):
+            fStart = perf_counter()
+            try:
+                if bList:
+                    # the lines of a line iterator are created here, so they are timed
+                    return(list(refFunction(*args)))
+                return(refFunction(*args))
+            finally:
+                listProperty[iIndex] += 1
+                listProperty[iIndex + 1] += perf_counter() - fStart
+        return(refTimed)
+
+    def enable(self):
+        if self.enabled:
+            return
+        dictClasses = {"VCard": VCard, "VCardWriter": VCardWriter}
+        self._dictOriginals = {"handlers": VCard._dictPropertyHandlers.copy(),
+                               "lineIterators": VCard._dictLineIterators.copy(), "stages": {}}
+        for (sStage, (sOwner, sAttribute, bGenerator)) in VCardStatistics._dictStages.items():
+            objOwner = dictClasses[sOwner]
+            # the attribute as it is, e.g. the staticmethod object, to restore it exactly
+            objOriginal = objOwner.__dict__[sAttribute]
+            self._dictOriginals["stages"][(sOwner, sAttribute)] = objOriginal
+            refFunction = getattr(objOwner, sAttribute) if isinstance(objOriginal, staticmethod) else objOriginal
+            if bGenerator:
+                refTimed = self._timeGenerator(sStage, refFunction)
+            else:
+                refTimed = self._timeFunction(sStage, refFunction)
+            setattr(objOwner, sAttribute, staticmethod(refTimed) if isinstance(objOriginal, staticmethod) else refTimed)
+        for (sPropertyName, (refParser, refSerializer)) in self._dictOriginals["handlers"].items():
+            VCard._dictPropertyHandlers[sPropertyName] = (
+                refParser if (refParser is None) else self._timeProperty(sPropertyName, refParser, 0),
+                self._timeProperty(sPropertyName, refSerializer, 2))
+        for (sPropertyName, refLines) in self._dictOriginals["lineIterators"].items():
+            VCard._dictLineIterators[sPropertyName] = self._timeProperty(sPropertyName, refLines, 2, bList=True)
+
+    def disable(self):
+        if not self.enabled:
+            return
+        dictClasses = {"VCard": VCard, "VCardWriter": VCardWriter}
+        for ((sOwner, sAttribute), objOriginal) in self._dictOriginals["stages"].items():
+            setattr(dictClasses[sOwner], sAttribute, objOriginal)
+        VCard._dictPropertyHandlers.update(self._dictOriginals["handlers"])
+        VCard._dictLineIterators.clear()
+        VCard._dictLineIterators.update(self._dictOriginals["lineIterators"])
+        self._dictOriginals = None
+
+    def asDict(self):
+        return(OrderedDict([
+            ("stages", OrderedDict((sStage, OrderedDict([("calls", iCalls), ("seconds", round(fSeconds, 6))]))
+                                   for (sStage, (iCalls, fSeconds)) in self.dictStages.items())),
+            ("properties", OrderedDict(
+                (sPropertyName, OrderedDict([("parsed", listProperty[0]), ("parseSeconds", round(listProperty[1], 6)),
+                                             ("serialized", listProperty[2]),
+                                             ("serializeSeconds", round(listProperty[3], 6))]))
+                for (sPropertyName, listProperty) in self.dictProperties.items())),
+        ]))
+
+    def merge(self, dictStatistics):
+        """
+        adds the counts and times of another VCardStatistics (see "asDict"), e.g. from a worker process
+        """
+        for (sStage, dictStage) in dictStatistics["stages"].items():
+            listStage = self._getStage(sStage)
+            listStage[0] += dictStage["calls"]
+            listStage[1] += dictStage["seconds"]
+        for (sPropertyName, dictProperty) in dictStatistics["properties"].items():
+            listProperty = self._getProperty(sPropertyName)
+            listProperty[0] += dictProperty["parsed"]
+            listProperty[1] += dictProperty["parseSeconds"]
+            listProperty[2] += dictProperty["serialized"]
+            listProperty[3] += dictProperty["serializeSeconds"]
+
+    def __str__(self):
+        return(", ".join("%s: %d call(s) %.3fs" % (sStage, iCalls, fSeconds)
+                         for (sStage, (iCalls, fSeconds)) in self.dictStages.items()))
+
+
+class VCardName:
+    """
+    value of the property N, e.g. N:Gump;Forrest;;Mr.;
+    """
+    __slots__ = ("surname", "givenName", "additonalNames", "honorificPrefixes", "honorificSuffixes")
+
+    def __init__(self, surname="", givenName="", additonalNames="", honorificPrefixes="", honorificSuffixes=""):
+        self.surname = surname
+        self.givenName = givenName
+        self.additonalNames = additonalNames
+        self.honorificPrefixes = honorificPrefixes
+        self.honorificSuffixes = honorificSuffixes
+
+
+class VCardEmail:
+    """
+    a single EMAIL, e.g. EMAIL;TYPE=internet,pref:jane_doe@abc.com
+    """
+    __slots__ = ("type", "pref", "address")
+
+    def __init__(self, address="", type=None, pref=None):
+        self.type = type
+        self.pref = pref
+        self.address = address
+
+
+class VCardTelephone:
+    """
+    a single TEL, e.g. TEL;VALUE=uri;TYPE=work,voice;PREF=1:tel:+1-418-656-9254;ext=102
+    data is kept as it is, "e164" and "digits" return the normalized number, numbers without
+    country code (e.g. "(111) 555-1212") are only normalized, if a default country is set
+    (see "setDefaultCountry"), the results are cached by the raw string and the country
+    """
+    __slots__ = ("TYPE", "PREF", "VALUE", "data")
+    # calling code of numbers without country code, e.g. "49", see "setDefaultCountry"
+    _sDefaultCountryCode = None
+    # a few ISO country codes -> calling code, other countries are set by their calling code
+    _dictCallingCodes = {
+        "US": "1", "CA": "1", "GB": "44", "IE": "353", "DE": "49", "AT": "43", "CH": "41", "FR": "33",
+        "BE": "32", "NL": "31", "LU": "352", "IT": "39", "ES": "34", "PT": "351", "DK": "45", "SE": "46",
+        "NO": "47", "FI": "358", "PL": "48", "CZ": "420", "HU": "36", "RU": "7", "AU": "61", "NZ": "64",
+        "JP": "81", "CN": "86", "IN": "91", "BR": "55", "MX": "52",
+    }
+    # national (trunk) prefix, which is dropped in E.164, "0" for all others, Italy keeps its "0"
+    _dictTrunkPrefixes = {"1": "1", "7": "8", "39": ""}
+    # an extension at the end of a number, e.g. "555-1212 x102" or "555-1212 ext. 102"
+    _regexExtension = re.compile("\\s*(?:x|ext\\.?|extension)\\s*([0-9]+)\\s*$", re.IGNORECASE)
+    _regexNoDigits = re.compile("[^0-9]")
+
+    def __init__(self, data=None, TYPE=None, PREF=None, VALUE=None):
+        self.TYPE = TYPE  # list of types, e.g. ["work", "voice"]
+        self.PREF = PREF
+        self.VALUE = VALUE
+        self.data = data
+
+    @staticmethod
+    def _getCallingCode(sCountry):
+        if sCountry is None:
+            return(None)
+        sCallingCode = sCountry.strip().lstrip("+").upper()
+        sCallingCode = VCardTelephone._dictCallingCodes.get(sCallingCode, sCallingCode)
+        if not sCallingCode.isdigit():
+            raise(ValueError("unknown country '%s', use the calling code (e.g. '49') instead" % sCountry))
+        return(sCallingCode)
+
+    @staticmethod
+    def setDefaultCountry(sCountry):
+        """
+        sets the country of numbers without country code, by ISO code (e.g. "DE") or calling
+        code (e.g. "49" or "+49"), None to only normalize numbers with country code
+        """
+        VCardTelephone._sDefaultCountryCode = VCardTelephone._getCallingCode(sCountry)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=65536)
+    def normalize(sData, sCountryCode=None):
+        """
+        returns the tuple (sE164, sDigits, sExtension) of a TEL value, e.g.
+        "tel:+1-418-656-9254;ext=102" -> ("+14186569254", "14186569254", "102")
+        "(111) 555-1212" -> ("+11115551212", "11115551212", None) with sCountryCode "1"
+        sE164 is None, if the number can not be normalized (e.g. no country code and no
+        sCountryCode), then sDigits are the digits of the number as they are
+        the results of the last 65536 values are cached (see "normalize.cache_info()")
+        """
+        if not sData:
+            return((None, None, None))
+        sNumber = sData.strip()
+        if sNumber[:4].lower() == "tel:":
+            sNumber = sNumber[4:]
+        sExtension = None
+        # parameters of a tel uri, e.g. "tel:+1-418-656-9254;ext=102"
+        (sNumber, _, sUriParameters) = sNumber.partition(";")
+        for sUriParameter in sUriParameters.split(";"):
+            if sUriParameter[:4].lower() == "ext=":
+                sExtension = sUriParameter[4:].strip() or None
+        matchExtension = VCardTelephone._regexExtension.search(sNumber)
+        if matchExtension:
+            sExtension = sExtension or matchExtension.group(1)
+            sNumber = sNumber[:matchExtension.start()]
+        sNumber = sNumber.strip()
+        sDigits = VCardTelephone._regexNoDigits.sub("", sNumber)
+        if not sDigits:
+            return((None, None, sExtension))
+        if any(sChar.isalpha() for sChar in sNumber):
+            # e.g. "1-800-FLOWERS"
+            return((None, sDigits, sExtension))
+        if sNumber.startswith("+"):
+            # e.g. "+49 (0)30 1234567", the national prefix in brackets is not dialed
+            if ("(0)" in sNumber):
+                sDigits = VCardTelephone._regexNoDigits.sub("", sNumber.replace("(0)", "", 1))
+            sInternational = sDigits
+        elif sDigits.startswith("00"):
+            sInternational = sDigits[2:]
+        elif sDigits.startswith("011") and (sCountryCode == "1"):
+            sInternational = sDigits[3:]
+        elif sCountryCode is not None:
+            sTrunkPrefix = VCardTelephone._dictTrunkPrefixes.get(sCountryCode, "0")
+            sNational = sDigits
+            if (sCountryCode == "1") and (len(sDigits) == 11) and sDigits.startswith("1"):
+                sNational = sDigits[1:]
+            elif sTrunkPrefix and sDigits.startswith(sTrunkPrefix) and (sCountryCode != "1"):
+                sNational = sDigits[len(sTrunkPrefix):]
+            sInternational = sCountryCode + sNational
+        else:
+            return((None, sDigits, sExtension))
+        # E.164 numbers have at most 15 digits, the shortest are 7 or 8 digits
+        if (len(sInternational) < 7) or (len(sInternational) > 15) or sInternational.startswith("0"):
+            return((None, sDigits, sExtension))
+        return(("+" + sInternational, sInternational, sExtension))
+
+    @property
+    def e164(self):
+        """
+        the number in E.164 format (e.g. "+14186569254", without extension), None if it can not be normalized
+        """
+        return(VCardTelephone.normalize(self.data, VCardTelephone._sDefaultCountryCode)[0])
+
+    @property
+    def digits(self):
+        """
+        the digits of the E.164 number or, if it can not be normalized, the digits of the number as they are
+        """
+        return(VCardTelephone.normalize(self.data, VCardTelephone._sDefaultCountryCode)[1])
+
+    @staticmethod
+    def normalizeAll(iterVCards, sCountry=None):
+        """
+        normalizes the TEL numbers of a lot of VCards (e.g. a VCardCollection) at once, every
+        distinct value only once, returns a dict value -> (sE164, sDigits, sExtension), see "normalize"
+        for sCountry see "setDefaultCountry", the default country is used, if not given
+        """
+        sCountryCode = VCardTelephone._sDefaultCountryCode
+        if sCountry is not None:
+            sCountryCode = VCardTelephone._getCallingCode(sCountry)
+        dictNumbers = {}
+        refNormalize = VCardTelephone.normalize
+        for objVCard in iterVCards:
+            for objTel in (objVCard.getProperty("TEL") or ()):
+                if (objTel.data not in dictNumbers):
+                    dictNumbers[objTel.data] = refNormalize(objTel.data, sCountryCode)
+        return(dictNumbers)
+
+
+class VCardAddress:
+    """
+    a single ADR, e.g. ADR;TYPE=work,pref:;Suite D2-630;2875 Laurier;Quebec;QC;G1V 2M2;Canada
+    """
+    __slots__ = ("TYPE", "PREF", "postOfficeBox", "extendedAddress", "streetAddress",
+                 "locality", "region", "postalCode", "countryName")
+    # order of the address parts in the value of ADR
+    _tupleParts = ("postOfficeBox", "extendedAddress", "streetAddress",
+                   "locality", "region", "postalCode", "countryName")
+
+    def __init__(self, TYPE=None, PREF=None):
+        self.TYPE = TYPE
+        self.PREF = PREF
+        self.postOfficeBox = ""
+        self.extendedAddress = ""
+        self.streetAddress = ""
+        self.locality = ""
+        self.region = ""
+        self.postalCode = ""
+        self.countryName = ""
+
+    @property
+    def address(self):
+        return((self.postOfficeBox, self.extendedAddress, self.streetAddress,
+                self.locality, self.region, self.postalCode, self.countryName))
+
+
+class VCardPhoto:
+    """
+    value of the property PHOTO, e.g. PHOTO;MEDIATYPE=image/gif:http://www.example.com/my_photo.gif
+    data is kept as it was found in the VCard string (an uri or the base64 encoded image of a
+    v2.1/v3.0 VCard, if ENCODING is set), the image is only decoded by "getBytes"
+    """
+    __slots__ = ("MEDIATYPE", "data", "ENCODING")
+
+    def __init__(self, data=None, MEDIATYPE=None, ENCODING=None):
+        self.MEDIATYPE = MEDIATYPE
+        self.data = data
+        self.ENCODING = ENCODING  # e.g. "b" or "BASE64", only for inline images of v2.1/v3.0
+
+    def isInline(self):
+        """
+        True if the image is part of the VCard, False if it is a link
+        """
+        return((self.ENCODING is not None) or self.data.startswith("data:"))
+
+    def getBytes(self):
+        """
+        decodes an inline image, returns None if the PHOTO is a link
+        """
+        if (self.ENCODING is not None):
+            # a2b_base64 takes the string as it is and ignores line breaks and spaces
+            return(binascii.a2b_base64(self.data))
+        if self.data.startswith("data:"):
+            # e.g. data:image/jpeg;base64,MIICajCCAdOgAwIBAgICBEUwDQYJKoZIhvcN
+            iComma = self.data.find(",")
+            if (";base64" in self.data[:iComma]):
+                return(binascii.a2b_base64(self.data[iComma + 1:]))
+            return(urllib.parse.unquote_to_bytes(self.data[iComma + 1:]))
+        return(None)
+
+    def getMediaType(self):
+        if self.data.startswith("data:"):
+            sMediaType = self.data[5:self.data.find(",")].split(";")[0]
+            if (sMediaType != ""):
+                return(sMediaType)
+        return(self.MEDIATYPE)
+
+    def getFileExtension(self):
+        """
+        returns something like "jpeg" for "image/jpeg", "bin" if the media type is unknown
+        """
+        sMediaType = self.getMediaType()
+        if (sMediaType is None) or ("/" not in sMediaType):
+            return("bin")
+        return(sMediaType.split("/")[1].split("+")[0].lower())
+
+    def iterParts(self):
+        """
+        yields the parts of the v4.0 PHOTO line, so big images can be written without
+        building the whole line first, inline images of v2.1/v3.0 are converted to a data uri
+        """
+        yield("PHOTO")
+        if (self.ENCODING is not None):
+            yield(":data:")
+            yield(self.MEDIATYPE or "application/octet-stream")
+            yield(";base64,")
+        else:
+            if self.MEDIATYPE is not None:
+                yield(";MEDIATYPE=")
+                yield(self.MEDIATYPE)
+            yield(":")
+        yield(self.data)
+
+    def saveTo(self, sFilePath):
+        """
+        writes the decoded image to the given file, returns False if the PHOTO is a link
+        """
+        bData = self.getBytes()
+        if bData is None:
+            return(False)
+        with open(sFilePath, "wb") as fhFile:
+            fhFile.write(bData)
+        return(True)
 
 
 class VCard:
-    _properties = None
-    _customProperties = None
+    # only a few attributes per instance, because a lot of VCards are kept in memory at once,
+    # lists and dicts are only created if a property is actually set
+    __slots__ = ("_fn", "_uid", "_n", "_org", "_title", "_tel", "_adr", "_email", "_photo",
+                 "_rev", "_url", "_note", "_extraProperties", "_customProperties",
+                 "_sourceVersion", "_pending")
+    # a single parameter, a quoted parameter value may contain a ';'
+    _regexParameter = re.compile('(?:[^;"]|"[^"]*")+')
+    # everything in front of the ':' which seperates key and value, respecting quoted parameter values
+    _regexQuotedHead = re.compile('(?:[^:"]|"[^"]*")*(?=:)')
+    # properties with an own attribute (e.g. FN -> _fn)
+    _tupleStandardProperties = ("FN", "UID", "N", "ORG", "TITLE", "TEL", "ADR", "EMAIL", "PHOTO",
+                                "REV", "URL", "NOTE")
+    # counts of all VCards parsed in this process, see VCardSummary
+    summary = VCardSummary()
+    # timers of the parser, only active after "VCard.statistics.enable()", see VCardStatistics
+    statistics = VCardStatistics()
+    # property name -> attribute (e.g. FN -> _fn) and vice versa
+    _dictPropertySlots = dict((sName, "_" + sName.lower()) for sName in _tupleStandardProperties)
+    _dictSlotProperties = dict(("_" + sName.lower(), sName) for sName in _tupleStandardProperties)
+    # property name -> (parser, serializer), see "registerProperty"
+    _dictPropertyHandlers = OrderedDict()
+    # property name -> function, which yields the lines of the property in parts, see "_iterLines"
+    _dictLineIterators = {}
+    # the CHARSET parameter of a property line, e.g. "ADR;CHARSET=Windows-1252:..."
+    _regexCharset = re.compile(b"[^:\r\n]*?;CHARSET=([A-Za-z0-9_.:-]+?)[;:]", re.IGNORECASE)
+    # Windows-1252 characters, which are different in LATIN1 (e.g. 0x80 is the euro sign)
+    _dictWindows1252 = dict((i, bytes([i]).decode("cp1252")) for i in range(0x80, 0xA0)
+                            if i not in (0x81, 0x8D, 0x8F, 0x90, 0x9D))
+    # the name of a property, e.g. "TEL"
+    _regexKeyName = re.compile("[A-Z]+")
+    # the name of the property of a v4.0 line, without the group, e.g. "item1.X-ABLABEL:..." -> "X-ABLABEL"
+    _regexPropertyName = re.compile("(?:[^.;:]*\\.)?([^;:]*)")
+    # values of the known parameters, see "parseParameters"
+    _regexParameterPref = re.compile("^[0-9]+$")
+    _dictParameterRegex = {
+        "TYPE": re.compile("^[A-Za-z0-9,-]+$"),  # e.g TYPE=work,voice
+        "CHARSET": re.compile("^[A-Za-z0-9_.:-]+$"),  # e.g CHARSET=Windows-1252
+        "ENCODING": re.compile("^[A-Za-z0-9-]+$"),  # e.g ENCODING=QUOTED-PRINTABLE
+        "VALUE": re.compile("^[A-Za-z-]+$"),  # e.g VALUE=uri
+        "MEDIATYPE": re.compile("^[^;:]+$"),  # e.g MEDIATYPE=image/gif
+    }
+    # v2.1 encodings, which could be used without the "ENCODING=" prefix
+    _listEncodings = ("QUOTED-PRINTABLE", "BASE64", "8BIT", "7BIT")
+    # ENCODING of a text value -> function, which decodes it to bytes, see "_decodeValue"
+    _dictValueDecoders = {"QUOTED-PRINTABLE": binascii.a2b_qp, "BASE64": binascii.a2b_base64, "B": binascii.a2b_base64}
+    # these keep their (base64) encoded data, e.g. PHOTO;ENCODING=b, see VCardPhoto
+    _tupleBinaryProperties = ("PHOTO", "LOGO", "SOUND", "KEY")
+    # line breaks of a decoded value, which are "\n" in v4.0
+    _regexLineBreak = re.compile("\r\n|\r|\n")
 
     def __init__(self):
         """
@@ -20,28 +663,75 @@ class VCard:
         method "fromString", but as a result you will alway get a v4.0
         instance/representation
         """
-        # store standard properties here
-        self._properties = OrderedDict()
-        # add properties, which are common across all known VCard verison
-        self._properties["VERSION"] = "4.0"  # required in 2.1, 3.0, 4.0
-        # required in 3.0, 4.0 // supported in 2.1
-        self._properties["FN"] = None
-        self._properties["UID"] = None  # supported in 2.1, 3.0, 4.0
-        # required in 2.1, 3.0 // supported in 4.0
-        self._properties["N"] = None
-        self._properties["ORG"] = None  # supported in 2.1, 3.0, 4.0
-        self._properties["TITLE"] = None  # supported in 2.1, 3.0, 4.0
-        self._properties["TEL"] = []  # supported in 2.1, 3.0, 4.0
-        self._properties["ADR"] = []  # supported in 2.1, 3.0, 4.0
-        self._properties["EMAIL"] = []  # supported in 2.1, 3.0, 4.0
-        self._properties["PHOTO"] = OrderedDict(
-            [("MEDIATYPE", None), ("data", None)])  # supported in 2.1, 3.0, 4.0
+        # properties, which are common across all known VCard verison
+        # VERSION is always 4.0, required in 2.1, 3.0, 4.0
+        self._fn = None  # required in 3.0, 4.0 // supported in 2.1
+        self._uid = None  # supported in 2.1, 3.0, 4.0
+        self._n = None  # required in 2.1, 3.0 // supported in 4.0, see VCardName
+        self._org = None  # supported in 2.1, 3.0, 4.0
+        self._title = None  # supported in 2.1, 3.0, 4.0
+        self._tel = None  # supported in 2.1, 3.0, 4.0, list of VCardTelephone
+        self._adr = None  # supported in 2.1, 3.0, 4.0, list of VCardAddress
+        self._email = None  # supported in 2.1, 3.0, 4.0, list of VCardEmail
+        self._photo = None  # supported in 2.1, 3.0, 4.0, see VCardPhoto
         # supported in 2.1, 3.0, 4.0  //A timestamp for the last time the vCard was updated.
-        self._properties["REV"] = None
-        self._properties["URL"] = None  # supported in 2.1, 3.0, 4.0
-        self._properties["NOTE"] = None  # supported in 2.1, 3.0, 4.0
+        self._rev = None
+        self._url = None  # supported in 2.1, 3.0, 4.0
+        self._note = None  # supported in 2.1, 3.0, 4.0
+        # store properties added with "registerProperty" here
+        self._extraProperties = None
         # store custom properties/extensions here
-        self._customProperties = OrderedDict()
+        self._customProperties = None
+        # VERSION of the parsed VCard string
+        self._sourceVersion = None
+        # lazy VCards only: property -> list of (sParameters, sValue), which are not decoded yet
+        self._pending = None
+
+    def __getattr__(self, sName):
+        """
+        only called for attributes which are not set, which are the attributes of
+        properties of a lazy VCard (see "fromString"), which are not decoded yet
+        """
+        sPropertyName = VCard._dictSlotProperties.get(sName)
+        if (sPropertyName is None) or (self._pending is None) or (sPropertyName not in self._pending):
+            raise(AttributeError("'VCard' object has no attribute '%s'" % sName))
+        self._decodePending(sPropertyName)
+        return(getattr(self, sName))
+
+    def __getstate__(self):
+        # the set attributes only, "getattr" would decode the pending properties of a lazy VCard
+        dictState = {}
+        for sSlot in VCard.__slots__:
+            try:
+                dictState[sSlot] = object.__getattribute__(self, sSlot)
+            except AttributeError:
+                pass
+        return(dictState)
+
+    def __setstate__(self, dictState):
+        for (sSlot, objValue) in dictState.items():
+            setattr(self, sSlot, objValue)
+
+    def _decodePending(self, sPropertyName):
+        """
+        decodes the not yet decoded lines of a property of a lazy VCard
+        """
+        listPending = self._pending.pop(sPropertyName)
+        if (len(self._pending) == 0):
+            self._pending = None
+        sSlot = VCard._dictPropertySlots.get(sPropertyName)
+        if sSlot is not None:
+            setattr(self, sSlot, None)
+        refParser = VCard._dictPropertyHandlers[sPropertyName][0]
+        for (sParameters, sValue) in listPending:
+            refParser(self, sParameters, sValue)
+
+    def _decodeAll(self):
+        """
+        decodes all not yet decoded properties of a lazy VCard
+        """
+        while self._pending is not None:
+            self._decodePending(next(iter(self._pending)))
 
     @staticmethod
     def getKeyAndValueFromString(sData):
@@ -70,145 +760,388 @@ class VCard:
     def getKeyAndValueQualifiersAsDict(sKey):
         """
         parse/split the key properties into a uniform format, because this seems to vary a lot
+        e.g. "TEL;TYPE=work,voice;PREF=1" -> {"KEY": "TEL", "TYPE": ["work", "voice"], "PREF": 1}
+        CHARSET, ENCODING and VALUE are only part of the result, if they are given
         """
+        listKeySplit = sKey.split(";", 1)
+        # first in list should be the name of the key like N, EMAIL or ADR
+        if (VCard._regexKeyName.match(listKeySplit[0]) is None):
+            raise(ValueError("value '%s' does not match required regex '%s'" % (
+                listKeySplit[0], VCard._regexKeyName.pattern)))
         dictKeyProperties = OrderedDict(
-            [("KEY", None), ("TYPE", []), ("PREF", None)])
-        listKeySplit = sKey.split(";")
-        for i in range(len(listKeySplit)):
-            sValue = listKeySplit[i]
-            # first in list should be the name of the key like N, EMAIL or ADR
-            if (i == 0):
-                sRegExWhichNeedsToMatch = "[A-Z]+"
-                if (re.match(sRegExWhichNeedsToMatch, sValue)):
-                    dictKeyProperties["KEY"] = sValue
-                    continue
+            [("KEY", listKeySplit[0]), ("TYPE", []), ("PREF", None)])
+        if (len(listKeySplit) == 1):
+            return(dictKeyProperties)
+        objParameters = VCard.parseParameters(listKeySplit[1])
+        if (len(objParameters.other) > 0):
+            # by default, if we do not recognize the value, raise an exception
+            raise(ValueError("did not recognize this value '%s'" % "=".join(objParameters.other[0])))
+        dictKeyProperties["TYPE"].extend(objParameters.TYPE)
+        dictKeyProperties["PREF"] = objParameters.PREF
+        for sName in ("CHARSET", "ENCODING", "VALUE"):
+            if getattr(objParameters, sName) is not None:
+                dictKeyProperties[sName] = getattr(objParameters, sName)
+        return(dictKeyProperties)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=512)
+    def parseParameters(sParameters):
+        """
+        parses the (normalized) parameter part of a property line, e.g. "TYPE=work,voice;PREF=1"
+        returns a VCardParameters tuple, types are lowercase, "pref" within the types is
+        returned as PREF=1, parameters which are not known are returned in "other"
+        the result is cached, because real world VCards use the same few parameter strings
+        over and over again, so the result is immutable
+        """
+        if (sParameters == ""):
+            return(VCard._objNoParameters)
+        listTypes = []
+        iPref = None
+        dictKnown = {"CHARSET": None, "ENCODING": None, "VALUE": None, "MEDIATYPE": None}
+        listOther = []
+        for sParameter in VCard._regexParameter.findall(sParameters):
+            tupleSplit = sParameter.split("=", 1)
+            sName = tupleSplit[0].strip().upper()
+            sValue = tupleSplit[1] if (len(tupleSplit) == 2) else None
+            if (sName == "PREF"):
+                # e.g PREF or PREF=1 or PREF=2, when no value was given, we set 1, by default
+                if (sValue is None) or (sValue == ""):
+                    iPref = 1
+                elif VCard._regexParameterPref.match(sValue):
+                    iPref = int(sValue)
                 else:
                     raise(ValueError("value '%s' does not match required regex '%s'" % (
-                        sValue, sRegExWhichNeedsToMatch)))
-            # check if we dealing with a TYPE
-            if (sValue.startswith("TYPE")):
-                # TYPE=work,voice
-                sRegExWhichNeedsToMatch = "^[A-Z]+=[A-Za-z,]+$"
-                if (re.match(sRegExWhichNeedsToMatch, sValue)):
-                    tmpSplit = sValue.split("=")
-                    # above regex allows "work,voice" and "WORK,VOICE",
-                    # for consitency we'll continue with lowercase
-                    tmpSplit[1] = tmpSplit[1].lower()
-                    if ("," in tmpSplit[1]):  # multiple values (e.g. TYPE=work,voice)
-                        tmpSplit = tmpSplit[1].split(",")
-                        dictKeyProperties["TYPE"].extend(tmpSplit)
-                    else:
-                        # only one value after TYPE (e.g. TYPE=work)
-                        dictKeyProperties["TYPE"].append(tmpSplit[1])
-                    continue
-                else:
+                        sParameter, VCard._regexParameterPref.pattern)))
+                continue
+            if (sValue is None):
+                listOther.append((sName, ""))
+                continue
+            sValue = sValue.strip('"')
+            refRegex = VCard._dictParameterRegex.get(sName)
+            if refRegex is not None:
+                if (refRegex.match(sValue) is None):
                     raise(ValueError("value '%s' does not match required regex '%s'" % (
-                        sValue, sRegExWhichNeedsToMatch)))
-            # check if we dealing with a PREF
-            if (sValue.startswith("PREF")):
-                # e.g PREF or PREF=1 or PREF=2
-                sRegExWhichNeedsToMatch = "^[A-Z]+[=0-9]*$"
-                if (re.match(sRegExWhichNeedsToMatch, sValue)):
-                    if ("=" in sValue):  # multiple values (e.g. PREF=1)
-                        tmpSplit = sValue.split("=")
-                        dictKeyProperties["PREF"] = int(tmpSplit[1])
-                    else:
-                        # no value after PREF (e.g. PREF)
-                        # when no value was given, we set 1, by default
-                        dictKeyProperties["PREF"] = 1
-                    continue
+                        sParameter, refRegex.pattern)))
+                if (sName == "TYPE"):
+                    # "work,voice" and "WORK,VOICE" are allowed, for consitency we'll continue with lowercase
+                    for sType in sValue.lower().split(","):
+                        if (sType == "pref"):
+                            iPref = iPref or 1
+                        elif (sType != ""):
+                            listTypes.append(sType)
                 else:
-                    raise(ValueError("value '%s' does not match required regex '%s'" % (
-                        sValue, sRegExWhichNeedsToMatch)))
-            # check if we dealing with a CHARSET
-            if (sValue.startswith("CHARSET")):
-                # e.g CHARSET=Windows-1252
-                sRegExWhichNeedsToMatch = "^[A-Z]+=[A-Za-z\-0-9]+$"
-                if (re.match(sRegExWhichNeedsToMatch, sValue)):
-                    tmpSplit = sValue.split("=")
-                    dictKeyProperties["CHARSET"] = tmpSplit[1]
+                    dictKnown[sName] = sValue
+                continue
+            listOther.append((sName, sValue))
+        return(VCardParameters(tuple(listTypes), iPref, dictKnown["CHARSET"], dictKnown["ENCODING"],
+                               dictKnown["VALUE"], dictKnown["MEDIATYPE"], tuple(listOther)))
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def _normalizeParameters(sKey, sParameters):
+        """
+        converts the parameter part of a property line (everything between the key and
+        the ':') into a uniform ';' seperated format, mainly v2.1 parameters are rewritten
+          * bare types (e.g. TEL;WORK;VOICE) -> TYPE=work,voice
+          * bare PREF along with bare types (e.g. EMAIL;PREF;INTERNET) -> TYPE=internet,pref
+          * bare encodings (e.g. NOTE;QUOTED-PRINTABLE) -> ENCODING=QUOTED-PRINTABLE
+          * PHOTO types (e.g. PHOTO;GIF or PHOTO;VALUE=URI;TYPE=GIF) -> MEDIATYPE=image/gif
+        parameter names are converted to uppercase, parameter values are kept as they are
+        the result is cached, because the same few parameter strings are used over and over again
+        """
+        listParameters = []
+        listTypes = []
+        iTypeIndex = None  # position where the TYPE parameter build from bare types is inserted
+        bPref = False
+        for sParameter in VCard._regexParameter.findall(sParameters):
+            sParameter = sParameter.strip()
+            if (sParameter == ""):
+                continue
+            iEqualSign = sParameter.find("=")
+            if (iEqualSign < 0):
+                # v2.1 parameter without name
+                sParameterUpper = sParameter.upper()
+                if (sParameterUpper in VCard._listEncodings):
+                    listParameters.append("ENCODING=%s" % sParameterUpper)
                     continue
-                else:
-                    raise(ValueError("value '%s' does not match required regex '%s'" % (
-                        sValue, sRegExWhichNeedsToMatch)))
-            # check if we dealing with a ENCODING
-            if (sValue.startswith("ENCODING")):
-                # e.g ENCODING=QUOTED-PRINTABLE
-                sRegExWhichNeedsToMatch = "^[A-Z]+=[A-Z\-]+$"
-                if (re.match(sRegExWhichNeedsToMatch, sValue)):
-                    tmpSplit = sValue.split("=")
-                    dictKeyProperties["ENCODING"] = tmpSplit[1]
+                if (sKey == "PHOTO"):
+                    listParameters.append("MEDIATYPE=%s" % VCard._getPhotoMediaType(sParameter))
                     continue
+                if (iTypeIndex is None):
+                    iTypeIndex = len(listParameters)
+                if (sParameterUpper == "PREF"):
+                    bPref = True
                 else:
-                    raise(ValueError("value '%s' does not match required regex '%s'" % (
-                        sValue, sRegExWhichNeedsToMatch)))
-            # check if we dealing with a VALUE
-            if (sValue.startswith("VALUE")):
-                sRegExWhichNeedsToMatch = "^[A-Z]+=[a-z]+$"  # e.g VALUE=uri
-                if (re.match(sRegExWhichNeedsToMatch, sValue)):
-                    tmpSplit = sValue.split("=")
-                    dictKeyProperties["VALUE"] = tmpSplit[1]
+                    listTypes.append(sParameter.lower())
+                continue
+            sName = sParameter[:iEqualSign].strip().upper()
+            sValue = sParameter[iEqualSign + 1:]
+            if (sKey == "PHOTO"):
+                # in v4.0 the value of a PHOTO is an uri by default
+                if (sName == "VALUE") and (sValue.upper() == "URI"):
                     continue
-                else:
-                    raise(ValueError("value '%s' does not match required regex '%s'" % (
-                        sValue, sRegExWhichNeedsToMatch)))
-            # by default, if we do not recognize the value, raise an exception
-            raise(ValueError("did not recognize this value '%s'" % sValue))
-        return(dictKeyProperties)
+                if (sName == "TYPE"):
+                    listParameters.append("MEDIATYPE=%s" % VCard._getPhotoMediaType(sValue))
+                    continue
+            listParameters.append("%s=%s" % (sName, sValue))
+        if (iTypeIndex is not None):
+            if (len(listTypes) == 0):
+                # PREF was the only bare parameter, keep it as it is
+                listParameters.insert(iTypeIndex, "PREF")
+            else:
+                if bPref:
+                    listTypes.append("pref")
+                listParameters.insert(iTypeIndex, "TYPE=%s" % ",".join(listTypes))
+        return(";".join(listParameters))
 
     @staticmethod
-    def _doStringReplacementsToUseStandardV4Parsing(sData):
+    def _getPhotoMediaType(sType):
         """
-        replaces varios strings to standard v4 parsing possible
-        so what is replaced:
-          * linefeeds after '=0D=0A=' (which is used as linefeed within VCards e.g. NOTE)
-          * v2.1 vcard strings, with a format compatible to VCard v4 format ...
-          * LABEL, which is no longer supported as standalone in v4
+        returns the media type of a v2.1/v3.0 PHOTO type, e.g. "JPEG" -> "image/jpeg", a type, which
+        is already a media type, is kept, e.g. "image/jpeg"
         """
-        # make sure we have the right line seperator
-        sData = sData.replace("\r\n", "\n")
-        #
-        # "=0D=0A=", is a newline within a VCard property (e.g. NOTE)
-        # we will not actually replace "=0D=0A=", but remove the following linefeed,
-        # to get everything into the same line
-        sData = sData.replace("=0D=0A=\n", "=0D=0A=")
-        #
-        # LABEL are no longer support as standalone in VCard v4 (only as part)
-        sRegexLabel = "\nLABEL.*?\n"
-        if (re.search(sRegexLabel, sData)):
-            print("WARNING found 'LABEL' key word in VCard string, this will be removed, " +
-                  "because it is no longer valid as a standalone in VCard v4.0")
-            sData = re.sub(sRegexLabel, "\n", sData)
-        #
-        # v2.1 string replacements
-        # sample EMAIL;PREF;INTERNET:jane_doe@abc.com -> EMAIL;TYPE=internet,pref:jane_doe@abc.com
-        sData = re.sub(";PREF;INTERNET:", ";TYPE=internet,pref:", sData)
-        #
-        # EMAIL;INTERNET:jane_doe@abc.com  -> EMAIL;TYPE=internet:jane_doe@abc.com
-        sData = re.sub(";INTERNET:", ";TYPE=internet:", sData)
-        #
-        # ADR;WORK;PREF:;;100 Waters Edge;Baytown;LA;30314;USA
-        # -> ADR;TYPE=work,PREF:;;100 Waters Edge;Baytown;LA;30314;USA
-        sData = re.sub("(ADR);(.*?)(;PREF)(:|;)",
-                       "\g<1>;TYPE=\g<2>\g<3>\g<4>", sData)
-        #
-        sData = re.sub(";CELL;VOICE(:|;)", ";TYPE=cell,voice\g<1>", sData)
-        sData = re.sub(";CELL(:|;)", ";TYPE=cell,voice\g<1>", sData)
-        sData = re.sub(";HOME;VOICE(:|;)", ";TYPE=home,voice\g<1>", sData)
-        sData = re.sub(";HOME(:|;)", ";TYPE=home\g<1>", sData)
-        sData = re.sub(";WORK;VOICE(:|;)", ";TYPE=work,voice\g<1>", sData)
-        sData = re.sub(";PAGER;VOICE(:|;)", ";TYPE=pager,voice\g<1>", sData)
-        #
-        sData = re.sub(";VALUE=URI;TYPE=GIF(:|;)",
-                       ";MEDIATYPE=image/gif\g<1>", sData)  # PHOTO
-        sData = re.sub(";PHOTO;GIF(:|;)",
-                       ";MEDIATYPE=image/gif\g<1>", sData)  # PHOTO
-        #
-        return(sData)
+        sType = sType.strip().lower()
+        if ("/" in sType):
+            return(sType)
+        return("image/%s" % sType)
+
+    @staticmethod
+    def _splitLine(sLine):
+        """
+        splits a single (unfolded) property line into the tuple (sKey, sParameters, sValue)
+        e.g. "TEL;WORK;VOICE:(111) 555-1212" -> ("TEL", "TYPE=work,voice", "(111) 555-1212")
+        """
+        iColon = sLine.find(":")
+        if (iColon < 0):
+            iColon = len(sLine)
+        elif ('"' in sLine[:iColon]):
+            # a quoted parameter value may contain a ':'
+            matchHead = VCard._regexQuotedHead.match(sLine)
+            if matchHead:
+                iColon = matchHead.end()
+        sHead = sLine[:iColon]
+        sValue = sLine[iColon + 1:]
+        iSemicolon = sHead.find(";")
+        if (iSemicolon < 0):
+            sKey = sHead
+            sParameters = ""
+        else:
+            sKey = sHead[:iSemicolon]
+            sParameters = sHead[iSemicolon + 1:]
+        sKey = sKey.strip().upper()
+        # remove the group (e.g. "item1.EMAIL" -> "EMAIL")
+        if ("." in sKey):
+            sKey = sKey.rsplit(".", 1)[1]
+        if (sParameters != ""):
+            sParameters = VCard._normalizeParameters(sKey, sParameters)
+            if ("ENCODING=" in sParameters) and (sKey not in VCard._tupleBinaryProperties):
+                return(VCard._decodeValue(sKey, sParameters, sValue))
+        return((sKey, sParameters, sValue))
+
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def _splitEncoding(sParameters):
+        """
+        returns the tuple (sEncoding, sCharset, sParameters) of normalized parameters, where
+        sParameters are the other parameters, e.g. "TYPE=home;ENCODING=QUOTED-PRINTABLE;CHARSET=UTF-8"
+        -> ("QUOTED-PRINTABLE", "UTF-8", "TYPE=home")
+        """
+        sEncoding = None
+        sCharset = None
+        listParameters = []
+        for sParameter in VCard._regexParameter.findall(sParameters):
+            if sParameter.startswith("ENCODING="):
+                sEncoding = sParameter[9:].strip().upper()
+            elif sParameter.startswith("CHARSET="):
+                sCharset = sParameter[8:].strip()
+            else:
+                listParameters.append(sParameter)
+        return((sEncoding, sCharset, ";".join(listParameters)))
+
+    @staticmethod
+    @functools.lru_cache(maxsize=64)
+    def _getCharsetDecoder(sCharset):
+        """
+        returns a function, which decodes the bytes of a value with the given CHARSET, the codec
+        is looked up once per CHARSET, Windows-1252 (the default of Outlook) is decoded with a
+        translation table, so it never fails, unknown CHARSETs fall back to UTF-8 and Windows-1252
+        """
+        def decodeWindows1252(bValue):
+            return(bValue.decode("latin1").translate(VCard._dictWindows1252))
+
+        def decodeDefault(bValue):
+            try:
+                return(bValue.decode("utf-8"))
+            except UnicodeDecodeError:
+                return(decodeWindows1252(bValue))
+        try:
+            objCodecInfo = codecs.lookup(sCharset) if sCharset else None
+        except LookupError:
+            objCodecInfo = None
+        if (objCodecInfo is None) or (objCodecInfo.name == "utf-8"):
+            return(decodeDefault)
+        if (objCodecInfo.name in ("cp1252", "latin-1", "iso8859-1", "ascii")):
+            # LATIN1 and ASCII are the same as Windows-1252, where they are defined
+            return(decodeWindows1252)
+
+        def decodeCharset(bValue):
+            try:
+                return(objCodecInfo.decode(bValue)[0])
+            except UnicodeDecodeError:
+                return(decodeDefault(bValue))
+        return(decodeCharset)
+
+    @staticmethod
+    def _decodeValue(sKey, sParameters, sValue):
+        """
+        decodes a quoted-printable or base64 text value of v2.1/v3.0 (e.g.
+        "NOTE;ENCODING=QUOTED-PRINTABLE;CHARSET=Windows-1252:M=FCnchen=0D=0A=" -> "NOTE", "", "München\\n")
+        using its CHARSET, ENCODING and CHARSET are removed from the parameters, because the value
+        is plain text afterwards, other encodings (e.g. 8BIT) are kept as they are
+        """
+        (sEncoding, sCharset, sOtherParameters) = VCard._splitEncoding(sParameters)
+        refDecoder = VCard._dictValueDecoders.get(sEncoding)
+        if refDecoder is None:
+            return((sKey, sParameters, sValue))
+        try:
+            bValue = refDecoder(sValue.encode("utf-8"))
+        except (binascii.Error, ValueError):
+            # e.g. broken base64, kept as it is
+            return((sKey, sParameters, sValue))
+        sValue = VCard._getCharsetDecoder(sCharset)(bValue)
+        if ("\n" in sValue) or ("\r" in sValue):
+            sValue = VCard._regexLineBreak.sub("\\\\n", sValue)
+        return((sKey, sOtherParameters, sValue))
+
+    @staticmethod
+    def _joinLine(sKey, sParameters, sValue):
+        """
+        the opposite of "_splitLine"
+        """
+        if (sParameters != ""):
+            return("%s;%s:%s" % (sKey, sParameters, sValue))
+        return("%s:%s" % (sKey, sValue))
+
+    @staticmethod
+    def tokenize(sData):
+        """
+        splits the given VCard string in a single pass into (sKey, sParameters, sValue) tuples,
+        one per property, while reading it line by line
+          * line endings can be '\r\n' or '\n'
+          * folded lines (starting with a space or tab) are unfolded
+          * soft line breaks of quoted-printable values (line ending with '=') are joined
+          * parameters are normalized, see "_normalizeParameters"
+          * empty lines are skipped
+        """
+        listParts = None  # parts of the current (logical) line
+        bQuotedPrintable = False
+        for sLine in sData.split("\n"):
+            if sLine.endswith("\r"):
+                sLine = sLine[:-1]
+            if listParts is not None:
+                if bQuotedPrintable and listParts[-1].endswith("="):
+                    listParts[-1] = listParts[-1][:-1]
+                    listParts.append(sLine)
+                    continue
+                if sLine.startswith((" ", "\t")):
+                    listParts.append(sLine[1:])
+                    continue
+                yield(VCard._splitLine("".join(listParts)))
+                listParts = None
+            if (sLine == ""):
+                continue
+            listParts = [sLine]
+            bQuotedPrintable = ("QUOTED-PRINTABLE" in sLine[:sLine.find(":")].upper())
+        if listParts is not None:
+            yield(VCard._splitLine("".join(listParts)))
 
     @staticmethod
     def _getFileContent(sVCardFilePath):
-        sContent = ""
+        """
+        returns the decoded content of the whole file, see "_openFile" and "_decodeBytes"
+        """
+        VCard._checkFilePath(sVCardFilePath)
+        with VCard._openFile(sVCardFilePath) as fhVCardFile:
+            sContent = VCard._decodeBytes(fhVCardFile.read())
+        if sContent.startswith("\ufeff"):
+            sContent = sContent[1:]
+        return(sContent)
+
+    @staticmethod
+    def fromString(sData, bLazy=False):
+        """
+        parses a VCard string (v2.1, v3.0 or v4.0)
+        if bLazy is True, the values of the standard and registered properties are only
+        decoded when they are accessed for the first time, properties which were never accessed
+        are printed as they are by "prettyPrint" (if the VCard string was already v4.0)
+        """
+        # create a new VCard instance
+        objVCard = VCard()
+        dictPropertyHandlers = VCard._dictPropertyHandlers
+        if bLazy:
+            dictPending = objVCard._pending = {}
+            dictPropertySlots = VCard._dictPropertySlots
+        objSummary = VCard.summary
+        bLabelFound = False
+        # parse the given data by property and assign the values to our new VCard instance
+        for (sKey, sParameters, sValue) in VCard.tokenize(sData):
+            # skip these two lines
+            if ((sKey == "BEGIN") or (sKey == "END")) and (sValue.strip().upper() == "VCARD"):
+                continue
+            if sKey == "VERSION":
+                # version of the VCard object will be v4, regardless what the original VCard string was
+                objVCard._sourceVersion = sValue.strip()
+                continue
+            if sKey == "LABEL":
+                # LABEL are no longer support as standalone in VCard v4 (only as part)
+                objSummary.iPropertiesDropped += 1
+                if not bLabelFound:
+                    objSummary.warning("label", "found 'LABEL' key word in VCard string, this will be removed, " +
+                                       "because it is no longer valid as a standalone in VCard v4.0")
+                    bLabelFound = True
+                continue
+            # generic approach
+            try:
+                # check for known keys
+                tupleHandler = dictPropertyHandlers.get(sKey)
+                if (tupleHandler is not None):
+                    if bLazy:
+                        # only keep the line, it is decoded by "_decodePending" when needed
+                        listPending = dictPending.get(sKey)
+                        if listPending is None:
+                            listPending = dictPending[sKey] = []
+                            if sKey in dictPropertySlots:
+                                # unset the attribute, so accessing it calls "__getattr__"
+                                delattr(objVCard, dictPropertySlots[sKey])
+                        listPending.append((sParameters, sValue))
+                    else:
+                        tupleHandler[0](objVCard, sParameters, sValue)
+                else:
+                    if (sKey.startswith("X")):
+                        if (sParameters != ""):
+                            objVCard.addCustomProperty("%s;%s" % (sKey, sParameters), sValue)
+                        else:
+                            objVCard.addCustomProperty(sKey, sValue)
+                    else:
+                        objSummary.iPropertiesDropped += 1
+                        objSummary.warning(
+                            "unknown-property",
+                            "found unknown property, which does not start with an 'X' // '%s', this data will be ignored", sKey)
+                        logger.debug("data to be ignored '%s;%s:%s'", sKey, sParameters, sValue)
+                #
+            except Exception as ex:
+                objSummary.dictWarnings["error"] += 1
+                sLine = VCard._joinLine(sKey, sParameters, sValue)
+                logger.error("could no add this line '%s' to VCard object // %s", sLine, ex)
+                raise(VCardParseError("could not add line '%s': %s" % (sLine[:200], ex), sLine)) from ex
+            #
+        if bLazy and (len(dictPending) == 0):
+            objVCard._pending = None
+        objSummary.iCardsParsed += 1
+        return(objVCard)
+
+    @staticmethod
+    def _checkFilePath(sVCardFilePath):
         # check if file and accessable
         if (os.path.exists(sVCardFilePath)):
             if (os.path.isfile(sVCardFilePath)):
@@ -217,499 +1150,2478 @@ class VCard:
                 raise(ValueError("a file path pointing to a VCard file was expected, but a folder path was given '%s'" % sVCardFilePath))
         else:
             raise(Exception("given file path is not accessable '%s'" % sVCardFilePath))
-        # load bytes of file and find the right encoding (ANSI, LATIN1 or UTF8)
-        with open(sVCardFilePath, "rb") as fhVCardFile:
-            fileData = fhVCardFile.read()
+
+    @staticmethod
+    def _iterCardBytes(fhVCardFile, iChunkSize=1048576, bIncomplete=False):
+        """
+        reads the opened (binary) file handle in chunks of iChunkSize bytes and yields
+        tuples (iOffset, bCard) for every "BEGIN:VCARD ... END:VCARD" block found, where
+        iOffset is the byte offset of the block within the file
+        only the current chunk and the VCard which is currently parsed are kept in memory
+        if bIncomplete is True, a VCard without "END:VCARD" at the end of the file is yielded too
+        """
+        objSplitter = _CardSplitter()
+        while True:
+            bChunk = fhVCardFile.read(iChunkSize)
+            if not bChunk:
+                break
+            yield from objSplitter.split(bChunk)
+        if bIncomplete and objSplitter.hasIncomplete():
+            yield((objSplitter._iBufferOffset, objSplitter._bBuffer))
+
+    @staticmethod
+    def _openFile(sVCardFilePath):
+        """
+        opens the file for reading bytes, UTF-16 and UTF-32 files (detected by their BOM or,
+        without BOM, by the zero bytes of "BE") are converted to UTF-8 while reading, so
+        "BEGIN:VCARD" can always be found in the bytes
+        only the first 4 bytes are used to detect the encoding, UTF-8, ASCII and the
+        Windows codepages are detected per line by "_decodeBytes"
+        """
+        fhVCardFile = open(sVCardFilePath, "rb")
+        bHead = fhVCardFile.read(4)
+        fhVCardFile.seek(0)
+        sEncoding = VCard._detectEncoding(bHead)
+        if sEncoding is None:
+            return(fhVCardFile)
+        return(_TranscodingReader(fhVCardFile, sEncoding))
+
+    @staticmethod
+    def _detectEncoding(bHead):
+        """
+        returns "utf-32", "utf-16", "utf-16-le" or "utf-16-be" for the first 4 bytes of a file
+        or a stream, None for everything else (converted per line, see "_decodeBytes")
+        """
+        if bHead.startswith((codecs.BOM_UTF32_LE, codecs.BOM_UTF32_BE)):
+            return("utf-32")
+        elif bHead.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            return("utf-16")
+        elif (len(bHead) >= 4) and (bHead[1] == 0) and (bHead[3] == 0) and (bHead[0] != 0):
+            return("utf-16-le")
+        elif (len(bHead) >= 4) and (bHead[0] == 0) and (bHead[2] == 0) and (bHead[1] != 0):
+            return("utf-16-be")
+        return(None)
+
+    @staticmethod
+    def _decodeLine(bLine, sCharset):
+        """
+        decodes a line, which is not UTF-8, using the given CHARSET of its property,
+        if not given or not known Windows-1252 is used (LATIN1 for bytes not defined in Windows-1252)
+        """
+        if sCharset is not None:
             try:
-                # check if file content is UTF8 (default format for VCard v4.0)
-                sContent = fileData.decode('utf-8')
-            except UnicodeDecodeError:
-                # maybe it is 'LATIN1'
+                return(bLine.decode(sCharset))
+            except (LookupError, UnicodeDecodeError):
+                pass
+        try:
+            return(bLine.decode("utf-8"))
+        except UnicodeDecodeError:
+            return(bLine.decode("latin1").translate(VCard._dictWindows1252))
+
+    @staticmethod
+    def _decodeBytes(bData):
+        """
+        decodes the bytes of a VCard (or a whole file), UTF-8 (default format for VCard v4.0)
+        is tried first, if it fails the lines starting with the line of the first invalid byte
+        are decoded one by one, using the CHARSET of their property (e.g. CHARSET=Windows-1252)
+        or Windows-1252, the bytes in front of that line are not decoded a second time
+        """
+        try:
+            return(bData.decode("utf-8"))
+        except UnicodeDecodeError as ex:
+            iLineStart = bData.rfind(b"\n", 0, ex.start) + 1
+        listParts = [bData[:iLineStart].decode("utf-8")]
+        sCharset = None
+        for bLine in bData[iLineStart:].splitlines(True):
+            # folded lines use the CHARSET of the line they belong to
+            if not bLine.startswith((b" ", b"\t")):
+                matchCharset = VCard._regexCharset.match(bLine)
+                sCharset = matchCharset.group(1).decode("ascii") if matchCharset else None
+            listParts.append(VCard._decodeLine(bLine, sCharset))
+        return("".join(listParts))
+
+    @staticmethod
+    def _fromCardString(sCard, sVCardFilePath, bLazy=False):
+        """
+        checks the version of a single "BEGIN:VCARD ... END:VCARD" block, found in the
+        given file and parses it, returns None if the version is not supported
+        """
+        matchesVersion = re.findall("VERSION:([2-4]\.[0-1])", sCard)
+        if len(matchesVersion) != 1:
+            raise(VCardParseError("found %d version strings instead of one in file '%s'" % (
+                len(matchesVersion), sVCardFilePath)))
+        if ((matchesVersion[0] == "2.1") or (matchesVersion[0] == "3.0") or (matchesVersion[0] == "4.0")):
+            return(VCard.fromString(sCard, bLazy))
+        else:
+            VCard.summary.warning("unknown-version", "unknown version, not implemented, found VCard version '%s' in file '%s'",
+                                  matchesVersion[0], sVCardFilePath)
+            return(None)
+
+    @staticmethod
+    def iterFile(sVCardFilePath, iChunkSize=1048576, bLazy=False, objCache=None, objRejects=None):
+        """
+        same as "fromFile", but returns a generator which yields one VCard instance
+        after the other, the file is read in chunks of iChunkSize bytes, so the memory
+        usage stays flat, regardless how big the file is
+        for bLazy see "fromString", with a VCardParseCache VCards seen before are not parsed again
+        with VCardRejects (lenient mode) a VCard, which can not be parsed, is passed to it and
+        parsing goes on with the next VCard, instead of raising an exception (the lines of a
+        lazy VCard are only checked when they are decoded, so use bLazy=False with it)
+        """
+        VCard._checkFilePath(sVCardFilePath)
+        with VCard._openFile(sVCardFilePath) as fhVCardFile:
+            for (iOffset, bCard) in VCard._iterCardBytes(fhVCardFile, iChunkSize, objRejects is not None):
                 try:
-                    sContent = fileData.decode('latin1')
-                except UnicodeDecodeError as ex:
-                    # maybe it is 'ASCII' (default format for VCard v2.1)
-                    try:
-                        sContent = fileData.decode('ascii')
-                    except UnicodeDecodeError as ex:
-                        print(
-                            "could not decode VCard file, neither 'UTF8', 'LATIN1' nor 'ASCII' worked")
-                        raise(ex)
-                    # end try ascii
-                # end try latin1
-            # end try utf8
-        return(sContent)
+                    if (objRejects is not None) and not bCard.endswith(b"END:VCARD"):
+                        raise(VCardParseError("VCard is not complete, 'END:VCARD' is missing"))
+                    if objCache is not None:
+                        objVCard = objCache.getVCard(bCard, sVCardFilePath, bLazy)
+                    else:
+                        objVCard = VCard._fromCardBytes(bCard, sVCardFilePath, bLazy)
+                except Exception as ex:
+                    if objRejects is None:
+                        raise
+                    objRejects.reject(sVCardFilePath, iOffset, bCard, ex)
+                    continue
+                if objVCard is not None:
+                    yield(objVCard)
+
+    @staticmethod
+    def fromFile(sVCardFilePath, bLazy=False, objCache=None, objRejects=None):
+        """
+        returns a list of all VCards found in the given file, use "iterFile" to
+        process big files VCard by VCard, for bLazy, objCache and objRejects see "iterFile"
+        """
+        return(list(VCard.iterFile(sVCardFilePath, bLazy=bLazy, objCache=objCache, objRejects=objRejects)))
+
+    @staticmethod
+    async def aiterStream(objReader, iChunkSize=65536, objExecutor=None, bLazy=False):
+        """
+        async version of "iterFile" for an asyncio.StreamReader or any object with a
+        coroutine read(iSize), which returns b"" at the end, the VCards are yielded as soon
+        as they are complete, e.g. "async for objVCard in VCard.aiterStream(objReader):"
+        if an executor is given (e.g. a concurrent.futures.ProcessPoolExecutor), the VCards
+        are parsed in it, so the event loop is not blocked by parsing, else in the event loop
+        """
+        import asyncio
+        objLoop = asyncio.get_running_loop()
+        objSplitter = _CardSplitter()
+        objDecoder = None
+        bHead = b""  # the first bytes are needed to detect UTF-16/UTF-32, see "_openFile"
+        while True:
+            bChunk = await objReader.read(iChunkSize)
+            if bHead is not None:
+                bHead += bChunk
+                if (len(bHead) < 4) and bChunk:
+                    continue
+                sEncoding = VCard._detectEncoding(bHead)
+                if sEncoding is not None:
+                    objDecoder = codecs.getincrementaldecoder(sEncoding)()
+                (bChunk, bHead) = (bHead, None)
+            if not bChunk:
+                break
+            if objDecoder is not None:
+                # a character could be split by the chunk border, then it is part of the next chunk
+                bChunk = objDecoder.decode(bChunk).encode("utf-8")
+            listCards = objSplitter.split(bChunk)
+            if objExecutor is None:
+                for (iOffset, bCard) in listCards:
+                    objVCard = VCard._fromCardBytes(bCard, "<stream>", bLazy)
+                    if objVCard is not None:
+                        yield(objVCard)
+            else:
+                # the VCards of a chunk are parsed in parallel, but yielded in order
+                listFutures = [objLoop.run_in_executor(objExecutor, VCard._fromCardBytes, bCard, "<stream>", bLazy)
+                               for (iOffset, bCard) in listCards]
+                for objFuture in listFutures:
+                    objVCard = await objFuture
+                    if objVCard is not None:
+                        yield(objVCard)
+
+    @staticmethod
+    def _fromCardBytes(bCard, sVCardFilePath, bLazy=False):
+        return(VCard._fromCardString(VCard._decodeBytes(bCard), sVCardFilePath, bLazy))
+
+    def hasProperty(self, sPropertyName):
+        if sPropertyName in VCard._dictPropertyHandlers:
+            return True
+        else:
+            return False
+
+    def getProperty(self, sPropertyName):
+        """
+        returns the parsed value of a standard or registered property, None if not set
+        """
+        if sPropertyName in VCard._tupleStandardProperties:
+            return getattr(self, "_" + sPropertyName.lower())
+        if (self._pending is not None) and (sPropertyName in self._pending):
+            self._decodePending(sPropertyName)
+        if self._extraProperties is None:
+            return None
+        return self._extraProperties.get(sPropertyName)
+
+    def _getExtraProperties(self):
+        if self._extraProperties is None:
+            self._extraProperties = {}
+        return self._extraProperties
+
+    def _setFromLine(self, sExpectedKey, sLine):
+        """
+        parses a single property line (e.g. "N:Gump;Forrest") and assigns its value
+        """
+        (sKey, sParameters, sValue) = VCard._splitLine(sLine)
+        if (sKey != sExpectedKey) or (":" not in sLine):
+            raise(ValueError(
+                "could not parse string for '%s', tried to parse this '%s'" % (sExpectedKey, sLine)))
+        if (self._pending is not None) and (sKey in self._pending):
+            # decode the lines of a lazy VCard first, so they do not overwrite the new value later
+            self._decodePending(sKey)
+        VCard._dictPropertyHandlers[sKey][0](self, sParameters, sValue)
+
+    @staticmethod
+    def registerProperty(sPropertyName, refParser=None, refSerializer=None, bMultipleValues=False):
+        """
+        registers a property (e.g. BDAY, NICKNAME, GEO or CATEGORIES), so it is parsed by
+        "fromString" and printed by "prettyPrint" instead of being ignored
+          * refParser(objVCard, sParameters, sValue) is called for every line of this property
+          * refSerializer(objVCard) returns the line(s) for "prettyPrint" or "" if not set
+        if no parser/serializer is given, the value is kept as plain text and can be read
+        with "getProperty", use bMultipleValues=True to keep a list of values (one per line)
+        registering a property again replaces its handlers
+        """
+        sPropertyName = sPropertyName.upper()
+        if (refParser is None):
+            if bMultipleValues:
+                def refParser(objVCard, sParameters, sValue):
+                    objVCard._getExtraProperties().setdefault(sPropertyName, []).append(sValue)
+            else:
+                def refParser(objVCard, sParameters, sValue):
+                    objVCard._getExtraProperties()[sPropertyName] = sValue
+        if (refSerializer is None):
+            if bMultipleValues:
+                def refSerializer(objVCard):
+                    return("\n".join("%s:%s" % (sPropertyName, sValue)
+                                     for sValue in (objVCard.getProperty(sPropertyName) or [])))
+            else:
+                def refSerializer(objVCard):
+                    sValue = objVCard.getProperty(sPropertyName)
+                    if sValue is None:
+                        return("")
+                    return("%s:%s" % (sPropertyName, sValue))
+        VCard._dictPropertyHandlers[sPropertyName] = (refParser, refSerializer)
+        VCard._dictLineIterators.pop(sPropertyName, None)
+
+    def hasCustomProperty(self, sPropertyName):
+        if (self._customProperties is not None) and (sPropertyName in self._customProperties):
+            return True
+        else:
+            return False
+
+    def addCustomProperty(self, sPropertyName, sPropertyValue):
+        if self._customProperties is None:
+            self._customProperties = OrderedDict()
+        self._customProperties[sPropertyName] = sPropertyValue
+
+    def getCustomProperty(self, sPropertyName):
+        if self._customProperties is None:
+            raise(KeyError(sPropertyName))
+        return self._customProperties[sPropertyName]
+
+    @property
+    def sourceVersion(self):
+        """
+        VERSION of the VCard string this instance was parsed from, None if not parsed
+        """
+        return self._sourceVersion
+
+    @property
+    def version(self):
+        return "4.0"
+
+    @property
+    def surname(self):
+        return self._n.surname
+
+    @surname.setter
+    def surname(self, value):
+        self._getN().surname = value
+
+    @property
+    def givenName(self):
+        return self._n.givenName
+
+    @givenName.setter
+    def givenName(self, value):
+        self._getN().givenName = value
+
+    @property
+    def additonalNames(self):
+        return self._n.additonalNames
+
+    @additonalNames.setter
+    def additonalNames(self, value):
+        self._getN().additonalNames = value
+
+    @property
+    def honorificPrefixes(self):
+        return self._n.honorificPrefixes
+
+    @honorificPrefixes.setter
+    def honorificPrefixes(self, value):
+        self._getN().honorificPrefixes = value
+
+    @property
+    def honorificSuffixes(self):
+        return self._n.honorificSuffixes
+
+    @honorificSuffixes.setter
+    def honorificSuffixes(self, value):
+        self._getN().honorificSuffixes = value
+
+    @property
+    def VERSION(self):
+        return("VERSION:%s" % (self.version))
+
+    @property
+    def N(self):
+        if self._n is None:
+            return("")
+        else:
+            return("N:%s;%s;%s;%s;%s" % (self.surname, self.givenName, self.additonalNames, self.honorificPrefixes, self.honorificSuffixes))
+
+    def setN(self, value):
+        """
+        sample:
+        N:Gump;Forrest;;Mr.
+        N;LANGUAGE=de:Gump;Forrest
+        """
+        self._setFromLine("N", value)
+
+    def _getN(self):
+        if self._n is None:
+            self._n = VCardName()
+        return self._n
+
+    def _parseN(self, sParameters, sValue):
+        # VCardName takes the parts in the same order, additional parts are ignored
+        self._n = VCardName(*sValue.split(";")[:5])
+
+    @property
+    def formattedNameString(self):
+        return self._fn
+
+    @property
+    def FN(self):
+        return("FN:%s" % (self.formattedNameString))
+
+    def setFN(self, value):
+        self._setFromLine("FN", value)
+
+    def _parseFN(self, sParameters, sValue):
+        self._fn = sValue
+
+    @property
+    def organisation(self):
+        return self._org
+
+    @property
+    def ORG(self):
+        if self.organisation is None:
+            return("")
+        else:
+            return("ORG:%s" % (self.organisation))
+
+    def setORG(self, value):
+        self._setFromLine("ORG", value)
+
+    def _parseORG(self, sParameters, sValue):
+        self._org = sValue
+
+    @property
+    def title(self):
+        return self._title
+
+    @property
+    def TITLE(self):
+        if self.title is None:
+            return("")
+        else:
+            return("TITLE:%s" % (self.title))
+
+    def setTITLE(self, value):
+        self._setFromLine("TITLE", value)
+
+    def _parseTITLE(self, sParameters, sValue):
+        self._title = sValue
+
+    @property
+    def EMAIL(self):
+        # if we have multiple email addresses use a line break as seperator
+        return("\n".join("".join(tupleParts) for tupleParts in self._iterEMAILLines()))
+
+    def _iterEMAILLines(self):
+        for objMail in (self._email or ()):
+            if objMail.type is not None:
+                sType = ";TYPE=%s,pref" % objMail.type if (objMail.pref is not None) else ";TYPE=%s" % objMail.type
+            elif objMail.pref is not None:
+                sType = ";TYPE=pref"
+            else:
+                sType = ""
+            yield(("EMAIL", sType, ":", objMail.address))
+
+    def setEMAIL(self, value):
+        """
+        sample from RFC 2426
+        EMAIL;TYPE=internet:jqpublic@xyz.dom1.com
+        EMAIL;TYPE=internet:jdoe@isp.net
+        EMAIL;TYPE=internet,pref:jane_doe@abc.com
+        """
+        self._setFromLine("EMAIL", value)
+
+    def _parseEMAIL(self, sParameters, sValue):
+        objMail = VCardEmail(sValue)
+        # sParameters should be something like "TYPE=internet,pref"
+        objParameters = VCard.parseParameters(sParameters)
+        if (len(objParameters.TYPE) > 0):
+            objMail.type = ",".join(objParameters.TYPE)
+        if objParameters.PREF is not None:
+            objMail.pref = True
+        if self._email is None:
+            self._email = []
+        self._email.append(objMail)
+
+    @property
+    def TEL(self):
+        # if we have multiple tel use a line break as seperator
+        return("\n".join("".join(tupleParts) for tupleParts in self._iterTELLines()))
+
+    def _iterTELLines(self):
+        for objTel in (self._tel or ()):
+            listParts = ["TEL"]
+            if objTel.TYPE:
+                listParts.append(";TYPE=%s" % ",".join(objTel.TYPE))
+            if objTel.PREF is not None:
+                listParts.append(";PREF=%d" % objTel.PREF)
+            if objTel.VALUE is not None:
+                listParts.append(";VALUE=%s" % objTel.VALUE)
+            # add tel data
+            listParts.append(":")
+            listParts.append(objTel.data)
+            yield(listParts)
+
+    def setTEL(self, value):
+        """
+        sample from RFC 6350
+        TEL;VALUE=uri;TYPE=work,voice;PREF=1:tel:+1-418-656-9254;ext=102  #
+        """
+        self._setFromLine("TEL", value)
+
+    def _parseTEL(self, sParameters, sValue):
+        # parse value part
+        objTel = VCardTelephone(sValue)
+        # parse key part
+        if (sParameters != ""):
+            objParameters = VCard.parseParameters(sParameters)
+            # the cached result is shared, so TYPE gets its own list
+            objTel.TYPE = list(objParameters.TYPE)
+            objTel.PREF = objParameters.PREF
+            objTel.VALUE = objParameters.VALUE
+        #
+        if self._tel is None:
+            self._tel = []
+        self._tel.append(objTel)
+
+    @property
+    def ADR(self):
+        # if we have multiple addresses use a line break as seperator
+        return("\n".join("".join(tupleParts) for tupleParts in self._iterADRLines()))
+
+    def _iterADRLines(self):
+        for objAdr in (self._adr or ()):
+            if objAdr.TYPE is not None:
+                sType = ";TYPE=%s,pref" % objAdr.TYPE if (objAdr.PREF is not None) else ";TYPE=%s" % objAdr.TYPE
+            elif objAdr.PREF is not None:
+                sType = ";TYPE=pref"
+            else:
+                sType = ""
+            yield(("ADR", sType, ":", ";".join(objAdr.address)))
+
+    def setADR(self, value):
+        """
+        sample from RFC 6350
+        ADR;TYPE=work,PREF:;Suite D2-630;2875 Laurier;Quebec;QC;G1V 2M2;Canada
+        """
+        self._setFromLine("ADR", value)
+
+    def _parseADR(self, sParameters, sValue):
+        objAdr = VCardAddress()
+        # sParameters should be something like "TYPE=work,PREF"
+        objParameters = VCard.parseParameters(sParameters)
+        if (len(objParameters.TYPE) > 0):
+            objAdr.TYPE = ",".join(objParameters.TYPE)
+        if objParameters.PREF is not None:
+            objAdr.PREF = True
+        # split address
+        # should result in ["","Suite D2-630", "2875 Laurier" ,"Quebec", "QC", "G1V 2M2", "Canada"]
+        tmpAddress = sValue.split(";")
+        for (sName, sPart) in zip(VCardAddress._tupleParts, tmpAddress):
+            setattr(objAdr, sName, sPart)
+        #
+        if self._adr is None:
+            self._adr = []
+        self._adr.append(objAdr)
+
+    @property
+    def PHOTO(self):
+        if (self._photo is None) or (self._photo.data is None):
+            return("")
+        return("".join(self._photo.iterParts()))
+
+    def _iterPHOTOLines(self):
+        if (self._photo is not None) and (self._photo.data is not None):
+            # the image is not copied into one string, see "VCardWriter"
+            yield(self._photo.iterParts())
+
+    @property
+    def photo(self):
+        """
+        the VCardPhoto of this VCard, None if not set
+        """
+        return self._photo
+
+    @photo.setter
+    def photo(self, value):
+        # set None to remove the PHOTO (e.g. for bulk conversions), without decoding it
+        if (self._pending is not None) and ("PHOTO" in self._pending):
+            del self._pending["PHOTO"]
+            if (len(self._pending) == 0):
+                self._pending = None
+        self._photo = value
+
+    def setPHOTO(self, value):
+        """
+        example PHOTO;MEDIATYPE=image/gif:http://www.example.com/dir_photos/my_photo.gif
+        """
+        self._setFromLine("PHOTO", value)
+
+    def _parsePHOTO(self, sParameters, sValue):
+        # the value is kept as it is, no matter how big the image is
+        self._photo = VCardPhoto(sValue)
+        # sParameters should be something like "MEDIATYPE=image/gif" or "ENCODING=b;MEDIATYPE=image/jpeg"
+        objParameters = VCard.parseParameters(sParameters)
+        self._photo.MEDIATYPE = objParameters.MEDIATYPE
+        self._photo.ENCODING = objParameters.ENCODING
+        if (objParameters.ENCODING is not None):
+            # the folded base64 of a v2.1 VCard is often indented, the spaces can not be part of the data uri
+            self._photo.data = "".join(sValue.split())
+
+    @property
+    def REV(self):
+        if self._rev is None:
+            return("")
+        else:
+            return("REV:%s" % (self._rev))
+
+    def setREV(self, value):
+        self._setFromLine("REV", value)
+
+    def _parseREV(self, sParameters, sValue):
+        self._rev = sValue
+
+    @property
+    def UID(self):
+        if self._uid is None:
+            return("")
+        else:
+            return("UID:%s" % (self._uid))
+
+    def setUID(self, value):
+        self._setFromLine("UID", value)
+
+    def _parseUID(self, sParameters, sValue):
+        self._uid = sValue
+
+    @property
+    def NOTE(self):
+        if self._note is None:
+            return("")
+        else:
+            return("NOTE:%s" % (self._note))
+
+    def setNOTE(self, value):
+        self._setFromLine("NOTE", value)
+
+    def _parseNOTE(self, sParameters, sValue):
+        self._note = sValue
+
+    @property
+    def URL(self):
+        if self._url is None:
+            return("")
+        else:
+            return("URL:%s" % (self._url))
+
+    def setURL(self, value):
+        self._setFromLine("URL", value)
+
+    def _parseURL(self, sParameters, sValue):
+        self._url = sValue
+
+    def prettyPrint(self, bIncludeCustomProperties=True):
+        return("\n".join("".join(iterParts) for iterParts in self._iterLines(bIncludeCustomProperties)) + "\n")
+
+    def writeTo(self, fhStream, bIncludeCustomProperties=True):
+        """
+        writes the VCard as UTF-8 to a binary stream, lines are folded after 75 octets,
+        use a VCardWriter to write a lot of VCards, returns the number of written bytes
+        """
+        objWriter = VCardWriter(fhStream)
+        objWriter.write(self, bIncludeCustomProperties)
+        objWriter.flush()
+        return(objWriter.iBytesWritten)
+
+    def getCanonicalHashes(self, tupleIgnore=()):
+        """
+        returns an OrderedDict property name -> hash of its v4.0 lines (sorted, so the order of e.g.
+        the EMAIL addresses does not matter), two VCards with the same hashes have the same content
+        """
+        dictLines = OrderedDict()
+        for iterParts in self._iterLines():
+            sLine = "".join(iterParts)
+            # without the group, e.g. "item1.X-ABLABEL;..." -> "X-ABLABEL"
+            sPropertyName = VCard._regexPropertyName.match(sLine).group(1).upper()
+            if (sPropertyName not in ("BEGIN", "VERSION", "END")) and (sPropertyName not in tupleIgnore):
+                dictLines.setdefault(sPropertyName, []).append(sLine.encode("utf-8"))
+        return(OrderedDict((sPropertyName, hashlib.blake2b(b"\n".join(sorted(listLines)), digest_size=8).hexdigest())
+                           for (sPropertyName, listLines) in dictLines.items()))
+
+    def _iterLines(self, bIncludeCustomProperties=True):
+        """
+        yields the v4.0 lines of the VCard (without line break), each line as an iterable of
+        strings, which are the parts of the line (e.g. the data of a PHOTO is a part of its own)
+        """
+        # begin tag
+        yield(("BEGIN:VCARD",))
+        # lines of a lazy VCard, which were never decoded, are printed as they are (if already v4.0)
+        if (self._pending is not None) and (self._sourceVersion == "4.0"):
+            dictVerbatim = self._pending
+        else:
+            dictVerbatim = {}
+        # add standard and registered properties
+        for (sPropertyName, (refParser, refSerializer)) in VCard._dictPropertyHandlers.items():
+            if sPropertyName in dictVerbatim:
+                for (sParameters, sValue) in dictVerbatim[sPropertyName]:
+                    yield((VCard._joinLine(sPropertyName, sParameters, sValue),))
+            elif sPropertyName in VCard._dictLineIterators:
+                yield from VCard._dictLineIterators[sPropertyName](self)
+            else:
+                sLines = refSerializer(self)
+                if (len(sLines) > 0):
+                    for sLine in sLines.split("\n"):
+                        yield((sLine,))
+        # include custom properties /properties starting with "X"
+        if (bIncludeCustomProperties is True):
+            for sCustomProperty in (self._customProperties or ()):
+                yield((sCustomProperty, ":", self.getCustomProperty(sCustomProperty)))
+        # end tag
+        yield(("END:VCARD",))
+
+    def __str__(self):
+        return("VCard:v%s //FN:%s //N:%s" % (self.version, self.FN, self.N))
+
+
+VCard._objNoParameters = VCardParameters((), None, None, None, None, None, ())
+
+# register the standard properties, "prettyPrint" keeps this order
+VCard._dictPropertyHandlers["VERSION"] = (None, VCard.VERSION.fget)  # VERSION is always 4.0, never parsed
+for sPropertyName in VCard._tupleStandardProperties:
+    VCard.registerProperty(sPropertyName, getattr(VCard, "_parse%s" % sPropertyName),
+                           getattr(VCard, sPropertyName).fget)
+for sPropertyName in ("EMAIL", "TEL", "ADR", "PHOTO"):
+    VCard._dictLineIterators[sPropertyName] = getattr(VCard, "_iter%sLines" % sPropertyName)
+del sPropertyName
+
+
+class VCardWriter:
+    """
+    writes VCards as UTF-8 to a binary stream (a file, io.BytesIO, a socket file, ...)
+    lines are folded after 75 octets (RFC 6350, 3.2) without splitting a character, the
+    output is collected in a buffer, so a lot of small lines end up in a few big writes
+    """
+
+    def __init__(self, fhStream, iBufferSize=65536, sLineBreak="\r\n", iFoldAt=75):
+        self._fhStream = fhStream
+        self._iBufferSize = iBufferSize
+        self._bLineBreak = sLineBreak.encode("ascii")
+        # a folded line continues with a space in the next line
+        self._bFold = self._bLineBreak + b" "
+        self._iFoldAt = iFoldAt  # 0 means lines are not folded
+        self._bBuffer = bytearray()
+        self.iCardsWritten = 0
+        self.iBytesWritten = 0
+
+    def write(self, objVCard, bIncludeCustomProperties=True):
+        for iterParts in objVCard._iterLines(bIncludeCustomProperties):
+            self._writeLine(iterParts)
+        self.iCardsWritten += 1
+
+    def writeAll(self, iterVCards, bIncludeCustomProperties=True):
+        """
+        writes all VCards of a list or an iterator (e.g. "VCard.iterFile"), returns their count
+        """
+        iCards = 0
+        for objVCard in iterVCards:
+            self.write(objVCard, bIncludeCustomProperties)
+            iCards += 1
+        return(iCards)
+
+    def _writeLine(self, iterParts):
+        iLength = 0  # octets in the current line, after the last fold
+        for sPart in iterParts:
+            bPart = sPart.encode("utf8")
+            if (self._iFoldAt == 0) or (iLength + len(bPart) <= self._iFoldAt):
+                self._bBuffer += bPart
+                iLength += len(bPart)
+                continue
+            iStart = 0
+            while (iStart < len(bPart)):
+                iEnd = iStart + self._iFoldAt - iLength
+                if (iEnd >= len(bPart)):
+                    self._bBuffer += bPart[iStart:]
+                    iLength += len(bPart) - iStart
+                    break
+                # never fold within a multi byte character (continuation bytes are 10xxxxxx)
+                while (iEnd > iStart) and ((bPart[iEnd] & 0xC0) == 0x80):
+                    iEnd -= 1
+                self._bBuffer += bPart[iStart:iEnd]
+                self._bBuffer += self._bFold
+                iLength = 1
+                iStart = iEnd
+            if (len(self._bBuffer) >= self._iBufferSize):
+                self.flush()
+        self._bBuffer += self._bLineBreak
+        if (len(self._bBuffer) >= self._iBufferSize):
+            self.flush()
+
+    def flush(self):
+        """
+        writes the buffer to the stream (the stream itself is not flushed)
+        """
+        if (len(self._bBuffer) > 0):
+            self._fhStream.write(self._bBuffer)
+            self.iBytesWritten += len(self._bBuffer)
+            self._bBuffer = bytearray()
+
+    def close(self):
+        """
+        flushes the buffer, the stream is not closed
+        """
+        self.flush()
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class VCardShardWriter:
+    """
+    writes VCards into several files (shards) of a folder, for imports, which can not handle a
+    single big file: a new shard is started after iMaxCards VCards or before iMaxBytes would be
+    exceeded (<sPrefix>-00001.v4.vcf, <sPrefix>-00002.v4.vcf, ...) or, with bPerUID, every VCard
+    is written to its own file named by its UID (<UID>.v4.vcf)
+    the shards are written by iThreads threads to temporary files, which are renamed by "close",
+    when all shards were written, then the shards <sPrefix>-*.v4.vcf of an earlier run, which were
+    not replaced, are removed (the files of bPerUID are not removed), so an import never sees a half
+    written shard and an interrupted run (see "abort") leaves the shards of the earlier run as they are
+      with VCardShardWriter("out", iMaxBytes=50 * 1024 * 1024) as objShards:
+          for objVCard in VCard.iterFile(sFilePath):
+              objShards.write(objVCard)
+    """
+    # the UID line of a converted VCard, e.g. "UID:1234"
+    _regexUID = re.compile(b"^(?:[A-Za-z0-9-]+\\.)?UID(?:;[^:\r\n]*)?:([^\r\n]*)", re.MULTILINE | re.IGNORECASE)
+    # characters, which are replaced by "_" in a file name
+    _regexUnsafe = re.compile("[^A-Za-z0-9@._-]")
+
+    def __init__(self, sFolder, sPrefix="contacts", iMaxCards=None, iMaxBytes=None, bPerUID=False, iThreads=4):
+        if not (iMaxCards or iMaxBytes or bPerUID):
+            raise(ValueError("VCardShardWriter needs iMaxCards, iMaxBytes or bPerUID"))
+        import concurrent.futures
+        self._sFolder = sFolder
+        self._sPrefix = sPrefix
+        self._iMaxCards = iMaxCards
+        self._iMaxBytes = iMaxBytes
+        self._bPerUID = bPerUID
+        os.makedirs(sFolder, exist_ok=True)
+        self._iThreads = iThreads
+        self._objExecutor = concurrent.futures.ThreadPoolExecutor(iThreads)
+        self._listFutures = []
+        self._listShard = []  # VCards (bytes) of the current shard
+        self._iShardBytes = 0
+        # complete shards (sFilePath, listParts), which are passed to a thread together
+        self._listBatch = []
+        self._iBatchBytes = 0
+        self._setNames = set()  # file names (lowercase) used by bPerUID
+        self.listShards = []  # paths of the shards, in order
+        self.iCardsWritten = 0
+        self.iBytesWritten = 0
+
+    def _removeShards(self):
+        # the shards of an earlier run, which were not replaced by this run
+        regexShard = re.compile(re.escape(self._sPrefix) + "-[0-9]+\\.v4\\.vcf(?:\\.tmp)?$")
+        setShards = set(os.path.basename(sFilePath) for sFilePath in self.listShards)
+        for sFileName in os.listdir(self._sFolder):
+            if regexShard.match(sFileName) and (sFileName not in setShards):
+                logger.info("removing shard '%s' of an earlier run", sFileName)
+                os.remove(os.path.join(self._sFolder, sFileName))
+
+    @staticmethod
+    def _writeShards(listShards):
+        # renamed by "close"
+        for (sFilePath, listParts) in listShards:
+            with open(sFilePath + ".tmp", "wb") as fhShard:
+                fhShard.write(b"".join(listParts))
+
+    def write(self, objVCard, bIncludeCustomProperties=True):
+        fhCard = io.BytesIO()
+        objVCard.writeTo(fhCard, bIncludeCustomProperties)
+        self._add(fhCard.getvalue(), objVCard.getProperty("UID"))
+
+    def writeAll(self, iterVCards, bIncludeCustomProperties=True):
+        """
+        writes all VCards of a list or an iterator (e.g. "VCard.iterFile"), returns their count
+        """
+        iCards = 0
+        for objVCard in iterVCards:
+            self.write(objVCard, bIncludeCustomProperties)
+            iCards += 1
+        return(iCards)
+
+    def writeBytes(self, bVCards):
+        """
+        writes VCards, which were already converted (e.g. the output of a VCardWriter), the VCards are
+        split at "BEGIN:VCARD", so a shard never ends within a VCard, a ValueError is raised (before
+        anything is written), if the last VCard is not complete
+        """
+        objSplitter = _CardSplitter()
+        listCards = objSplitter.split(bVCards)
+        if objSplitter.hasIncomplete():
+            raise(ValueError("the last VCard is not complete, 'END:VCARD' is missing"))
+        for i, (iOffset, bCard) in enumerate(listCards):
+            # with the line break(s) up to the next VCard
+            iEnd = listCards[i + 1][0] if (i + 1 < len(listCards)) else len(bVCards)
+            sUID = None
+            if self._bPerUID:
+                matchUID = VCardShardWriter._regexUID.search(bCard)
+                sUID = matchUID.group(1).decode("utf-8", "replace") if matchUID else None
+            self._add(bVCards[iOffset:iEnd], sUID)
+
+    def _add(self, bCard, sUID):
+        if self._bPerUID:
+            self._addShard(self._getFileName(sUID, bCard), [bCard])
+        else:
+            if self._listShard and (((self._iMaxCards is not None) and (len(self._listShard) >= self._iMaxCards)) or
+                                    ((self._iMaxBytes is not None) and (self._iShardBytes + len(bCard) > self._iMaxBytes))):
+                self._finishShard()
+            self._listShard.append(bCard)
+            self._iShardBytes += len(bCard)
+        self.iCardsWritten += 1
+        self.iBytesWritten += len(bCard)
+
+    def _getFileName(self, sUID, bCard):
+        sName = VCardShardWriter._regexUnsafe.sub("_", (sUID or "").strip())[:100].strip(".")
+        if not sName:
+            sName = "card-" + hashlib.blake2b(bCard, digest_size=8).hexdigest()
+        # the same UID twice (or two UIDs, which differ in case only, on Windows)
+        sUnique = sName
+        i = 1
+        while (sUnique.lower() in self._setNames):
+            i += 1
+            sUnique = "%s-%d" % (sName, i)
+        self._setNames.add(sUnique.lower())
+        return(sUnique + ".v4.vcf")
+
+    def _finishShard(self):
+        if self._listShard:
+            self._addShard("%s-%05d.v4.vcf" % (self._sPrefix, len(self.listShards) + 1), self._listShard)
+            self._listShard = []
+            self._iShardBytes = 0
+
+    def _addShard(self, sFileName, listParts):
+        sFilePath = os.path.join(self._sFolder, sFileName)
+        self.listShards.append(sFilePath)
+        self._listBatch.append((sFilePath, listParts))
+        self._iBatchBytes += sum(len(bPart) for bPart in listParts)
+        # small shards (e.g. one per UID) are passed to the threads in batches
+        if (len(self._listBatch) >= 256) or (self._iBatchBytes >= 1024 * 1024):
+            self._submitBatch()
+
+    def _submitBatch(self):
+        if self._listBatch:
+            self._listFutures.append(self._objExecutor.submit(VCardShardWriter._writeShards, self._listBatch))
+            self._listBatch = []
+            self._iBatchBytes = 0
+        # only a few batches are kept in memory, the oldest is waited for (and its errors are raised)
+        while (len(self._listFutures) > 2 * self._iThreads):
+            self._listFutures.pop(0).result()
+
+    def close(self):
+        """
+        writes the last shard, waits until all shards are written and renames them, if a
+        shard could not be written, the shards are removed as by "abort"
+        """
+        if self._objExecutor is None:
+            return
+        try:
+            self._finishShard()
+            self._submitBatch()
+            while self._listFutures:
+                self._listFutures.pop(0).result()
+        except BaseException:
+            self.abort()
+            raise
+        self._objExecutor.shutdown(wait=True)
+        self._objExecutor = None
+        for sFilePath in self.listShards:
+            os.replace(sFilePath + ".tmp", sFilePath)
+        if not self._bPerUID:
+            self._removeShards()
+
+    def abort(self):
+        """
+        stops writing and removes the shards written so far, the shards of an earlier run are kept
+        """
+        if self._objExecutor is None:
+            return
+        for objFuture in self._listFutures:
+            objFuture.cancel()
+        self._objExecutor.shutdown(wait=True)
+        self._objExecutor = None
+        self._listFutures = []
+        for sFilePath in self.listShards:
+            if os.path.exists(sFilePath + ".tmp"):
+                os.remove(sFilePath + ".tmp")
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, excType, excValue, excTraceback):
+        if excType is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class VCardIndex:
+    """
+    random access to the VCards of a (big) file by UID, FN or byte offset
+    the file is memory mapped and scanned once for the offsets of all VCards and their UID
+    and FN, the result is stored in an index file next to it (<file>.idx) and reused as long
+    as the VCard file is not changed, a VCard is only parsed when it is requested
+    (UTF-16 and UTF-32 files are not supported, because the index works on the bytes of the file)
+    """
+    # UID and FN lines within a VCard, e.g. "UID:1234" or "FN;CHARSET=UTF-8:Forrest Gump"
+    _regexKeys = re.compile(b"^(?:[A-Za-z0-9-]+\\.)?(UID|FN)(?:;[^:\r\n]*)?:([^\r\n]*)", re.MULTILINE | re.IGNORECASE)
+    _iIndexFormat = 1
+
+    def __init__(self, sVCardFilePath, sIndexFilePath=None, bSaveIndex=True):
+        VCard._checkFilePath(sVCardFilePath)
+        self._sFilePath = sVCardFilePath
+        self._sIndexFilePath = sIndexFilePath or (sVCardFilePath + ".idx")
+        self._fhFile = open(sVCardFilePath, "rb")
+        self._mmap = None
+        if (os.path.getsize(sVCardFilePath) > 0):  # an empty file can not be mapped
+            self._mmap = mmap.mmap(self._fhFile.fileno(), 0, access=mmap.ACCESS_READ)
+        # one (iOffset, iLength, sUID, sFN) per VCard, ordered by offset
+        self._listEntries = None
+        if (self._loadIndex() is False):
+            self._buildIndex()
+            if bSaveIndex:
+                self._saveIndex()
+        self._listOffsets = [tupleEntry[0] for tupleEntry in self._listEntries]
+        self._dictUIDs = {}
+        for i, tupleEntry in enumerate(self._listEntries):
+            if tupleEntry[2] is not None:
+                self._dictUIDs.setdefault(tupleEntry[2], i)
+
+    def _getFileStamp(self):
+        objStat = os.stat(self._sFilePath)
+        return({"format": VCardIndex._iIndexFormat, "size": objStat.st_size, "mtime": objStat.st_mtime_ns})
+
+    def _buildIndex(self):
+        self._listEntries = []
+        if self._mmap is None:
+            return
+        objMmap = self._mmap
+        iPos = 0
+        while True:
+            iBegin = objMmap.find(b"BEGIN:VCARD", iPos)
+            if (iBegin < 0):
+                break
+            iEnd = objMmap.find(b"END:VCARD", iBegin)
+            if (iEnd < 0):
+                break
+            iPos = iEnd + 9
+            dictKeys = {}
+            # the regex works on the mapped file, without copying the VCard
+            for matchKey in VCardIndex._regexKeys.finditer(objMmap, iBegin, iEnd):
+                sKey = matchKey.group(1).upper().decode("ascii")
+                if sKey not in dictKeys:
+                    dictKeys[sKey] = VCard._decodeBytes(matchKey.group(2)).strip()
+            self._listEntries.append((iBegin, iPos - iBegin, dictKeys.get("UID"), dictKeys.get("FN")))
+
+    def _loadIndex(self):
+        """
+        loads the index file, returns False if it does not exist or does not match the VCard file
+        """
+        if (os.path.isfile(self._sIndexFilePath) is False):
+            return(False)
+        with open(self._sIndexFilePath, "r", encoding="utf-8") as fhIndex:
+            try:
+                if (json.loads(fhIndex.readline()) != self._getFileStamp()):
+                    return(False)
+                self._listEntries = [tuple(json.loads(sLine)) for sLine in fhIndex]
+            except ValueError:
+                logger.warning("could not read index file '%s', it will be rebuild", self._sIndexFilePath)
+                return(False)
+        return(True)
+
+    def _saveIndex(self):
+        # write to a temporary file first, so an interrupted write never leaves a broken index
+        sTmpFilePath = self._sIndexFilePath + ".tmp"
+        with open(sTmpFilePath, "w", encoding="utf-8") as fhIndex:
+            fhIndex.write(json.dumps(self._getFileStamp()) + "\n")
+            for tupleEntry in self._listEntries:
+                fhIndex.write(json.dumps(tupleEntry, ensure_ascii=False) + "\n")
+        os.replace(sTmpFilePath, self._sIndexFilePath)
+
+    def __len__(self):
+        return(len(self._listEntries))
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, excType, excValue, excTraceback):
+        self.close()
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._fhFile.close()
+
+    @property
+    def entries(self):
+        """
+        list of (iOffset, iLength, sUID, sFN), one per VCard, ordered by offset
+        """
+        return(self._listEntries)
+
+    def _parseEntry(self, i, bLazy=False):
+        (iOffset, iLength, sUID, sFN) = self._listEntries[i]
+        sCard = VCard._decodeBytes(self._mmap[iOffset:iOffset + iLength])
+        return(VCard._fromCardString(sCard, self._sFilePath, bLazy))
+
+    def getByUID(self, sUID, bLazy=False):
+        """
+        returns the (first) VCard with the given UID, None if not found
+        """
+        i = self._dictUIDs.get(sUID)
+        if i is None:
+            return(None)
+        return(self._parseEntry(i, bLazy))
+
+    def getByOffset(self, iOffset, bLazy=False):
+        """
+        returns the VCard starting at the given byte offset, None if there is none
+        """
+        i = bisect.bisect_left(self._listOffsets, iOffset)
+        if (i == len(self._listOffsets)) or (self._listOffsets[i] != iOffset):
+            return(None)
+        return(self._parseEntry(i, bLazy))
+
+    def getByNumber(self, i, bLazy=False):
+        """
+        returns the i-th VCard of the file
+        """
+        return(self._parseEntry(i, bLazy))
+
+    def findByFN(self, sFN, bLazy=False):
+        """
+        returns a list of all VCards with the given FN (this is a scan of the index, not of the file)
+        """
+        return([self._parseEntry(i, bLazy) for i, tupleEntry in enumerate(self._listEntries)
+                if tupleEntry[3] == sFN])
+
+
+class VCardRejects:
+    """
+    collects the VCards, which could not be parsed in lenient mode (see "iterFile"), as
+    VCardError (file, byte offset and length of the VCard, error, message and the failing line)
+    the raw bytes of rejected VCards are appended to sQuarantineFilePath (if given), so they
+    can be fixed and parsed again, use bKeepCards to keep them in listCards
+    """
+
+    def __init__(self, sQuarantineFilePath=None, bKeepCards=False):
+        self._sQuarantineFilePath = sQuarantineFilePath
+        self._fhQuarantine = None
+        self.listErrors = []
+        self.listCards = [] if bKeepCards else None
+
+    def __len__(self):
+        return(len(self.listErrors))
+
+    def reject(self, sFilePath, iOffset, bCard, ex):
+        VCard.summary.warning("rejected", "rejected VCard at byte %d of '%s' // %s: %s",
+                              iOffset, sFilePath, type(ex).__name__, ex)
+        self.add(VCardError(sFilePath, iOffset, len(bCard), type(ex).__name__, str(ex), getattr(ex, "sLine", None)),
+                 bCard)
+
+    def add(self, objError, bCard):
+        """
+        adds a VCardError (e.g. one rejected by another process) and the bytes of its VCard
+        """
+        self.listErrors.append(objError)
+        if self.listCards is not None:
+            self.listCards.append(bCard)
+        if self._sQuarantineFilePath:
+            if self._fhQuarantine is None:
+                self._fhQuarantine = open(self._sQuarantineFilePath, "ab")
+            self._fhQuarantine.write(bCard)
+            self._fhQuarantine.write(b"\r\n")
+
+    def writeReport(self, sReportFilePath):
+        """
+        writes the errors as JSON lines, one object per rejected VCard
+        """
+        with open(sReportFilePath, "w", encoding="utf-8") as fhReport:
+            for objError in self.listErrors:
+                fhReport.write(json.dumps(OrderedDict(zip(objError._fields, objError)), ensure_ascii=False) + "\n")
+
+    def close(self):
+        if self._fhQuarantine is not None:
+            self._fhQuarantine.close()
+            self._fhQuarantine = None
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, excType, excValue, excTraceback):
+        self.close()
+
+
+class VCardParseCache:
+    """
+    persistent cache (a SQLite file) of parsed VCards and of converted VCards, keyed by a hash
+    of the bytes of a VCard, so a VCard which was seen before is neither parsed nor converted again
+    when the cache gets bigger than iMaxBytes, the least recently used entries are removed
+    the cache is cleared, if it was written by another version of the cache or with other
+    registered properties (see "registerProperty"), because these change the parsed VCards
+    the statistics are kept in iHits, iMisses and iEvictions
+    """
+    _iCacheFormat = 2  # 2: lazy VCards keep their pending lines
+
+    def __init__(self, sCachePath, iMaxBytes=256 * 1024 * 1024, iCommitEvery=1000):
+        self._sCachePath = sCachePath
+        self._iMaxBytes = iMaxBytes
+        self._iCommitEvery = iCommitEvery
+        self.iHits = 0
+        self.iMisses = 0
+        self.iEvictions = 0
+        # a few worker processes may use the same cache at once
+        self._objConnection = sqlite3.connect(sCachePath, timeout=60)
+        self._objConnection.execute("PRAGMA journal_mode=WAL")
+        self._objConnection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self._objConnection.execute(
+            "CREATE TABLE IF NOT EXISTS cards (key BLOB PRIMARY KEY, data BLOB, size INTEGER, used REAL)")
+        self._objConnection.execute("CREATE INDEX IF NOT EXISTS cards_used ON cards (used)")
+        sSignature = "%d:%s" % (VCardParseCache._iCacheFormat, ",".join(VCard._dictPropertyHandlers))
+        objRow = self._objConnection.execute("SELECT value FROM meta WHERE name = 'signature'").fetchone()
+        if (objRow is None) or (objRow[0] != sSignature):
+            self._objConnection.execute("DELETE FROM cards")
+            self._objConnection.execute("REPLACE INTO meta (name, value) VALUES ('signature', ?)", (sSignature,))
+        self._objConnection.commit()
+        self._iBytes = self._objConnection.execute("SELECT COALESCE(SUM(size), 0) FROM cards").fetchone()[0]
+        self._listUsed = []  # (fUsed, key) of the hits, the time of use is updated with the next commit
+        self._iChanges = 0
+        if (self._iBytes > self._iMaxBytes):
+            # e.g. opened with a smaller maximum size than before
+            self._evict()
+            self.commit()
+
+    @staticmethod
+    def _getKey(bCard, sOptions=""):
+        # parsed VCards have no options, so they never share a key with a converted VCard
+        objHash = hashlib.blake2b(sOptions.encode("utf-8") + b"\0", digest_size=16)
+        objHash.update(bCard)
+        return(objHash.digest())
+
+    def _get(self, bKey):
+        """
+        returns (True, data) for a hit, (False, None) for a miss
+        """
+        objRow = self._objConnection.execute("SELECT data FROM cards WHERE key = ?", (bKey,)).fetchone()
+        if objRow is None:
+            self.iMisses += 1
+            return((False, None))
+        self.iHits += 1
+        self._listUsed.append((time.time(), bKey))
+        self._changed()
+        return((True, objRow[0]))
+
+    def _put(self, bKey, bData):
+        iSize = len(bKey) + (0 if (bData is None) else len(bData))
+        # the entry may exist already, e.g. added by another worker after the miss
+        objRow = self._objConnection.execute("SELECT size FROM cards WHERE key = ?", (bKey,)).fetchone()
+        if objRow is not None:
+            self._iBytes -= objRow[0]
+        self._objConnection.execute("REPLACE INTO cards (key, data, size, used) VALUES (?, ?, ?, ?)",
+                                    (bKey, bData, iSize, time.time()))
+        self._iBytes += iSize
+        if (self._iBytes > self._iMaxBytes):
+            self._evict()
+        self._changed()
+
+    def _changed(self):
+        self._iChanges += 1
+        if (self._iChanges >= self._iCommitEvery):
+            self.commit()
+
+    def _evict(self):
+        """
+        removes the least recently used entries, until the cache is at 90% of its maximum size
+        """
+        self._iBytes = self._objConnection.execute("SELECT COALESCE(SUM(size), 0) FROM cards").fetchone()[0]
+        iExcess = self._iBytes - int(self._iMaxBytes * 0.9)
+        listKeys = []
+        for (bKey, iSize) in self._objConnection.execute("SELECT key, size FROM cards ORDER BY used"):
+            if (iExcess <= 0):
+                break
+            listKeys.append((bKey,))
+            iExcess -= iSize
+            self._iBytes -= iSize
+        self._objConnection.executemany("DELETE FROM cards WHERE key = ?", listKeys)
+        self.iEvictions += len(listKeys)
+
+    def getVCard(self, bCard, sVCardFilePath="", bLazy=False):
+        """
+        returns the parsed VCard for the bytes of a "BEGIN:VCARD ... END:VCARD" block, from the
+        cache or parsed and added to the cache, None if the version of the VCard is not supported
+        """
+        # a lazy VCard is cached with its pending lines, so it is not the same as a parsed one
+        bKey = VCardParseCache._getKey(bCard, ":lazy" if bLazy else "")
+        (bHit, bData) = self._get(bKey)
+        if bHit:
+            return(pickle.loads(bData))
+        objVCard = VCard._fromCardBytes(bCard, sVCardFilePath, bLazy)
+        self._put(bKey, pickle.dumps(objVCard, pickle.HIGHEST_PROTOCOL))
+        return(objVCard)
+
+    def getOutput(self, bCard, sOptions, refConvert):
+        """
+        returns the converted VCard (bytes, e.g. its v4.0 output) for the bytes of a VCard, from the
+        cache or by calling refConvert(), sOptions are the options of the conversion (part of the key)
+        """
+        bKey = VCardParseCache._getKey(bCard, sOptions)
+        (bHit, bData) = self._get(bKey)
+        if bHit:
+            return(bData)
+        bData = refConvert()
+        self._put(bKey, bData)
+        return(bData)
+
+    def getStatistics(self):
+        return(OrderedDict([("hits", self.iHits), ("misses", self.iMisses), ("evictions", self.iEvictions),
+                            ("bytes", self._iBytes)]))
+
+    def commit(self):
+        if (len(self._listUsed) > 0):
+            self._objConnection.executemany("UPDATE cards SET used = ? WHERE key = ?", self._listUsed)
+            self._listUsed = []
+        self._objConnection.commit()
+        self._iChanges = 0
+
+    def clear(self):
+        self._objConnection.execute("DELETE FROM cards")
+        self._objConnection.commit()
+        self._iBytes = 0
+        self._listUsed = []
+
+    def close(self):
+        if self._objConnection is not None:
+            self.commit()
+            self._objConnection.close()
+            self._objConnection = None
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, excType, excValue, excTraceback):
+        self.close()
+
+    def __str__(self):
+        return("%d hit(s), %d miss(es), %d eviction(s)" % (self.iHits, self.iMisses, self.iEvictions))
+
+
+class VCardMergePolicy:
+    """
+    how the duplicates found by VCardDeduplicator are merged
+      * sPrefer is "newest" (by REV, VCards without REV are the oldest), "first" or "last" (in the
+        order they were added), the preferred VCard gives all properties, properties it does not
+        have are taken from the other duplicates (in the same order)
+      * tupleUnion are the properties (EMAIL, TEL, ADR and registered properties with a list of
+        values), for which the values of all duplicates are kept, without duplicate values
+    """
+    __slots__ = ("sPrefer", "tupleUnion")
+    # REV as date and time, e.g. "2008-04-24T19:52:43Z", "20080424T195243Z", "20240101T120000+0200" or "20080424"
+    _regexRev = re.compile("^([0-9]{4})-?([0-9]{2})-?([0-9]{2})"
+                           "(?:T([0-9]{2}):?([0-9]{2})(?::?([0-9]{2}))?(?:[.,][0-9]+)?)?"
+                           "\\s*(Z|[+-][0-9]{2}(?::?[0-9]{2})?)?$", re.IGNORECASE)
+    # the key of VCards without REV
+    _datetimeOldest = datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)
+
+    def __init__(self, sPrefer="newest", tupleUnion=("EMAIL", "TEL", "ADR")):
+        if sPrefer not in ("newest", "first", "last"):
+            raise(ValueError("unknown preference '%s', use newest, first or last" % sPrefer))
+        self.sPrefer = sPrefer
+        self.tupleUnion = tuple(sPropertyName.upper() for sPropertyName in tupleUnion)
+
+    @staticmethod
+    def _getRevKey(objVCard):
+        """
+        returns REV as datetime with time zone (UTC, if REV has none), so REV of other formats and
+        time zones can be compared, e.g. "20240101T120000+0200" is older than "2024-01-01T11:00:00Z",
+        VCards without REV (or with one, which can not be read) are the oldest
+        """
+        sRev = objVCard.getProperty("REV")
+        matchRev = VCardMergePolicy._regexRev.match(sRev.strip()) if sRev else None
+        if matchRev is None:
+            return(VCardMergePolicy._datetimeOldest)
+        (sYear, sMonth, sDay, sHour, sMinute, sSecond, sZone) = matchRev.groups()
+        try:
+            objZone = datetime.timezone.utc
+            if sZone and (sZone.upper() != "Z"):
+                # e.g. "+02", "+0200" or "-05:00"
+                iMinutes = int(sZone[1:3]) * 60 + (int(sZone[-2:]) if (len(sZone) > 3) else 0)
+                objZone = datetime.timezone(datetime.timedelta(minutes=(-iMinutes if (sZone[0] == "-") else iMinutes)))
+            return(datetime.datetime(int(sYear), int(sMonth), int(sDay), int(sHour or 0), int(sMinute or 0),
+                                     int(sSecond or 0), tzinfo=objZone))
+        except ValueError:
+            return(VCardMergePolicy._datetimeOldest)
+
+    @staticmethod
+    def _getValueKey(sPropertyName, objValue):
+        """
+        returns what makes two values of a property the same, e.g. the normalized address of an EMAIL
+        """
+        if (sPropertyName == "EMAIL"):
+            return(VCardDeduplicator.normalizeEmail(objValue.address))
+        elif (sPropertyName == "TEL"):
+            return(VCardDeduplicator.normalizeTel(objValue.data) or objValue.data)
+        elif (sPropertyName == "ADR"):
+            return(tuple(sPart.strip().lower() for sPart in objValue.address))
+        return(objValue)
+
+    def merge(self, listVCards):
+        """
+        returns a new VCard, which is merged from the given VCards, these are not changed
+        """
+        listOrdered = list(listVCards)
+        if (self.sPrefer == "newest"):
+            # sort is stable, VCards with the same REV stay in the order they were added
+            listOrdered.sort(key=VCardMergePolicy._getRevKey, reverse=True)
+        elif (self.sPrefer == "last"):
+            listOrdered.reverse()
+        for objVCard in listOrdered:
+            objVCard._decodeAll()
+        objMerged = VCard()
+        objMerged._sourceVersion = listOrdered[0]._sourceVersion
+        for sPropertyName in VCard._tupleStandardProperties:
+            sSlot = VCard._dictPropertySlots[sPropertyName]
+            if (sPropertyName in ("EMAIL", "TEL", "ADR")):
+                listValues = self._mergeValues(sPropertyName, [getattr(objVCard, sSlot) for objVCard in listOrdered])
+                setattr(objMerged, sSlot, listValues)
+                continue
+            for objVCard in listOrdered:
+                objValue = getattr(objVCard, sSlot)
+                if objValue is not None:
+                    # N and PHOTO are objects, which should not be shared with the duplicates
+                    setattr(objMerged, sSlot, copy.copy(objValue))
+                    break
+        # registered properties
+        for sPropertyName in VCard._dictPropertyHandlers:
+            if (sPropertyName == "VERSION") or (sPropertyName in VCard._dictPropertySlots):
+                continue
+            listValues = [objVCard.getProperty(sPropertyName) for objVCard in listOrdered]
+            listValues = [objValue for objValue in listValues if objValue is not None]
+            if (len(listValues) == 0):
+                continue
+            if isinstance(listValues[0], list):
+                objMerged._getExtraProperties()[sPropertyName] = self._mergeValues(sPropertyName, listValues)
+            else:
+                objMerged._getExtraProperties()[sPropertyName] = copy.copy(listValues[0])
+        # custom properties (X-), the preferred VCard wins
+        for objVCard in listOrdered:
+            for sCustomProperty in (objVCard._customProperties or ()):
+                if not objMerged.hasCustomProperty(sCustomProperty):
+                    objMerged.addCustomProperty(sCustomProperty, objVCard.getCustomProperty(sCustomProperty))
+        return(objMerged)
+
+    def _mergeValues(self, sPropertyName, listLists):
+        """
+        merges the lists of values of a property (one list or None per VCard, preferred first)
+        """
+        listMerged = []
+        setKeys = set()
+        for listValues in listLists:
+            for objValue in (listValues or ()):
+                objKey = VCardMergePolicy._getValueKey(sPropertyName, objValue)
+                if objKey in setKeys:
+                    continue
+                setKeys.add(objKey)
+                listMerged.append(copy.copy(objValue))
+            if (sPropertyName not in self.tupleUnion) and (len(listMerged) > 0):
+                # only the values of the first VCard, which has some
+                break
+        return(listMerged or None)
+
+
+class VCardDeduplicator:
+    """
+    finds duplicate VCards in a single pass and merges them
+    every added VCard is reduced to a few normalized keys (UID, EMAIL addresses, the last digits
+    of its TEL numbers with its name, so a shared number like a switchboard is not enough, and,
+    if enabled, its name alone), which are looked up in a hash index, VCards which share a key
+    are put into the same group, also indirect (if A and C share a key with B, all three are in
+    one group), so VCards are never compared pairwise
+      objDeduplicator = VCardDeduplicator()
+      objDeduplicator.addAll(VCard.iterFile(sFilePath, bLazy=True))
+      listVCards = list(objDeduplicator.iterMerged())
+    """
+    _tupleKnownKeys = ("UID", "EMAIL", "TEL", "NAME")
+
+    def __init__(self, tupleKeys=("UID", "EMAIL", "TEL"), objPolicy=None, iTelDigits=9):
+        for sKey in tupleKeys:
+            if sKey not in VCardDeduplicator._tupleKnownKeys:
+                raise(ValueError("unknown key '%s', use one of %s" % (sKey, ", ".join(VCardDeduplicator._tupleKnownKeys))))
+        self._tupleKeys = tuple(tupleKeys)
+        self._objPolicy = objPolicy or VCardMergePolicy()
+        # "+49 30 1234567" and "030 1234567" are the same number, if the last 9 digits are compared
+        self._iTelDigits = iTelDigits
+        self._dictIndex = {}  # key (e.g. "EMAIL:jane_doe@abc.com") -> number of the first VCard with this key
+        self._listParents = []  # number of a VCard -> number of a VCard in the same group (union find)
+        self._listVCards = []
+
+    def __len__(self):
+        return(len(self._listVCards))
+
+    def add(self, objVCard):
+        """
+        adds a VCard, returns its number (in the order the VCards were added)
+        """
+        i = len(self._listVCards)
+        self._listVCards.append(objVCard)
+        self._listParents.append(i)
+        for sKey in self.getKeys(objVCard):
+            j = self._dictIndex.setdefault(sKey, i)
+            if (j != i):
+                self._union(i, j)
+        return(i)
+
+    def addAll(self, iterVCards):
+        for objVCard in iterVCards:
+            self.add(objVCard)
+
+    def _find(self, i):
+        listParents = self._listParents
+        while (listParents[i] != i):
+            # path halving keeps the trees flat
+            listParents[i] = listParents[listParents[i]]
+            i = listParents[i]
+        return(i)
+
+    def _union(self, i, j):
+        iRoot = self._find(i)
+        jRoot = self._find(j)
+        # the first VCard of a group is its root, so the groups keep the order of the VCards
+        if (iRoot < jRoot):
+            self._listParents[jRoot] = iRoot
+        elif (jRoot < iRoot):
+            self._listParents[iRoot] = jRoot
+
+    def getKeys(self, objVCard):
+        """
+        returns the set of normalized keys of a VCard, e.g. {"UID:1234", "TEL:301234567:jane doe"}
+        """
+        setKeys = set()
+        if ("UID" in self._tupleKeys):
+            sUID = objVCard.getProperty("UID")
+            if sUID and sUID.strip():
+                setKeys.add("UID:" + sUID.strip().lower())
+        if ("EMAIL" in self._tupleKeys):
+            for objMail in (objVCard.getProperty("EMAIL") or ()):
+                sAddress = VCardDeduplicator.normalizeEmail(objMail.address)
+                if sAddress:
+                    setKeys.add("EMAIL:" + sAddress)
+        sName = None
+        if ("TEL" in self._tupleKeys) or ("NAME" in self._tupleKeys):
+            sName = VCardDeduplicator.normalizeName(objVCard)
+        if ("TEL" in self._tupleKeys) and sName:
+            # a number alone is no duplicate, a lot of contacts share e.g. the number of their company
+            for objTel in (objVCard.getProperty("TEL") or ()):
+                sDigits = VCardDeduplicator.normalizeTel(objTel.data, self._iTelDigits)
+                if sDigits:
+                    setKeys.add("TEL:%s:%s" % (sDigits, sName))
+        if ("NAME" in self._tupleKeys) and sName:
+            setKeys.add("NAME:" + sName)
+        return(setKeys)
 
     @staticmethod
-    def fromString(sData):
-        # do some string replacements to use the standard v4 parsing methods
-        sData = VCard._doStringReplacementsToUseStandardV4Parsing(sData)
-        # split the data into lines
-        listData = sData.split("\n")
-        # create a new VCard instance
-        objVCard = VCard()
-        # parse the given data by line and assign the values to our new VCard instance
-        for sLine in listData:
-            # skip these two lines
-            sLineStrippedUpper = sLine.strip().upper()
-            if (sLineStrippedUpper == "BEGIN:VCARD") or (sLineStrippedUpper == "END:VCARD"):
-                continue
-            # check for known keys
-            (sKey, sValue) = VCard.getKeyAndValueFromString(sLine)
-            sKey = sKey.strip().upper()
-            if sKey == "VERSION":
-                # version of the VCard object will be v4, regardless what the original VCard string was
-                continue
-            # generic approach
-            try:
-                if (objVCard.hasProperty(sKey)):
-                    refMethod = eval("objVCard.set%s" % sKey)
-                    refMethod(sLine)
-                else:
-                    if (sKey.startswith("X")):
-                        sTmp = sLine.split(":", 1)
-                        objVCard.addCustomProperty(sTmp[0], sTmp[1])
-                    else:
-                        print(
-                            "WARNING found unknown property, which does not start with an 'X' // '%s', this data will be ignored" % sKey)
-                        print("VERBOSE data to be ignored '%s'" % sLine)
-                #
-            except Exception as ex:
-                print("ERROR could no add this line '%s' to VCard object" % sLine)
-                print(str(ex))
-                raise(ex)
-            #
-        return(objVCard)
+    def normalizeEmail(sAddress):
+        sAddress = sAddress.strip().lower()
+        if sAddress.startswith("mailto:"):
+            sAddress = sAddress[7:]
+        return(sAddress)
 
     @staticmethod
-    def fromFile(sVCardFilePath):
-        listOfVCards = []
-        #
-        # get file content
-        sContent = VCard._getFileContent(sVCardFilePath)
-        # find VCards in file
-        matches = re.findall("BEGIN:VCARD.*?END:VCARD", sContent, re.DOTALL)
-        for match in matches:
-            matchesVersion = re.findall("VERSION:([2-4]\.[0-1])", str(match))
-            if len(matchesVersion) != 1:
-                raise(Exception("found more than one version string working in file '%s' and on VCard data '%s'" % (
-                    sFilePath, sContent)))
-            if ((matchesVersion[0] == "2.1") or (matchesVersion[0] == "3.0") or (matchesVersion[0] == "4.0")):
-                # remove print("\n\nfound version %s VCard data" % matchesVersion[0])
-                objVCard = VCard.fromString(str(match))
-                listOfVCards.append(objVCard)
-            else:
-                print("unknown version, not implemented, found VCard version '%s' in file '%s'" % (
-                    matchesVersion[0], sFilePath))
-        return(listOfVCards)
+    def normalizeTel(sData, iDigits=9):
+        """
+        returns the last iDigits digits of a number, e.g. "tel:+1-418-656-9254;ext=102" -> "186569254",
+        None for numbers with less than 6 digits (e.g. extensions only)
+        """
+        # the digits of the number, without extension, cached by VCardTelephone.normalize
+        sDigits = VCardTelephone.normalize(sData)[1]
+        if (sDigits is None) or (len(sDigits) < 6):
+            return(None)
+        return(sDigits[-iDigits:])
 
-    def hasProperty(self, sPropertyName):
-        if sPropertyName in self._properties:
-            return True
-        else:
-            return False
+    @staticmethod
+    def normalizeName(objVCard):
+        """
+        returns the words of FN (or N, if there is no FN) in lowercase, sorted and without accents,
+        titles (like "Dr.") and honorifics of N, so "Dr. Jürgen Müller" and "Muller, Jurgen" are the same
+        """
+        objN = objVCard.getProperty("N")
+        sName = objVCard.getProperty("FN")
+        if not sName and (objN is not None):
+            sName = " ".join((objN.givenName, objN.additonalNames, objN.surname))
+        if not sName:
+            return(None)
+        setSkip = set()
+        if (objN is not None):
+            setSkip.update(("%s %s" % (objN.honorificPrefixes, objN.honorificSuffixes)).lower().split())
+        sName = unicodedata.normalize("NFKD", sName.lower())
+        sName = "".join(sChar for sChar in sName if not unicodedata.combining(sChar))
+        listWords = [sWord.strip(",;") for sWord in sName.split()
+                     if (sWord not in setSkip) and not sWord.endswith(".")]
+        return(" ".join(sorted(sWord for sWord in listWords if sWord)) or None)
 
-    def hasCustomProperty(self, sPropertyName):
-        if sPropertyName in self._customProperties:
-            return True
-        else:
-            return False
+    def iterGroups(self):
+        """
+        yields a list of VCards per group of duplicates (lists with a single VCard for the others),
+        in the order in which the first VCard of a group was added
+        """
+        dictGroups = OrderedDict()
+        for i in range(len(self._listVCards)):
+            dictGroups.setdefault(self._find(i), []).append(self._listVCards[i])
+        for listGroup in dictGroups.values():
+            yield(listGroup)
 
-    def addCustomProperty(self, sPropertyName, sPropertyValue):
-        self._customProperties[sPropertyName] = sPropertyValue
+    def iterMerged(self):
+        """
+        yields one VCard per group, duplicates are merged by the merge policy
+        """
+        for listGroup in self.iterGroups():
+            if (len(listGroup) == 1):
+                yield(listGroup[0])
+            else:
+                yield(self._objPolicy.merge(listGroup))
 
-    def getCustomProperty(self, sPropertyName):
-        return self._customProperties[sPropertyName]
 
-    @property
-    def version(self):
-        return self._properties["VERSION"]
+class VCardCollection:
+    """
+    a container of VCards with hash indexes, to look up VCards by UID, EMAIL address, TEL number
+    (the last iTelDigits digits, see VCardDeduplicator.normalizeTel) or ORG without a loop over
+    all VCards, and a prefix index (a trie) of the words of FN and the surname of N
+      objCollection = VCardCollection(VCard.iterFile(sFilePath, bLazy=True))
+      objVCard = objCollection.findByUID("1234")
+      listVCards = objCollection.findByEmail("Jane_Doe@abc.com")
+      listVCards = objCollection.findByPrefix("mül")
+    the indexes are updated by "add" and "remove", call "update" after a VCard in the collection
+    was changed
+    """
+    _tupleIndexes = ("UID", "EMAIL", "TEL", "ORG")
 
-    @property
-    def surname(self):
-        return self._properties["N"]["surname"]
+    def __init__(self, iterVCards=(), iTelDigits=9):
+        self._iTelDigits = iTelDigits
+        self._iNextCard = 0
+        self._dictVCards = OrderedDict()  # number of the VCard -> VCard
+        self._dictNumbers = {}  # id of a VCard -> its number
+        self._dictKeys = {}  # number of the VCard -> tuple of (index, key) and words in the trie
+        # index -> normalized key -> numbers of the VCards (a dict as ordered set)
+        self._dictIndexes = dict((sIndex, {}) for sIndex in VCardCollection._tupleIndexes)
+        # every node is a dict character -> node, the numbers of the VCards with a word, which ends
+        # at a node, are in the dict at key None
+        self._dictTrie = {}
+        for objVCard in iterVCards:
+            self.add(objVCard)
 
-    @surname.setter
-    def surname(self, value):
-        self._properties["N"]["surname"] = value
+    def __len__(self):
+        return(len(self._dictVCards))
 
-    @property
-    def givenName(self):
-        return self._properties["N"]["givenName"]
+    def __iter__(self):
+        return(iter(self._dictVCards.values()))
 
-    @givenName.setter
-    def givenName(self, value):
-        self._properties["N"]["givenName"] = value
+    def __contains__(self, objVCard):
+        return(id(objVCard) in self._dictNumbers)
 
-    @property
-    def additonalNames(self):
-        return self._properties["N"]["additonalNames"]
+    @staticmethod
+    def normalizeOrg(sOrg):
+        """
+        returns ORG in lowercase, with single spaces, e.g. " ACME  Ltd." -> "acme ltd."
+        """
+        if not sOrg:
+            return(None)
+        return(" ".join(sOrg.casefold().split()) or None)
 
-    @additonalNames.setter
-    def additonalNames(self, value):
-        self._properties["N"]["additonalNames"] = value
+    @staticmethod
+    def normalizeWord(sWord):
+        """
+        returns a word in lowercase and without accents, as used in the prefix index ("Müller" -> "muller")
+        """
+        sWord = unicodedata.normalize("NFKD", sWord.casefold())
+        return("".join(sChar for sChar in sWord if not unicodedata.combining(sChar)).strip(",;"))
 
-    @property
-    def honorificPrefixes(self):
-        return self._properties["N"]["honorificPrefixes"]
+    def _getKeys(self, objVCard):
+        listKeys = []
+        sUID = objVCard.getProperty("UID")
+        if sUID and sUID.strip():
+            listKeys.append(("UID", sUID.strip().lower()))
+        for objMail in (objVCard.getProperty("EMAIL") or ()):
+            sAddress = VCardDeduplicator.normalizeEmail(objMail.address)
+            if sAddress:
+                listKeys.append(("EMAIL", sAddress))
+        for objTel in (objVCard.getProperty("TEL") or ()):
+            sDigits = VCardDeduplicator.normalizeTel(objTel.data, self._iTelDigits)
+            if sDigits:
+                listKeys.append(("TEL", sDigits))
+        sOrg = VCardCollection.normalizeOrg(objVCard.getProperty("ORG"))
+        if sOrg:
+            listKeys.append(("ORG", sOrg))
+        return(listKeys)
 
-    @honorificPrefixes.setter
-    def honorificPrefixes(self, value):
-        self._properties["N"]["honorificPrefixes"] = value
+    def _getWords(self, objVCard):
+        setWords = set()
+        sName = objVCard.getProperty("FN") or ""
+        objN = objVCard.getProperty("N")
+        if (objN is not None) and objN.surname:
+            sName = "%s %s" % (sName, objN.surname)
+        for sWord in sName.split():
+            sWord = VCardCollection.normalizeWord(sWord)
+            if sWord:
+                setWords.add(sWord)
+        return(setWords)
 
-    @property
-    def honorificSuffixes(self):
-        return self._properties["N"]["honorificSuffixes"]
+    def _index(self, iCard, objVCard):
+        listKeys = self._getKeys(objVCard)
+        for (sIndex, sKey) in listKeys:
+            self._dictIndexes[sIndex].setdefault(sKey, {})[iCard] = None
+        setWords = self._getWords(objVCard)
+        for sWord in setWords:
+            dictNode = self._dictTrie
+            for sChar in sWord:
+                dictChild = dictNode.get(sChar)
+                if dictChild is None:
+                    dictChild = dictNode[sChar] = {}
+                dictNode = dictChild
+            dictNode.setdefault(None, {})[iCard] = None
+        self._dictKeys[iCard] = (listKeys, setWords)
 
-    @honorificSuffixes.setter
-    def honorificSuffixes(self, value):
-        self._properties["N"]["honorificSuffixes"] = value
+    def _unindex(self, iCard):
+        (listKeys, setWords) = self._dictKeys.pop(iCard)
+        for (sIndex, sKey) in listKeys:
+            dictIndex = self._dictIndexes[sIndex]
+            dictCards = dictIndex.get(sKey)
+            if dictCards is not None:
+                dictCards.pop(iCard, None)
+                if not dictCards:
+                    del dictIndex[sKey]
+        for sWord in setWords:
+            # the path to the end of the word, to remove the nodes, which are no longer needed
+            listPath = [self._dictTrie]
+            for sChar in sWord:
+                listPath.append(listPath[-1][sChar])
+            dictCards = listPath[-1][None]
+            dictCards.pop(iCard, None)
+            if not dictCards:
+                del listPath[-1][None]
+                for i in range(len(sWord), 0, -1):
+                    if listPath[i]:
+                        break
+                    del listPath[i - 1][sWord[i - 1]]
 
-    @property
-    def VERSION(self):
-        return("VERSION:%s" % (self.version))
+    def add(self, objVCard):
+        """
+        adds a VCard and its keys to the indexes, returns its number (VCards added twice keep their number)
+        """
+        if id(objVCard) in self._dictNumbers:
+            return(self._dictNumbers[id(objVCard)])
+        iCard = self._iNextCard
+        self._iNextCard += 1
+        self._dictVCards[iCard] = objVCard
+        self._dictNumbers[id(objVCard)] = iCard
+        self._index(iCard, objVCard)
+        return(iCard)
 
-    @property
-    def N(self):
-        if self._properties["N"] is None:
-            return("")
-        else:
-            return("N:%s;%s;%s;%s;%s" % (self.surname, self.givenName, self.additonalNames, self.honorificPrefixes, self.honorificSuffixes))
+    def addAll(self, iterVCards):
+        for objVCard in iterVCards:
+            self.add(objVCard)
 
-    def setN(self, value):
+    def remove(self, objVCard):
         """
-        sample:
-        N:Gump;Forrest;;Mr.
-        N;LANGUAGE=de:Gump;Forrest
+        removes a VCard and its keys from the indexes, raises KeyError if it is not in the collection
         """
-        tmpSplit = value.split(":")
-        if (len(tmpSplit) == 2) and (tmpSplit[0].startswith("N")):
-            self._properties["N"] = OrderedDict([("surname", ""), ("givenName", ""), (
-                "additonalNames", ""), ("honorificPrefixes", ""), ("honorificSuffixes", "")])
-            tmpSplit2 = tmpSplit[1].split(";")
-            listKeysOfN = list(self._properties["N"].keys())
-            for i in range(0, len(tmpSplit2)):
-                self._properties["N"][listKeysOfN[i]] = tmpSplit2[i]
-        else:
-            raise(ValueError(
-                "could not parse string for 'N', tried to parse this '%s'" % (value)))
+        iCard = self._dictNumbers.pop(id(objVCard))
+        del self._dictVCards[iCard]
+        self._unindex(iCard)
 
-    @property
-    def formattedNameString(self):
-        return self._properties["FN"]
+    def update(self, objVCard):
+        """
+        updates the keys of a changed VCard (or adds it), returns its number
+        """
+        iCard = self._dictNumbers.get(id(objVCard))
+        if iCard is None:
+            return(self.add(objVCard))
+        self._unindex(iCard)
+        self._index(iCard, objVCard)
+        return(iCard)
 
-    @property
-    def FN(self):
-        return("FN:%s" % (self.formattedNameString))
+    def _find(self, sIndex, sKey):
+        if not sKey:
+            return([])
+        return([self._dictVCards[iCard] for iCard in self._dictIndexes[sIndex].get(sKey, ())])
 
-    def setFN(self, value):
-        tmpSplit = value.split(":")
-        if (len(tmpSplit) == 2) and (tmpSplit[0].startswith("FN")):
-            self._properties["FN"] = tmpSplit[1]
-        else:
-            raise(ValueError(
-                "could not parse string for 'FN', tried to parse this '%s'" % (value)))
+    def findByUID(self, sUID):
+        """
+        returns the VCard with this UID (the first one, if there are more), None if there is none
+        """
+        listVCards = self._find("UID", (sUID or "").strip().lower())
+        return(listVCards[0] if listVCards else None)
 
-    @property
-    def organisation(self):
-        return self._properties["ORG"]
+    def findByEmail(self, sAddress):
+        """
+        returns the list of VCards with this EMAIL address (case insensitive, "mailto:" is ignored)
+        """
+        return(self._find("EMAIL", VCardDeduplicator.normalizeEmail(sAddress)))
 
-    @property
-    def ORG(self):
-        return("ORG:%s" % (self.organisation))
+    def findByTel(self, sNumber):
+        """
+        returns the list of VCards with this TEL number, numbers are compared by their last digits, so
+        "+49 30 1234567", "030/1234567" and "tel:+49-30-1234567" are the same
+        """
+        return(self._find("TEL", VCardDeduplicator.normalizeTel(sNumber, self._iTelDigits)))
 
-    def setORG(self, value):
-        tmpSplit = value.split(":")
-        if (len(tmpSplit) == 2) and (tmpSplit[0].startswith("ORG")):
-            self._properties["ORG"] = tmpSplit[1]
-        else:
-            raise(ValueError(
-                "could not parse string for 'ORG', tried to parse this '%s'" % (value)))
+    def findByOrg(self, sOrg):
+        """
+        returns the list of VCards with this ORG (case insensitive)
+        """
+        return(self._find("ORG", VCardCollection.normalizeOrg(sOrg)))
 
-    @property
-    def title(self):
-        return self._properties["TITLE"]
+    def findByPrefix(self, sPrefix, iLimit=None):
+        """
+        returns the list of VCards with a word of FN or the surname, which starts with sPrefix
+        (case and accent insensitive), at most iLimit VCards, in the order they were added
+        """
+        sPrefix = VCardCollection.normalizeWord(sPrefix.strip())
+        if not sPrefix:
+            return([])
+        dictNode = self._dictTrie
+        for sChar in sPrefix:
+            dictNode = dictNode.get(sChar)
+            if dictNode is None:
+                return([])
+        # all words below the node
+        dictCards = {}
+        listNodes = [dictNode]
+        while listNodes:
+            dictNode = listNodes.pop()
+            for (sChar, objChild) in dictNode.items():
+                if sChar is None:
+                    dictCards.update(objChild)
+                else:
+                    listNodes.append(objChild)
+        listCards = sorted(dictCards)
+        if iLimit is not None:
+            listCards = listCards[:iLimit]
+        return([self._dictVCards[iCard] for iCard in listCards])
 
-    @property
-    def TITLE(self):
-        return("TITLE:%s" % (self.title))
+    def getKeys(self, sIndex):
+        """
+        returns the normalized keys of an index ("UID", "EMAIL", "TEL" or "ORG") and the number of VCards per key
+        """
+        return(dict((sKey, len(dictCards)) for (sKey, dictCards) in self._dictIndexes[sIndex].items()))
 
-    def setTITLE(self, value):
-        tmpSplit = value.split(":")
-        if (len(tmpSplit) == 2) and (tmpSplit[0].startswith("TITLE")):
-            self._properties["TITLE"] = tmpSplit[1]
-        else:
-            raise(ValueError(
-                "could not parse string for 'TITLE', tried to parse this '%s'" % (value)))
 
-    @property
-    def EMAIL(self):
-        sStr = ""
-        for dictMail in self._properties["EMAIL"]:
-            # if we have multiple email addresses use a line break as seperator
-            if (sStr != ""):
-                sStr += "\n"
-            sStr += "EMAIL"
-            if dictMail["type"] is not None:
-                sStr += ";TYPE=%s" % dictMail["type"]
-            if dictMail["pref"] is not None:
-                sStr += ",pref"
-            # add mail address
-            sStr += (":" + dictMail["address"])
-        return(sStr)
+class VCardDiff:
+    """
+    compares two exports (e.g. of yesterday and today) and yields the added, removed and modified
+    VCards as VCardChange, VCards are matched by UID or, if they have none, by a fingerprint of
+    their name, EMAIL addresses and TEL numbers, and compared by their canonical hashes (see
+    "VCard.getCanonicalHashes"), REV is ignored by default
+      with VCardDiff("yesterday.vcf", "today.vcf") as objDiff:
+          for objChange in objDiff.iterChanges():
+              print(objChange.change, objChange.key, objChange.properties)
+    both files are read VCard by VCard and only the keys and hashes are kept, in a SQLite file
+    (a temporary file, if sDatabasePath is not given), so big files do not need a lot of memory
+    """
 
-    def setEMAIL(self, value):
+    def __init__(self, sOldFilePath, sNewFilePath, sDatabasePath=None, tupleIgnore=("REV",)):
+        self._listFilePaths = [sOldFilePath, sNewFilePath]
+        self._tupleIgnore = tuple(sPropertyName.upper() for sPropertyName in tupleIgnore)
+        self._sTemporaryPath = None
+        if not sDatabasePath:
+            (iHandle, sDatabasePath) = tempfile.mkstemp(prefix="vcard-diff-", suffix=".sqlite")
+            os.close(iHandle)
+            self._sTemporaryPath = sDatabasePath
+        self._objConnection = sqlite3.connect(sDatabasePath)
+        # the database is rebuilt by every run, so it does not need to survive a crash
+        self._objConnection.execute("PRAGMA journal_mode=OFF")
+        self._objConnection.execute("PRAGMA synchronous=OFF")
+        self._objConnection.execute("DROP TABLE IF EXISTS cards")
+        self._objConnection.execute("CREATE TABLE cards (side INTEGER, key TEXT, offset INTEGER, hash TEXT, "
+                                    "properties TEXT, PRIMARY KEY (side, key))")
+        self._bLoaded = False
+        self.dictCounts = Counter()  # change -> number of VCards
+
+    @staticmethod
+    def getKey(objVCard, dictHashes=None):
         """
-        sample from RFC 2426
-        EMAIL;TYPE=internet:jqpublic@xyz.dom1.com
-        EMAIL;TYPE=internet:jdoe@isp.net
-        EMAIL;TYPE=internet,pref:jane_doe@abc.com
+        returns "UID:<uid>" or, without UID, "FP:<hash of name, EMAIL addresses and TEL numbers>"
+        (without any of them, the hash of the content, so a change looks like removed and added)
         """
-        # split into mail string
-        dictMail = OrderedDict(
-            [("type", None), ("pref", None), ("address", "")])
-        # should result in ["EMAIL;TYPE=internet,pref", "jane_doe@abc.com"]
-        tmpSplit = value.split(":")
-        if (len(tmpSplit) == 2) and (tmpSplit[0].startswith("EMAIL")):
-            # should result in ["EMAIL", "TYPE=internet,pref"]
-            tmpSplit2 = tmpSplit[0].split(";")
-            if ((len(tmpSplit2) == 2) and (tmpSplit2[1].startswith("TYPE"))):
-                # should result in ["TYPE=internet", "pref"]
-                tmpSplit3 = tmpSplit2[1].split(",")
-                # check if pref is specified
-                if (len(tmpSplit3) == 2):
-                    dictMail["pref"] = True
-                # get type value
-                # should result in ["TYPE", "internet"]
-                tmpSplit4 = tmpSplit3[0].split("=")
-                dictMail["type"] = tmpSplit4[1]
-            # set email address
-            dictMail["address"] = tmpSplit[1]
-        else:
-            raise(ValueError(
-                "could not parse string for 'EMAIL', tried to parse this '%s'" % (value)))
-        #
-        self._properties["EMAIL"].append(dictMail)
+        sUID = objVCard.getProperty("UID")
+        if sUID and sUID.strip():
+            return("UID:" + sUID.strip().lower())
+        listParts = [VCardDeduplicator.normalizeName(objVCard) or ""]
+        listParts.extend(sorted(VCardDeduplicator.normalizeEmail(objMail.address)
+                                for objMail in (objVCard.getProperty("EMAIL") or ())))
+        listParts.extend(sorted(VCardDeduplicator.normalizeTel(objTel.data) or ""
+                                for objTel in (objVCard.getProperty("TEL") or ())))
+        if not any(listParts):
+            listParts = sorted((dictHashes or objVCard.getCanonicalHashes()).values())
+        return("FP:" + hashlib.blake2b("\n".join(listParts).encode("utf-8"), digest_size=12).hexdigest())
 
-    @property
-    def TEL(self):
-        sStr = ""
-        for dictTel in self._properties["TEL"]:
-            # if we have multiple tel use a line break as seperator
-            if (sStr != ""):
-                sStr += "\n"
-            sStr += "TEL"
-            if dictTel["TYPE"] is not None:
-                sStr += ";TYPE=%s" % ",".join(dictTel["TYPE"])
-            if dictTel["PREF"] is not None:
-                sStr += ";PREF=%d" % dictTel["PREF"]
-            if dictTel["VALUE"] is not None:
-                sStr += ";VALUE=%s" % dictTel["VALUE"]
-            # add tel data
-            sStr += (":" + dictTel["data"])
-        return(sStr)
+    def _load(self, iSide):
+        sFilePath = self._listFilePaths[iSide]
+        VCard._checkFilePath(sFilePath)
+        objCursor = self._objConnection.cursor()
+        with VCard._openFile(sFilePath) as fhFile:
+            for (iOffset, bCard) in VCard._iterCardBytes(fhFile):
+                objVCard = VCard._fromCardBytes(bCard, sFilePath)
+                if objVCard is None:
+                    continue
+                dictHashes = objVCard.getCanonicalHashes(self._tupleIgnore)
+                sKey = VCardDiff.getKey(objVCard, dictHashes)
+                sHash = hashlib.blake2b("\n".join("%s:%s" % tupleItem for tupleItem in dictHashes.items()).encode("ascii"),
+                                        digest_size=12).hexdigest()
+                tupleRow = [iSide, sKey, iOffset, sHash, json.dumps(dictHashes)]
+                i = 1
+                while True:
+                    try:
+                        objCursor.execute("INSERT INTO cards VALUES (?, ?, ?, ?, ?)", tupleRow)
+                        break
+                    except sqlite3.IntegrityError:
+                        # the same key twice in a file, e.g. a duplicate UID, the n-th is matched with the n-th
+                        i += 1
+                        tupleRow[1] = "%s#%d" % (sKey, i)
+        self._objConnection.commit()
 
-    def setTEL(self, value):
+    def iterChanges(self):
         """
-        sample from RFC 6350
-        TEL;VALUE=uri;TYPE=work,voice;PREF=1:tel:+1-418-656-9254;ext=102  #
+        yields a VCardChange per added or modified VCard (in the order of the new file) and then
+        per removed VCard (in the order of the old file)
         """
-        sExpectedKeyValue = "TEL"
-        # parse key part
-        dictTel = OrderedDict(
-            [("TYPE", None), ("PREF", None), ("VALUE", None), ("data", None)])
-        # should result in ("TEL;VALUE=uri;TYPE=work,voice;PREF=1", "tel:+1-418-656-9254;ext=102")
-        (sKey, sValue) = value.split(":", 1)
-        dictKeyQualifier = VCard.getKeyAndValueQualifiersAsDict(sKey)
-        for key in dictKeyQualifier.keys():
-            if (key == "KEY"):
-                if (dictKeyQualifier["KEY"] != sExpectedKeyValue):
-                    raise(ValueError("this should not happen. KEY is '%s', but should be '%s' (tried to parse this '%s'" % (
-                        dictKeyQualifier["KEY"], sExpectedKeyValue, value)))
+        if not self._bLoaded:
+            self._load(0)
+            self._load(1)
+            self._bLoaded = True
+        self.dictCounts.clear()
+        objCursor = self._objConnection.execute(
+            "SELECT n.key, o.offset, n.offset, o.hash, n.hash, o.properties, n.properties FROM cards n "
+            "LEFT JOIN cards o ON (o.side = 0) AND (o.key = n.key) WHERE (n.side = 1) ORDER BY n.rowid")
+        for (sKey, iOldOffset, iNewOffset, sOldHash, sNewHash, sOldProperties, sNewProperties) in objCursor:
+            if (sOldHash == sNewHash):
+                self.dictCounts["unchanged"] += 1
+                continue
+            dictNew = json.loads(sNewProperties)
+            if sOldHash is None:
+                objChange = VCardChange("added", sKey, None, iNewOffset, tuple(dictNew))
             else:
-                dictTel[key] = dictKeyQualifier[key]
-        #
-        # parse value part
-        dictTel["data"] = sValue
-        #
-        self._properties["TEL"].append(dictTel)
+                dictOld = json.loads(sOldProperties)
+                tupleProperties = tuple(sPropertyName for sPropertyName in list(dictNew) + [
+                    sPropertyName for sPropertyName in dictOld if sPropertyName not in dictNew]
+                    if dictOld.get(sPropertyName) != dictNew.get(sPropertyName))
+                objChange = VCardChange("modified", sKey, iOldOffset, iNewOffset, tupleProperties)
+            self.dictCounts[objChange.change] += 1
+            yield(objChange)
+        objCursor = self._objConnection.execute(
+            "SELECT o.key, o.offset, o.properties FROM cards o LEFT JOIN cards n ON (n.side = 1) AND (n.key = o.key) "
+            "WHERE (o.side = 0) AND (n.key IS NULL) ORDER BY o.rowid")
+        for (sKey, iOldOffset, sOldProperties) in objCursor:
+            self.dictCounts["removed"] += 1
+            yield(VCardChange("removed", sKey, iOldOffset, None, tuple(json.loads(sOldProperties))))
 
-    @property
-    def ADR(self):
-        sStr = ""
-        for dictAdrEntry in self._properties["ADR"]:
-            # if we have multiple email addresses use a line break as seperator
-            if (sStr != ""):
-                sStr += "\n"
-            sStr += "ADR"
-            if dictAdrEntry["TYPE"] is not None:
-                sStr += ";TYPE=%s" % dictAdrEntry["TYPE"]
-            if dictAdrEntry["PREF"] is not None:
-                sStr += ",pref"
-            # add address
-            sStr += (":" + ";".join(dictAdrEntry["address"].values()))
-        return(sStr)
+    def close(self):
+        if self._objConnection is not None:
+            self._objConnection.close()
+            self._objConnection = None
+        if self._sTemporaryPath is not None:
+            os.remove(self._sTemporaryPath)
+            self._sTemporaryPath = None
 
-    def setADR(self, value):
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, excType, excValue, excTraceback):
+        self.close()
+
+
+class VCardColumns:
+    """
+    the VCards as tables for analytics, one list per column instead of one object per VCard
+      * contacts: card, UID, FN, surname, givenName, ORG, TITLE
+      * emails, phones and addresses: one row per EMAIL, TEL and ADR, "card" is the row of the
+        VCard in contacts
+    use "exportCSV" to write big files in batches, "toNumPy" for arrays (if NumPy is installed)
+    """
+    _dictTables = OrderedDict([
+        ("contacts", ("card", "UID", "FN", "surname", "givenName", "ORG", "TITLE")),
+        ("emails", ("card", "address", "type", "pref")),
+        ("phones", ("card", "number", "type", "pref")),
+        ("addresses", ("card", "type", "pref") + VCardAddress._tupleParts),
+    ])
+
+    def __init__(self, iFirstCard=0):
+        self._iNextCard = iFirstCard
+        self._dictColumns = OrderedDict((sTable, OrderedDict((sColumn, []) for sColumn in tupleColumns))
+                                        for (sTable, tupleColumns) in VCardColumns._dictTables.items())
+
+    def __len__(self):
+        return(len(self._dictColumns["contacts"]["card"]))
+
+    def add(self, objVCard):
         """
-        sample from RFC 6350
-        ADR;TYPE=work,PREF:;Suite D2-630;2875 Laurier;Quebec;QC;G1V 2M2;Canada
+        adds a row to contacts and the rows of its EMAIL, TEL and ADR to the other tables
         """
-        # split into mail string
-        dictAdrEntry = OrderedDict(
-            [("TYPE", None), ("PREF", None), ("address", None)])
-        dictAdrEntry["address"] = OrderedDict([("postOfficeBox", ""), ("extendedAddress", ""), (
-            "streetAddress", ""), ("locality", ""), ("region", ""), ("postalCode", ""), ("countryName", "")])
-        # should result in ["ADR;TYPE=work,PREF", ";Suite D2-630;2875 Laurier;Quebec;QC;G1V 2M2;Canada"]
-        tmpSplit = value.split(":")
-        if (len(tmpSplit) == 2) and (tmpSplit[0].startswith("ADR")):
-            # should result in ["ADR", "TYPE=work,PREF"]
-            tmpSplit2 = tmpSplit[0].split(";")
-            if ((len(tmpSplit2) == 2) and (tmpSplit2[1].startswith("TYPE"))):
-                # should result in ["TYPE=internet", "PREF"]
-                tmpSplit3 = tmpSplit2[1].split(",")
-                # check if pref is specified
-                if (len(tmpSplit3) == 2):
-                    dictAdrEntry["PREF"] = True
-                # get type value
-                # should result in ["TYPE", "internet"]
-                tmpSplit4 = tmpSplit3[0].split("=")
-                dictAdrEntry["TYPE"] = tmpSplit4[1].lower()
-            # split address
-            tmpAddress = tmpSplit[1].split(";")
-            # should result in ["","Suite D2-630", "2875 Laurier" ,"Quebec", "QC", "G1V 2M2", "Canada"]
-            tmpAddress = tmpSplit[1].split(";")
-            listKeysOfAddress = list(dictAdrEntry["address"].keys())
-            for i in range(0, len(tmpAddress)):
-                dictAdrEntry["address"][listKeysOfAddress[i]] = tmpAddress[i]
-        else:
-            raise(ValueError(
-                "could not parse string for 'ADR', tried to parse this '%s'" % (value)))
-        #
-        self._properties["ADR"].append(dictAdrEntry)
+        iCard = self._iNextCard
+        self._iNextCard += 1
+        dictContacts = self._dictColumns["contacts"]
+        dictContacts["card"].append(iCard)
+        dictContacts["UID"].append(objVCard._uid)
+        dictContacts["FN"].append(objVCard._fn)
+        objN = objVCard._n
+        dictContacts["surname"].append(None if (objN is None) else objN.surname)
+        dictContacts["givenName"].append(None if (objN is None) else objN.givenName)
+        dictContacts["ORG"].append(objVCard._org)
+        dictContacts["TITLE"].append(objVCard._title)
+        if objVCard._email:
+            dictEmails = self._dictColumns["emails"]
+            for objMail in objVCard._email:
+                dictEmails["card"].append(iCard)
+                dictEmails["address"].append(objMail.address)
+                dictEmails["type"].append(objMail.type)
+                dictEmails["pref"].append(objMail.pref is not None)
+        if objVCard._tel:
+            dictPhones = self._dictColumns["phones"]
+            for objTel in objVCard._tel:
+                dictPhones["card"].append(iCard)
+                dictPhones["number"].append(objTel.data)
+                dictPhones["type"].append(",".join(objTel.TYPE) if objTel.TYPE else None)
+                dictPhones["pref"].append(objTel.PREF)
+        if objVCard._adr:
+            dictAddresses = self._dictColumns["addresses"]
+            for objAdr in objVCard._adr:
+                dictAddresses["card"].append(iCard)
+                dictAddresses["type"].append(objAdr.TYPE)
+                dictAddresses["pref"].append(objAdr.PREF is not None)
+                for sPart in VCardAddress._tupleParts:
+                    dictAddresses[sPart].append(getattr(objAdr, sPart))
 
-    @property
-    def PHOTO(self):
-        sStr = ""
-        if self._properties["PHOTO"]["data"] is not None:
-            sStr += "PHOTO"
-            if self._properties["PHOTO"]["MEDIATYPE"] is not None:
-                sStr += ";MEDIATYPE=%s" % (self._properties["PHOTO"]["MEDIATYPE"])
-            # add data
-            sStr += (":" + self._properties["PHOTO"]["data"])
-        return(sStr)
+    def addAll(self, iterVCards):
+        for objVCard in iterVCards:
+            self.add(objVCard)
 
-    def setPHOTO(self, value):
+    def clear(self):
         """
-        example PHOTO;MEDIATYPE=image/gif:http://www.example.com/dir_photos/my_photo.gif
+        empties all columns, the numbers of the following VCards continue
         """
-        tmpSplit = value.split(
-            ":", 1)  # should result in ["PHOTO;MEDIATYPE=image/gif", "http://www.example.com/dir_photos/my_photo.gif"]
-        if (len(tmpSplit) == 2) and (tmpSplit[0].startswith("PHOTO")):
-            # should result in ["PHOTO", "MEDIATYPE=image/gif"]
-            tmpSplit2 = tmpSplit[0].split(";")
-            if ((len(tmpSplit2) == 2) and (tmpSplit2[1].startswith("MEDIATYPE"))):
-                self._properties["PHOTO"]["MEDIATYPE"] = tmpSplit2[1].split("=")[1]
-            self._properties["PHOTO"]["data"] = tmpSplit[1]
-        else:
-            raise(ValueError("could not parse string for 'PHOTO', tried to parse this '%s'" % (value)))
+        for dictTable in self._dictColumns.values():
+            for listColumn in dictTable.values():
+                del listColumn[:]
 
-    @property
-    def REV(self):
-        return("REV:%s" % (self._properties["REV"]))
+    def getColumns(self, sTable):
+        """
+        returns the columns of a table as OrderedDict name -> list
+        """
+        return(self._dictColumns[sTable])
 
-    def setREV(self, value):
-        tmpSplit = value.split(":", 1)
-        if (len(tmpSplit) == 2) and (tmpSplit[0].startswith("REV")):
-            self._properties["REV"] = tmpSplit[1]
-        else:
-            raise(ValueError("could not parse string for 'REV', tried to parse this '%s'" % (value)))
+    def toNumPy(self, sTable):
+        """
+        returns the columns of a table as OrderedDict name -> numpy array, "card" and the
+        pref of phones are int64 (pref 0 if not set), the other pref are bool, text is object
+        """
+        try:
+            import numpy
+        except ImportError:
+            raise(ImportError("toNumPy needs NumPy, use getColumns or exportCSV without it"))
+        dictArrays = OrderedDict()
+        for (sColumn, listValues) in self._dictColumns[sTable].items():
+            if (sColumn == "card"):
+                dictArrays[sColumn] = numpy.array(listValues, dtype=numpy.int64)
+            elif (sColumn == "pref") and (sTable == "phones"):
+                dictArrays[sColumn] = numpy.array([iPref or 0 for iPref in listValues], dtype=numpy.int64)
+            elif (sColumn == "pref"):
+                dictArrays[sColumn] = numpy.array(listValues, dtype=bool)
+            else:
+                dictArrays[sColumn] = numpy.array(listValues, dtype=object)
+        return(dictArrays)
 
-    @property
-    def UID(self):
-        if self._properties["UID"] is None:
-            return("")
-        else:
-            return("UID:%s" % (self._properties["UID"]))
+    def writeCSV(self, dictWriters):
+        """
+        appends the rows of all tables to csv writers (table name -> csv.writer)
+        """
+        for (sTable, dictTable) in self._dictColumns.items():
+            # zip builds the rows, the values are not copied
+            dictWriters[sTable].writerows(zip(*dictTable.values()))
 
-    def setUID(self, value):
-        tmpSplit = value.split(":", 1)
-        if (len(tmpSplit) == 2) and (tmpSplit[0].startswith("UID")):
-            self._properties["UID"] = tmpSplit[1]
-        else:
-            raise(ValueError("could not parse string for 'UID', tried to parse this '%s'" % (value)))
+    @staticmethod
+    def exportCSV(iterVCards, sFilePrefix, iBatchSize=65536):
+        """
+        writes the VCards (e.g. from "VCard.iterFile") to the files <sFilePrefix>contacts.csv,
+        <sFilePrefix>emails.csv, <sFilePrefix>phones.csv and <sFilePrefix>addresses.csv,
+        iBatchSize VCards are collected in columns and written at once, returns the number of VCards
+        """
+        dictFiles = OrderedDict()
+        try:
+            dictWriters = {}
+            for (sTable, tupleColumns) in VCardColumns._dictTables.items():
+                dictFiles[sTable] = open("%s%s.csv" % (sFilePrefix, sTable), "w", encoding="utf-8", newline="")
+                dictWriters[sTable] = csv.writer(dictFiles[sTable])
+                dictWriters[sTable].writerow(tupleColumns)
+            objColumns = VCardColumns()
+            for objVCard in iterVCards:
+                objColumns.add(objVCard)
+                if (len(objColumns) >= iBatchSize):
+                    objColumns.writeCSV(dictWriters)
+                    objColumns.clear()
+            objColumns.writeCSV(dictWriters)
+        finally:
+            for fhFile in dictFiles.values():
+                fhFile.close()
+        return(objColumns._iNextCard)
 
-    @property
-    def NOTE(self):
-        if self._properties["NOTE"] is None:
-            return("")
-        else:
-            return("NOTE:%s" % (self._properties["NOTE"]))
 
-    def setNOTE(self, value):
-        tmpSplit = value.split(":", 1)
-        if (len(tmpSplit) == 2) and (tmpSplit[0].startswith("NOTE")):
-            self._properties["NOTE"] = tmpSplit[1]
-        else:
-            raise(ValueError("could not parse string for 'NOTE', tried to parse this '%s'" % (value)))
+# files bigger than this are split into ranges of VCards, which are parsed in parallel (and
+# written one after the other, so a big file is never kept in memory as a whole), with -j the
+# ranges are smaller, so all workers get work, but not smaller than _iMinRangeSize
+_iMaxRangeSize = 8 * 1024 * 1024
+_iMinRangeSize = 1024 * 1024
 
-    @property
-    def URL(self):
-        if self._properties["URL"] is None:
-            return("")
-        else:
-            return("URL:%s" % (self._properties["URL"]))
 
-    def setURL(self, value):
-        tmpSplit = value.split(":", 1)
-        if (len(tmpSplit) == 2) and (tmpSplit[0].startswith("URL")):
-            self._properties["URL"] = tmpSplit[1]
-        else:
-            raise(ValueError("could not parse string for 'URL', tried to parse this '%s'" % (value)))
+def _findInFile(fhFile, bNeedle, iFrom, iBlockSize=65536):
+    """
+    returns the offset of the first occurrence of bNeedle at or after iFrom, -1 if not found
+    """
+    fhFile.seek(iFrom)
+    bBuffer = b""
+    iBufferOffset = iFrom
+    while True:
+        bBlock = fhFile.read(iBlockSize)
+        if not bBlock:
+            return(-1)
+        bBuffer += bBlock
+        iFound = bBuffer.find(bNeedle)
+        if (iFound >= 0):
+            return(iBufferOffset + iFound)
+        # keep the tail, the needle could be split by the block border
+        iKeep = max(0, len(bBuffer) - len(bNeedle) + 1)
+        bBuffer = bBuffer[iKeep:]
+        iBufferOffset += iKeep
 
-    def prettyPrint(self, bIncludeCustomProperties=True):
-        sVCard = ""
-        # begin tag
-        sVCard += "BEGIN:VCARD"
-        # add standard properties
-        for sProperty in self._properties:
-            sLine = eval("self.%s" % sProperty)
-            if (len(sLine) > 0):
-                sVCard += "\n" + sLine
-        # include custom properties /properties starting with "X"
-        if (bIncludeCustomProperties is True):
-            for sCustomProperty in self._customProperties:
-                sVCard += "\n%s:%s" % (sCustomProperty, self.getCustomProperty(sCustomProperty))
-        # end tag
-        sVCard += "\nEND:VCARD\n"
-        return(sVCard)
 
-    def __str__(self):
-        return("VCard:v%s //FN:%s //N:%s" % (self.version, self.FN, self.N))
+def _getFileRanges(sFilePath, iRangeSize):
+    """
+    splits a file into byte ranges of about iRangeSize bytes, every range starts at a
+    "BEGIN:VCARD", so the ranges can be parsed independent of each other
+    returns a list of tuples (iStart, iEnd), iEnd is None for the last range
+    UTF-16 and UTF-32 files are not split, because they are converted while reading
+    """
+    iFileSize = os.path.getsize(sFilePath)
+    listRanges = []
+    iStart = 0
+    with VCard._openFile(sFilePath) as fhFile:
+        if isinstance(fhFile, _TranscodingReader):
+            return([(0, None)])
+        while (iStart + iRangeSize < iFileSize):
+            iNext = _findInFile(fhFile, b"BEGIN:VCARD", iStart + iRangeSize)
+            if (iNext < 0):
+                break
+            listRanges.append((iStart, iNext))
+            iStart = iNext
+    listRanges.append((iStart, None))
+    return(listRanges)
 
 
-if __name__ == "__main__":
+def _extractPhoto(objVCard, sPhotoFolder, sFilePath, iOffset):
+    """
+    writes the inline PHOTO of the VCard to a file named by its UID (or the name of
+    the VCard file and the offset of the VCard in it), returns the path of the written file
+    """
+    objPhoto = objVCard.photo
+    if (objPhoto is None) or (objPhoto.isInline() is False):
+        return(None)
+    sUID = objVCard.getProperty("UID")
+    if sUID:
+        sName = re.sub("[^A-Za-z0-9._-]", "_", sUID)
+    else:
+        sName = "%s_%d" % (os.path.splitext(os.path.basename(sFilePath))[0], iOffset)
+    sPhotoPath = os.path.join(sPhotoFolder, "%s.%s" % (sName, objPhoto.getFileExtension()))
+    objPhoto.saveTo(sPhotoPath)
+    return(sPhotoPath)
+
+
+# format of the manifest of the incremental mode, a manifest of another format is ignored
+_iManifestFormat = 1
+
+
+def _hashFile(sFilePath):
+    objHash = hashlib.sha256()
+    with open(sFilePath, "rb") as fhFile:
+        for bChunk in iter(lambda: fhFile.read(1048576), b""):
+            objHash.update(bChunk)
+    return(objHash.hexdigest())
+
+
+def _hashCard(bCard):
+    return(hashlib.blake2b(bCard, digest_size=16).hexdigest())
+
+
+# the UID line of a VCard, e.g. "UID:1234", see "_convertFileRange"
+_regexCardUID = re.compile(b"^(?:[A-Za-z0-9-]+\\.)?UID(?:;[^:\r\n]*)?:[ \t]*\\S", re.MULTILINE | re.IGNORECASE)
+
+
+def _loadManifest(sManifestPath, dictOptions):
+    """
+    returns the files of the manifest written by the last incremental run as dict
+    relative input path -> {"size", "mtime", "sha256", "output", "cards"}, an empty dict if
+    there is no manifest or it was written with other options (then everything is converted)
+    """
+    try:
+        with open(sManifestPath, "r", encoding="utf-8") as fhManifest:
+            dictManifest = json.load(fhManifest)
+    except (OSError, ValueError):
+        return({})
+    if (dictManifest.get("format") != _iManifestFormat) or (dictManifest.get("options") != dictOptions):
+        logger.info("manifest '%s' was written with other options, all files are converted", sManifestPath)
+        return({})
+    return(dictManifest.get("files", {}))
+
+
+def _saveManifest(sManifestPath, dictOptions, dictFiles):
+    # write to a temporary file first, so an interrupted write never leaves a broken manifest
+    sTmpFilePath = sManifestPath + ".tmp"
+    with open(sTmpFilePath, "w", encoding="utf-8") as fhManifest:
+        json.dump(OrderedDict([("format", _iManifestFormat), ("options", dictOptions), ("files", dictFiles)]),
+                  fhManifest, ensure_ascii=False)
+    os.replace(sTmpFilePath, sManifestPath)
+
+
+def _convertCard(bCard, sFilePath, iOffset, sPhotos, sPhotoFolder):
+    """
+    converts a single VCard for the CLI, returns it as written by VCardWriter,
+    None if the version of the VCard is not supported
+    """
+    objVCard = VCard._fromCardBytes(bCard, sFilePath)
+    if objVCard is None:
+        return(None)
+    if (sPhotos != "keep") and (objVCard.photo is not None):
+        if (sPhotos == "extract"):
+            _extractPhoto(objVCard, sPhotoFolder, sFilePath, iOffset)
+        objVCard.photo = None
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("parsed and pretty printed\n%s", objVCard.prettyPrint(bIncludeCustomProperties=False))
+    fhOut = io.BytesIO()
+    objVCard.writeTo(fhOut, bIncludeCustomProperties=False)
+    return(fhOut.getvalue())
+
+
+def _convertFileRange(tupleTask):
+    """
+    parses the VCards in the byte range (iStart, iEnd) of a file, used by the CLI (also
+    as worker of the process pool), returns the tuple (bVCards, sError, dictSummary, listCards),
+    where bVCards are the converted VCards as written by VCardWriter
+    sPhotos is "keep", "drop" or "extract" (to files in sPhotoFolder, the PHOTO is removed from the VCard)
+    if dictKnownCards (hash of the VCard -> (iOffset, iLength) of the converted VCard in sOldOutFile)
+    is given, VCards which did not change are copied from sOldOutFile instead of being converted
+    again and listCards has a tuple (sHash, iLength, bCopied) for every written VCard
+    with sCachePath, converted VCards are taken from (and added to) a VCardParseCache (not
+    with sPhotos "extract", because the photo file of a cached VCard would not be written), which
+    is opened once per process (see "_getWorkerCache"), dictCache are the statistics of the task
+    with bLenient, VCards which can not be converted are skipped and returned in listRejects,
+    as tuples (VCardError, bCard)
+    with bStatistics, the VCardStatistics of the task are returned as dictStatistics (see "asDict")
+    """
+    (sFilePath, iStart, iEnd, sPhotos, sPhotoFolder, sOldOutFile, dictKnownCards, sCachePath, iCacheSize,
+     bLenient, bStatistics) = tupleTask
+    objRejects = VCardRejects(bKeepCards=True) if bLenient else None
+    fhOut = io.BytesIO()
+    listCards = None if (dictKnownCards is None) else []
+    fhOldOut = None
+    objCache = None
+    dictCache = None
+    VCard.summary.reset()
+    if bStatistics:
+        # enabled once per process, by "main" or "_initWorker"
+        VCard.statistics.reset()
+    try:
+        if sCachePath:
+            objCache = _getWorkerCache(sCachePath, iCacheSize)
+            dictCacheBefore = objCache.getStatistics()
+            # not used with sPhotos "extract", a cached VCard would not write its photo file
+            sOptions = sPhotos
+        with VCard._openFile(sFilePath) as fhFile:
+            if (iStart == 0) and (iEnd is None):
+                iterCards = VCard._iterCardBytes(fhFile, bIncomplete=bLenient)
+            else:
+                fhFile.seek(iStart)
+                if iEnd is None:
+                    bData = fhFile.read()
+                else:
+                    bData = fhFile.read(iEnd - iStart)
+                iterCards = ((iStart + iOffset, bCard) for (iOffset, bCard) in
+                             VCard._iterCardBytes(io.BytesIO(bData), bIncomplete=bLenient))
+            for (iOffset, bCard) in iterCards:
+                if (listCards is not None):
+                    sHash = _hashCard(bCard)
+                    # the extracted photo of a VCard without UID is named by the offset of the VCard,
+                    # which changes, when the VCards in front of it change, so it is extracted again
+                    if (sHash in dictKnownCards) and ((sPhotos != "extract") or _regexCardUID.search(bCard)):
+                        if fhOldOut is None:
+                            fhOldOut = open(sOldOutFile, "rb")
+                        (iOldOffset, iOldLength) = dictKnownCards[sHash]
+                        fhOldOut.seek(iOldOffset)
+                        fhOut.write(fhOldOut.read(iOldLength))
+                        listCards.append((sHash, iOldLength, True))
+                        continue
+                try:
+                    if bLenient and not bCard.endswith(b"END:VCARD"):
+                        raise(VCardParseError("VCard is not complete, 'END:VCARD' is missing"))
+                    if objCache is not None:
+                        bConverted = objCache.getOutput(bCard, sOptions, functools.partial(
+                            _convertCard, bCard, sFilePath, iOffset, sPhotos, sPhotoFolder))
+                    else:
+                        bConverted = _convertCard(bCard, sFilePath, iOffset, sPhotos, sPhotoFolder)
+                except Exception as ex:
+                    if not bLenient:
+                        raise
+                    objRejects.reject(sFilePath, iOffset, bCard, ex)
+                    continue
+                if bConverted is None:
+                    continue
+                fhOut.write(bConverted)
+                if (listCards is not None):
+                    # the length of every VCard is needed for the manifest
+                    listCards.append((sHash, len(bConverted), False))
+        if objCache is not None:
+            dictCache = OrderedDict((sName, iValue - dictCacheBefore[sName])
+                                    for (sName, iValue) in objCache.getStatistics().items() if (sName != "bytes"))
+    except Exception as ex:
+        return((None, "%s: %s" % (type(ex).__name__, ex), VCard.summary.asDict(), None, dictCache, None,
+                VCard.statistics.asDict() if bStatistics else None))
+    finally:
+        if fhOldOut is not None:
+            fhOldOut.close()
+        if objCache is not None:
+            # after every task, so the other workers see the new entries
+            objCache.commit()
+    listRejects = None if (objRejects is None) else list(zip(objRejects.listErrors, objRejects.listCards))
+    return((fhOut.getvalue(), None, VCard.summary.asDict(), listCards, dictCache, listRejects,
+            VCard.statistics.asDict() if bStatistics else None))
+
+
+# the VCardParseCache of this process, used by all tasks of a worker (or of "main" without workers)
+_objWorkerCache = None
+
+
+def _getWorkerCache(sCachePath, iCacheSize):
+    """
+    returns the VCardParseCache of this process, it is only opened again for another file
+    """
+    global _objWorkerCache
+    if (_objWorkerCache is not None) and (_objWorkerCache._sCachePath != sCachePath):
+        _closeWorkerCache()
+    if _objWorkerCache is None:
+        _objWorkerCache = VCardParseCache(sCachePath, iCacheSize)
+    return(_objWorkerCache)
+
+
+def _closeWorkerCache():
+    global _objWorkerCache
+    if _objWorkerCache is not None:
+        _objWorkerCache.close()
+        _objWorkerCache = None
+
+
+def _initWorker(bStatistics, sCachePath="", iCacheSize=0):
+    """
+    initializer of the worker processes of the CLI, the workers do not inherit the enabled
+    VCardStatistics, if they are spawned, they are not disabled, because they end with the pool,
+    the cache is opened once per worker, its entries are committed after every task
+    """
+    if bStatistics:
+        VCard.statistics.enable()
+    if sCachePath:
+        _getWorkerCache(sCachePath, iCacheSize)
+
+
+def _mainDiff(listArguments):
+    """
+    "vcard.py diff old.vcf new.vcf", writes a JSON line per added, removed or modified VCard, see VCardDiff
+    """
+    import argparse
+    objArgumentParser = argparse.ArgumentParser(
+        prog="vcard.py diff", description="SYNTAX: vcard.py diff old.vcf new.vcf [-o changes.jsonl]")
+    objArgumentParser.add_argument("sOldFilePath", action="store", type=str, help="the older .vcf file")
+    objArgumentParser.add_argument("sNewFilePath", action="store", type=str, help="the newer .vcf file")
+    objArgumentParser.add_argument("-o", action="store", type=str, dest="sOutputPath", default="-",
+                                   required=False, help="file for the changes as JSON lines (default '-' is stdout)")
+    objArgumentParser.add_argument("--database", action="store", type=str, dest="sDatabasePath", default="",
+                                   required=False, help="SQLite file for the keys and hashes (default is a temporary file)")
+    objArgumentParser.add_argument("--ignore", action="store", type=str, dest="sIgnore", default="REV",
+                                   required=False, help="comma separated properties, which are not compared (default REV)")
+    objArgumentParser.add_argument("-q", "--quiet", action="store_true", dest="bQuiet", required=False,
+                                   help="only log errors, same as '--log-level ERROR'")
+    objArgumentParser.add_argument("--log-level", action="store", type=str, dest="sLogLevel", default="INFO",
+                                   choices=["DEBUG", "INFO", "WARNING", "ERROR"], required=False,
+                                   help="log level (default INFO)")
+    argsParsed = objArgumentParser.parse_args(listArguments)
+    if argsParsed.bQuiet:
+        argsParsed.sLogLevel = "ERROR"
+    # the changes may be written to stdout, so the log goes to stderr
+    logging.basicConfig(stream=sys.stderr, format="%(levelname)s %(message)s")
+    logger.setLevel(argsParsed.sLogLevel)
+    tupleIgnore = tuple(sPropertyName.strip() for sPropertyName in argsParsed.sIgnore.split(",") if sPropertyName.strip())
+    fhOutput = sys.stdout if (argsParsed.sOutputPath == "-") else open(argsParsed.sOutputPath, "w", encoding="utf-8")
+    try:
+        with VCardDiff(argsParsed.sOldFilePath, argsParsed.sNewFilePath, argsParsed.sDatabasePath,
+                       tupleIgnore) as objDiff:
+            for objChange in objDiff.iterChanges():
+                fhOutput.write(json.dumps(objChange._asdict()) + "\n")
+    finally:
+        if fhOutput is not sys.stdout:
+            fhOutput.close()
+    logger.info("diff: %d added, %d removed, %d modified, %d unchanged", objDiff.dictCounts["added"],
+                objDiff.dictCounts["removed"], objDiff.dictCounts["modified"], objDiff.dictCounts["unchanged"])
+    return(0)
+
+
+def main(listArguments=None):
+    if listArguments is None:
+        listArguments = sys.argv[1:]
+    if (listArguments[:1] == ["diff"]):
+        return(_mainDiff(listArguments[1:]))
     # init argument parser
     import argparse
     objArgumentParser = argparse.ArgumentParser(
-        description='SYNTAX: vcard.py -i inputFolder -o outputFolder')
+        description='SYNTAX: vcard.py -i inputFolder -o outputFolder (or "vcard.py diff old.vcf new.vcf")')
     objArgumentParser.add_argument("-i", action="store", type=str, dest="inputFolder",
                                    default="", required=True, help="folder to look for .vcf files")
     objArgumentParser.add_argument("-o", action="store", type=str, dest="outputFolder", default="",
                                    required=False, help="if specified, exported .vcf files will be written here")
     objArgumentParser.add_argument("-export", action="store_true", dest="bExportVCards", required=False,
                                    help="if specified, parsed VCards will be exported, with new extension 'v4.vcf'")
-    argsParsed = objArgumentParser.parse_args()
+    objArgumentParser.add_argument("-j", "--jobs", action="store", type=int, dest="iJobs", default=1,
+                                   required=False, help="number of worker processes, 0 means one per CPU (default 1)")
+    objArgumentParser.add_argument("-q", "--quiet", action="store_true", dest="bQuiet", required=False,
+                                   help="only log errors, same as '--log-level ERROR'")
+    objArgumentParser.add_argument("--log-level", action="store", type=str, dest="sLogLevel", default="INFO",
+                                   choices=["DEBUG", "INFO", "WARNING", "ERROR"], required=False,
+                                   help="DEBUG also logs every parsed and pretty printed VCard (default INFO)")
+    objArgumentParser.add_argument("--photos", action="store", type=str, dest="sPhotos", default="keep",
+                                   choices=["keep", "drop", "extract"], required=False,
+                                   help="keep, drop or extract embedded photos to files (default keep)")
+    objArgumentParser.add_argument("--photo-folder", action="store", type=str, dest="sPhotoFolder", default="",
+                                   required=False, help="folder for extracted photos (default is the export folder)")
+    objArgumentParser.add_argument("--incremental", action="store_true", dest="bIncremental", required=False,
+                                   help="only convert files, which changed since the last run (needs -export)")
+    objArgumentParser.add_argument("--card-hashes", action="store_true", dest="bCardHashes", required=False,
+                                   help="with --incremental, only convert the VCards of a file, which changed")
+    objArgumentParser.add_argument("--manifest", action="store", type=str, dest="sManifestPath", default="",
+                                   required=False, help="manifest of --incremental (default .vcard-manifest.json in the export folder)")
+    objArgumentParser.add_argument("--cache", action="store", type=str, dest="sCachePath", default="", required=False,
+                                   help="cache file (SQLite) of converted VCards, VCards found in it are not converted again")
+    objArgumentParser.add_argument("--cache-size", action="store", type=int, dest="iCacheSize", default=256,
+                                   required=False, help="maximum size of the cache in MB (default 256)")
+    objArgumentParser.add_argument("--lenient", action="store_true", dest="bLenient", required=False,
+                                   help="skip VCards, which can not be converted, and write them to a quarantine file")
+    objArgumentParser.add_argument("--quarantine-folder", action="store", type=str, dest="sQuarantineFolder", default="",
+                                   required=False, help="folder for the rejected VCards of --lenient (default is the export folder)")
+    objArgumentParser.add_argument("--shard-cards", action="store", type=int, dest="iShardCards", default=0,
+                                   required=False, help="write the VCards of all files into shards of at most this many VCards (needs -export)")
+    objArgumentParser.add_argument("--shard-size", action="store", type=int, dest="iShardSize", default=0,
+                                   required=False, help="write the VCards of all files into shards of at most this many MB (needs -export)")
+    objArgumentParser.add_argument("--shard-per-uid", action="store_true", dest="bShardPerUID", required=False,
+                                   help="write every VCard to its own file, named by its UID (needs -export)")
+    objArgumentParser.add_argument("--shard-prefix", action="store", type=str, dest="sShardPrefix", default="contacts",
+                                   required=False, help="name of the shards, <prefix>-00001.v4.vcf, ... (default contacts)")
+    objArgumentParser.add_argument("--stats", action="store", type=str, dest="sStatisticsPath", default="",
+                                   required=False, help="write the timers of the parser stages and properties as JSON to this file ('-' is stdout)")
+    argsParsed = objArgumentParser.parse_args(listArguments)
+    if (argsParsed.bIncremental or argsParsed.bCardHashes) and (argsParsed.bExportVCards is False):
+        objArgumentParser.error("--incremental and --card-hashes need -export")
+    bShards = bool(argsParsed.iShardCards or argsParsed.iShardSize or argsParsed.bShardPerUID)
+    if bShards and (argsParsed.bExportVCards is False):
+        objArgumentParser.error("--shard-cards, --shard-size and --shard-per-uid need -export")
+    if bShards and (argsParsed.bIncremental or argsParsed.bCardHashes):
+        objArgumentParser.error("--incremental can not be used with shards")
+    #
+    # init logging, before the worker processes are started
+    if argsParsed.bQuiet:
+        argsParsed.sLogLevel = "ERROR"
+    # with "--stats -" the statistics are written to stdout, so the log goes to stderr
+    fhLog = sys.stderr if (argsParsed.sStatisticsPath == "-") else sys.stdout
+    logging.basicConfig(stream=fhLog, format="%(levelname)s %(message)s")
+    logger.setLevel(argsParsed.sLogLevel)
     #
     # set vars
     sInputFolder = argsParsed.inputFolder
     sExportFileExtension = ".v4.vcf"
     bExportVCards = argsParsed.bExportVCards
+    iJobs = argsParsed.iJobs
+    if (iJobs <= 0):
+        iJobs = os.cpu_count() or 1
     # if no outputFolder is specified, we will use the inputFolder to export the data, if -export was specified
     if (len(argsParsed.outputFolder) > 0):
         sExportFolder = argsParsed.outputFolder
     else:
         sExportFolder = argsParsed.inputFolder
+    sPhotoFolder = argsParsed.sPhotoFolder or sExportFolder
+    sManifestPath = argsParsed.sManifestPath or os.path.join(sExportFolder, ".vcard-manifest.json")
+    bIncremental = argsParsed.bIncremental or argsParsed.bCardHashes
+    sCachePath = argsParsed.sCachePath
+    bLenient = argsParsed.bLenient
+    sQuarantineFolder = argsParsed.sQuarantineFolder or sExportFolder
+    iCacheSize = argsParsed.iCacheSize * 1024 * 1024
+    bStatistics = bool(argsParsed.sStatisticsPath)
+    fStartTime = time.perf_counter()
+    if sCachePath and (argsParsed.sPhotos == "extract"):
+        # a cached VCard has no PHOTO any more, so its photo file would not be written
+        logger.warning("--cache is not used with '--photos extract'")
+        sCachePath = ""
+    if sCachePath:
+        # created (or cleared, see VCardParseCache) once, before the workers use it
+        VCardParseCache(sCachePath, iCacheSize).close()
     #
     # check that input folder is accessable
     if os.path.exists(sInputFolder) is False:
@@ -720,25 +3632,236 @@ if __name__ == "__main__":
     setOfFilesToLoad = set()
     for root, directories, filenames in os.walk(sInputFolder):
         for filename in filenames:
-            if (filename.endswith(sExportFileExtension) is False):
+            if (filename.endswith((sExportFileExtension, ".rejected.vcf", ".rejected.jsonl")) is False):
                 setOfFilesToLoad.add(os.path.join(root, filename))
+    setOfFilesToLoad.discard(sManifestPath)
     #
-    # load VCard files and try to parse them
+    # in incremental mode, files are skipped if they did not change since the last run (same size and
+    # mtime or, if these changed, same content) and their export still exists
+    dictOutFiles = {}  # sFilePath -> export file
+    for sFilePath in setOfFilesToLoad:
+        sOutFile = sFilePath.replace(".vcf", sExportFileExtension)
+        dictOutFiles[sFilePath] = sOutFile.replace(sInputFolder, sExportFolder)
+    dictOptions = OrderedDict([("photos", argsParsed.sPhotos), ("photoFolder", sPhotoFolder),
+                               ("cardHashes", argsParsed.bCardHashes)])
+    dictOldManifest = _loadManifest(sManifestPath, dictOptions) if bIncremental else {}
+    dictManifest = {}  # relative input path -> {"size", "mtime", "sha256", "output", "cards"}
+    listFilesToConvert = []
+    iFilesSkipped = 0
+    iCardsCopied = 0
     for sFilePath in sorted(setOfFilesToLoad):
-        sVCardStringsForExport = ""
-        print("about to load '%s'" % sFilePath)
-        listVCards = VCard.fromFile(sFilePath)
-        for objVCard in listVCards:
-            print("\n###############parsed and pretty printed##############")
-            sVCard = objVCard.prettyPrint(bIncludeCustomProperties=False)
-            print(sVCard)
-            sVCardStringsForExport += sVCard
-            print("~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~")
-        # export the parsed and pretty printed data if needed
-        if bExportVCards:
-            sOutFile = sFilePath.replace(".vcf", sExportFileExtension)
-            sOutFile = sOutFile.replace(sInputFolder, sExportFolder)
-            with (open(sOutFile, "wb")) as fhOut:
-                fhOut.write(sVCardStringsForExport.encode("utf8"))
-            print("file '%s' was written" % sOutFile)
-    # end for sFilePath
+        if bIncremental:
+            sRelativePath = os.path.relpath(sFilePath, sInputFolder)
+            objStat = os.stat(sFilePath)
+            dictEntry = OrderedDict([("size", objStat.st_size), ("mtime", objStat.st_mtime_ns), ("sha256", None),
+                                     ("output", os.path.relpath(dictOutFiles[sFilePath], sExportFolder)), ("cards", None)])
+            dictOldEntry = dictOldManifest.get(sRelativePath)
+            if (dictOldEntry is not None) and (dictOldEntry.get("output") == dictEntry["output"]) and \
+                    os.path.exists(dictOutFiles[sFilePath]):
+                if (dictOldEntry["size"] == dictEntry["size"]) and (dictOldEntry["mtime"] == dictEntry["mtime"]):
+                    dictManifest[sRelativePath] = dictOldEntry
+                    iFilesSkipped += 1
+                    continue
+                dictEntry["sha256"] = _hashFile(sFilePath)
+                if (dictOldEntry["sha256"] == dictEntry["sha256"]):
+                    # only touched, remember the new mtime
+                    dictEntry["cards"] = dictOldEntry["cards"]
+                    dictManifest[sRelativePath] = dictEntry
+                    iFilesSkipped += 1
+                    continue
+            else:
+                dictOldEntry = None
+                dictEntry["sha256"] = _hashFile(sFilePath)
+            dictManifest[sRelativePath] = dictEntry
+        listFilesToConvert.append(sFilePath)
+    #
+    # split the work into tasks (sFilePath, iStart, iEnd, ...), the tasks of a file follow each other
+    # with --card-hashes, the (changed) VCards are converted, the others are copied from the export
+    listTasks = []
+    for sFilePath in listFilesToConvert:
+        dictKnownCards = None
+        if argsParsed.bCardHashes:
+            dictKnownCards = {}
+            dictOldEntry = dictOldManifest.get(os.path.relpath(sFilePath, sInputFolder))
+            if (dictOldEntry is not None) and os.path.exists(dictOutFiles[sFilePath]):
+                for (sHash, iOffset, iLength) in (dictOldEntry["cards"] or ()):
+                    dictKnownCards[sHash] = (iOffset, iLength)
+        # with -j, a file is split into at least two ranges per job (of at least 1 MB), so all workers get work
+        iFileSize = os.path.getsize(sFilePath)
+        iRangeSize = _iMaxRangeSize
+        if (iJobs > 1):
+            iRangeSize = min(_iMaxRangeSize, max(_iMinRangeSize, iFileSize // (iJobs * 2)))
+        if (iFileSize > iRangeSize):
+            for (iStart, iEnd) in _getFileRanges(sFilePath, iRangeSize):
+                listTasks.append((sFilePath, iStart, iEnd, argsParsed.sPhotos, sPhotoFolder,
+                                  dictOutFiles[sFilePath], dictKnownCards, sCachePath, iCacheSize, bLenient,
+                                  bStatistics))
+        else:
+            listTasks.append((sFilePath, 0, None, argsParsed.sPhotos, sPhotoFolder,
+                              dictOutFiles[sFilePath], dictKnownCards, sCachePath, iCacheSize, bLenient,
+                              bStatistics))
+    #
+    # load VCard files and try to parse them, results are returned in the order of the tasks
+    objPool = None
+    if (iJobs > 1):
+        import multiprocessing
+        objPool = multiprocessing.Pool(iJobs, _initWorker, (bStatistics, sCachePath, iCacheSize))
+        # one task at a time, so the ranges of a big file are spread over all workers
+        iterResults = objPool.imap(_convertFileRange, listTasks, chunksize=1)
+    else:
+        iterResults = map(_convertFileRange, listTasks)
+    dictErrors = OrderedDict()  # sFilePath -> list of errors
+    # the VCards of all files are written to shards instead of one export per file, the VCards of a
+    # file are only added to the shards, when all its ranges were converted
+    objShards = None
+    if bShards:
+        objShards = VCardShardWriter(sExportFolder, argsParsed.sShardPrefix, argsParsed.iShardCards or None,
+                                     (argsParsed.iShardSize * 1024 * 1024) or None, argsParsed.bShardPerUID,
+                                     max(iJobs, 4))
+    objSummary = VCardSummary()
+    objStatistics = VCardStatistics()
+    dictCacheStatistics = Counter()
+    iRejected = 0
+    setRejectedFiles = set()  # files with VCards rejected by --lenient
+    fhOut = None
+    fhShardParts = None  # converted ranges of the current file, until all are converted
+    # without workers, the tasks run in this process, so the statistics are enabled here (unless
+    # they already were) and disabled again at the end
+    bEnableStatistics = bStatistics and (objPool is None) and not VCard.statistics.enabled
+    try:
+        if bEnableStatistics:
+            VCard.statistics.enable()
+        for i, (bVCards, sError, dictSummary, listCards, dictCache, listRejects, dictStatistics) in \
+                enumerate(iterResults):
+            objSummary.merge(dictSummary)
+            if dictStatistics is not None:
+                objStatistics.merge(dictStatistics)
+            if dictCache is not None:
+                dictCacheStatistics.update(dictCache)
+            sFilePath = listTasks[i][0]
+            bFirstTaskOfFile = (i == 0) or (listTasks[i - 1][0] != sFilePath)
+            bLastTaskOfFile = (i == len(listTasks) - 1) or (listTasks[i + 1][0] != sFilePath)
+            if bFirstTaskOfFile:
+                logger.info("about to load '%s'", sFilePath)
+                objRejects = None
+                if bLenient:
+                    # e.g. "contacts.vcf" -> "contacts.rejected.vcf" and "contacts.rejected.jsonl"
+                    sQuarantineFile = os.path.join(sQuarantineFolder, os.path.splitext(os.path.basename(sFilePath))[0])
+                    for sExtension in (".rejected.vcf", ".rejected.jsonl"):
+                        if os.path.exists(sQuarantineFile + sExtension):
+                            os.remove(sQuarantineFile + sExtension)
+                listCardEntries = []  # [sHash, iOffset, iLength] of the VCards in the export
+                if bExportVCards and (objShards is None):
+                    sOutFile = dictOutFiles[sFilePath]
+                    # written to a temporary file, which replaces the export, when the whole file was converted
+                    fhOut = open(sOutFile + ".tmp", "wb")
+                if (objShards is not None):
+                    fhShardParts = tempfile.TemporaryFile()
+                    listShardParts = []  # length of every converted range in fhShardParts
+            if listRejects:
+                if objRejects is None:
+                    objRejects = VCardRejects(sQuarantineFile + ".rejected.vcf")
+                for (objError, bCard) in listRejects:
+                    objRejects.add(objError, bCard)
+            if bLastTaskOfFile and (objRejects is not None) and (len(objRejects) > 0):
+                # converted again by the next run (--incremental), the rejected VCards could be fixed
+                setRejectedFiles.add(sFilePath)
+            if bLastTaskOfFile and (objRejects is not None):
+                objRejects.close()
+                objRejects.writeReport(sQuarantineFile + ".rejected.jsonl")
+                iRejected += len(objRejects)
+                logger.error("%d VCard(s) of '%s' were rejected, see '%s'", len(objRejects), sFilePath,
+                             sQuarantineFile + ".rejected.jsonl")
+            if sError is not None:
+                dictErrors.setdefault(sFilePath, []).append(
+                    "bytes %d-%s: %s" % (listTasks[i][1], listTasks[i][2] or "end", sError))
+            elif (objShards is not None) and (sFilePath not in dictErrors):
+                fhShardParts.write(bVCards)
+                listShardParts.append(len(bVCards))
+            elif (fhOut is not None) and (sFilePath not in dictErrors):
+                if listCards is not None:
+                    iOffset = fhOut.tell()
+                    for (sHash, iLength, bCopied) in listCards:
+                        listCardEntries.append([sHash, iOffset, iLength])
+                        iOffset += iLength
+                        iCardsCopied += bCopied
+                fhOut.write(bVCards)
+            # export the parsed and pretty printed data if needed, but not partially parsed files
+            if bLastTaskOfFile and (fhOut is not None):
+                fhOut.close()
+                fhOut = None
+                if (sFilePath in dictErrors):
+                    os.remove(sOutFile + ".tmp")
+                else:
+                    os.replace(sOutFile + ".tmp", sOutFile)
+                    logger.info("file '%s' was written", sOutFile)
+            if bLastTaskOfFile and (fhShardParts is not None):
+                if (sFilePath not in dictErrors):
+                    fhShardParts.seek(0)
+                    for iLength in listShardParts:
+                        objShards.writeBytes(fhShardParts.read(iLength))
+                fhShardParts.close()
+                fhShardParts = None
+            if bLastTaskOfFile and bIncremental:
+                sRelativePath = os.path.relpath(sFilePath, sInputFolder)
+                if (sFilePath in dictErrors) or (sFilePath in setRejectedFiles):
+                    # converted again by the next run
+                    del dictManifest[sRelativePath]
+                elif argsParsed.bCardHashes:
+                    dictManifest[sRelativePath]["cards"] = listCardEntries
+        # end for results
+        if objShards is not None:
+            objShards.close()
+            logger.info("%d VCard(s) were written to %d shard(s) in '%s'", objShards.iCardsWritten,
+                        len(objShards.listShards), sExportFolder)
+        if bIncremental:
+            _saveManifest(sManifestPath, dictOptions, dictManifest)
+            logger.info("incremental: %d unchanged file(s) skipped, %d unchanged VCard(s) copied",
+                        iFilesSkipped, iCardsCopied)
+    finally:
+        if fhOut is not None:
+            fhOut.close()
+            os.remove(fhOut.name)
+        if fhShardParts is not None:
+            fhShardParts.close()
+        if objShards is not None:
+            # the shards of the earlier run are kept, if this run did not finish
+            objShards.abort()
+        if objPool is not None:
+            objPool.close()
+            objPool.join()
+        if bEnableStatistics:
+            VCard.statistics.disable()
+        # opened by the tasks, which ran in this process
+        _closeWorkerCache()
+    logger.info("summary: %s", objSummary)
+    if bLenient:
+        logger.info("lenient: %d VCard(s) rejected", iRejected)
+    if sCachePath:
+        logger.info("cache: %d hit(s), %d miss(es), %d eviction(s)", dictCacheStatistics["hits"],
+                    dictCacheStatistics["misses"], dictCacheStatistics["evictions"])
+    if bStatistics:
+        # the times of the stages are summed up over all workers, so with -j they may exceed the total
+        dictStatistics = objStatistics.asDict()
+        dictStatistics["seconds"] = round(time.perf_counter() - fStartTime, 6)
+        dictStatistics["jobs"] = iJobs
+        if argsParsed.sStatisticsPath == "-":
+            json.dump(dictStatistics, sys.stdout, indent=2)
+            sys.stdout.write("\n")
+        else:
+            with open(argsParsed.sStatisticsPath, "w", encoding="utf-8") as fhStatistics:
+                json.dump(dictStatistics, fhStatistics, indent=2)
+            logger.info("statistics were written to '%s'", argsParsed.sStatisticsPath)
+    #
+    # report the files, which could not be converted
+    if (len(dictErrors) > 0):
+        logger.error("could not convert %d of %d file(s)", len(dictErrors), len(setOfFilesToLoad))
+        for sFilePath in dictErrors:
+            for sError in dictErrors[sFilePath]:
+                logger.error("'%s' %s", sFilePath, sError)
+        return(1)
+    return(0)
+
+
+if __name__ == "__main__":
+    sys.exit(main())